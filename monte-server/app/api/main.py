@@ -1,4 +1,4 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Query
 from app.api import auth, journal, trading_import, stripe_api, admin, portfolio, legal
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
@@ -21,6 +21,24 @@ from app.core.monte_carlo_simulator import (
     DailyResult, 
     SimulationMetrics
 )
+from app.core.trading_calendar import MarketType
+from app.core.regimes import RegimeModel
+from app.core.outcomes import OutcomeDistribution
+from app.core.risk_rules import RiskRules
+from app.core.ensemble_executor import (
+    run_ensemble_parallel,
+    run_adaptive_ensemble_parallel,
+    run_sweep_parallel,
+    run_stored_ensemble_parallel,
+    get_executor,
+    start_executor,
+    shutdown_executor
+)
+from app.core.adaptive import PrecisionTarget
+from app.core.variance_reduction import SamplingMethod
+from app.core.optimizer import optimize_risk
+from app.core.analytic_solver import solve_final_balance
+from app.core.result_store import StoredEnsemble, delete_store, sweep_stores
 from app.core.database import get_db, create_tables
 from app.models.simulation import SimulationRecord
 from app.services.simulation_service import SimulationService
@@ -38,6 +56,8 @@ class SimulationRequest(BaseModel):
     monthly_cashout_percent: float = Field(0, ge=0, le=100, description="Monthly profit realization percentage")
     win_rate: float = Field(0.55, gt=0, lt=1, description="Expected win rate")
     simulation_days: int = Field(365, gt=0, le=1095, description="Number of days to simulate")
+    seed: Optional[int] = Field(None, ge=0, description="Random seed; the same seed reproduces the same results")
+    market_type: MarketType = Field(MarketType.EQUITIES, description="Trading calendar: equities, crypto (24/7) or fx (Sun-Fri)")
     
     class Config:
         schema_extra = {
@@ -54,6 +74,79 @@ class SimulationRequest(BaseModel):
             }
         }
 
+class MarketRegimeRequest(BaseModel):
+    name: str = Field("", description="Regime name, e.g. normal or cold")
+    win_rate: float = Field(..., ge=0, le=1, description="Win rate on the days of this regime")
+    trade_frequency: float = Field(1.0, ge=0, le=10, description="Multiplier of the expected number of trades per day")
+
+class RegimeModelRequest(BaseModel):
+    regimes: List[MarketRegimeRequest] = Field(..., min_length=1, max_length=10, description="Market regimes of the hidden Markov model")
+    transition_matrix: List[List[float]] = Field(..., description="Row i: probabilities that a day in regime i is followed by a day in each regime")
+    initial_probabilities: Optional[List[float]] = Field(None, description="Regime probabilities of the first day; the stationary distribution by default")
+
+class OutcomeDistributionRequest(BaseModel):
+    r_multiples: List[float] = Field(..., min_length=1, max_length=1000, description="Trade results in multiples of the amount risked, e.g. -1.2, -1, 0, 0.5, 2")
+    probabilities: List[float] = Field(..., min_length=1, max_length=1000, description="Probability or histogram count of each R multiple; normalized to sum to 1")
+
+class RiskRulesRequest(BaseModel):
+    max_losses_per_day: Optional[int] = Field(None, ge=1, description="Stop for the day after this many losing trades")
+    daily_loss_limit_percent: Optional[float] = Field(None, gt=0, le=100, description="Stop for the day once it has lost this percentage of its starting balance")
+    drawdown_threshold_percent: Optional[float] = Field(None, gt=0, lt=100, description="Cut the risk on days starting this percentage or more below the peak balance")
+    drawdown_risk_multiplier: float = Field(0.5, ge=0, le=1, description="Multiplier of the risk per trade on the days the drawdown rule cuts")
+
+class TradeModelRequest(SimulationRequest):
+    regimes: Optional[RegimeModelRequest] = Field(None, description="Regime-switching model replacing the fixed win rate")
+    outcomes: Optional[OutcomeDistributionRequest] = Field(None, description="Distribution of trade results replacing the win rate and risk to reward ratio")
+    risk_rules: Optional[RiskRulesRequest] = Field(None, description="Daily stops and drawdown risk cut applied on every path")
+
+class EnsembleRequest(TradeModelRequest):
+    n_paths: int = Field(1000, gt=0, le=100000, description="Number of simulated paths")
+    sampling: SamplingMethod = Field(SamplingMethod.PLAIN, description="Path sampling: plain, antithetic or stratified (Latin hypercube)")
+    control_variate: bool = Field(False, description="Correct the mean final balance with its analytic control variate")
+    compact: bool = Field(False, description="Keep the daily arrays in float32, halving memory at chart precision")
+    streaks: bool = Field(False, description="Report winning/losing streak distributions and histograms of days and trades")
+    target_balance_percent: Optional[float] = Field(None, gt=0, description="Report when paths first reach this percentage of the initial balance")
+    ruin_balance_percent: Optional[float] = Field(None, gt=0, lt=100, description="Report when paths first fall to this percentage of the initial balance")
+    checkpoint_days: Optional[List[int]] = Field(None, min_length=1, max_length=20, description="Shorter horizons, in calendar days, to also report metric distributions for")
+
+class StoredEnsembleRequest(TradeModelRequest):
+    n_paths: int = Field(1000, gt=0, le=100000, description="Number of simulated paths kept on disk")
+
+    class Config:
+        # The store keeps raw paths only; the options of summarized ensembles are rejected
+        # rather than silently ignored
+        extra = "forbid"
+
+class PrecisionTargetRequest(BaseModel):
+    metric: str = Field("final_balance", description="A simulation metric, or \"ruin\" for the ruin probability")
+    statistic: str = Field("median", description="mean, median, p5, p25, p75 or p95 of the metric across paths")
+    half_width: float = Field(0.01, gt=0, description="Wanted confidence-interval half-width")
+    relative: bool = Field(True, description="Whether half_width is relative to the estimate")
+
+class AdaptiveEnsembleRequest(SimulationRequest):
+    targets: List[PrecisionTargetRequest] = Field(..., min_length=1, description="Precision to reach on each metric")
+    confidence: float = Field(0.95, gt=0, lt=1, description="Confidence level of the intervals")
+    batch_paths: int = Field(1024, gt=0, le=20000, description="Paths simulated per batch, at least")
+    max_paths: int = Field(100000, gt=0, le=100000, description="Budget of simulated paths")
+    ruin_balance_percent: float = Field(50, gt=0, lt=100, description="A path is ruined once its balance falls to this percentage of the initial balance")
+
+class SweepRequest(SimulationRequest):
+    n_paths: int = Field(1000, gt=0, le=20000, description="Number of simulated paths per grid point")
+    risk_per_trade_percent_grid: Optional[List[float]] = Field(None, min_length=1, max_length=25, description="Risk per trade values to sweep")
+    risk_reward_ratio_grid: Optional[List[float]] = Field(None, min_length=1, max_length=25, description="Risk to reward ratios to sweep")
+    win_rate_grid: Optional[List[float]] = Field(None, min_length=1, max_length=25, description="Win rates to sweep")
+    ruin_balance_percent: float = Field(50, gt=0, lt=100, description="A path is ruined once its balance falls to this percentage of the initial balance")
+
+class RiskOptimizationRequest(SimulationRequest):
+    risk_per_trade_percent: float = Field(1.0, gt=0, le=10, description="Ignored; the optimizer searches it")
+    n_paths: int = Field(2000, gt=0, le=20000, description="Number of simulated paths per evaluated risk")
+    max_drawdown_percent: float = Field(20, gt=0, lt=100, description="Limit on the 95th percentile of the max drawdown")
+    min_risk_percent: float = Field(0.1, gt=0, le=10, description="Lower end of the searched risk per trade")
+    max_risk_percent: float = Field(10, gt=0, le=10, description="Upper end of the searched risk per trade")
+
+class FinalBalanceRequest(SimulationRequest):
+    threshold: Optional[float] = Field(None, gt=0, description="Report the probability of ending below this balance")
+
 class SimulationResponse(BaseModel):
     simulation_id: str
     status: str
@@ -91,48 +184,115 @@ class SimulationMetricsResponse(BaseModel):
     largest_win: float
     largest_loss: float
 
+class EnsembleResponse(BaseModel):
+    n_paths: int
+    seed: int
+    dates: List[str]
+    balance_percentiles: Dict[str, List[float]]
+    drawdown_percentiles: Dict[str, List[float]]
+    metrics: Dict[str, Dict[str, Optional[float]]]
+    variance_reduction: Optional[Dict[str, Any]] = None
+    streaks: Optional[Dict[str, Dict[str, Any]]] = None
+    first_passage: Optional[Dict[str, Dict[str, Any]]] = None
+    checkpoints: Optional[List[Dict[str, Any]]] = None
+
+class AdaptiveEnsembleResponse(EnsembleResponse):
+    converged: bool
+    confidence: float
+    precision: List[Dict[str, Any]]
+
+class SweepResponse(BaseModel):
+    n_paths: int
+    seed: int
+    axes: Dict[str, List[float]]
+    ruin_balance_percent: float
+    median_final_balance: List[List[List[float]]]
+    p95_max_drawdown_percent: List[List[List[float]]]
+    ruin_probability: List[List[List[float]]]
+
+class RiskOptimizationResponse(BaseModel):
+    n_paths: int
+    seed: int
+    max_drawdown_limit: float
+    risk_per_trade_percent: Optional[float]
+    drawdown_bound: bool
+    profile: Dict[str, float]
+    evaluations: List[Dict[str, float]]
+
+class FinalBalanceResponse(BaseModel):
+    method: str
+    n_trading_days: int
+    quantiles: Dict[str, float]
+    expected_final_balance: float
+    expected_log_growth: float
+    threshold: Optional[float]
+    probability_below: Optional[float]
+    n_paths: Optional[int]
+
+class StoredEnsembleResponse(BaseModel):
+    job_id: str
+    n_paths: int
+    n_days: int
+    seed: int
+    dates: List[str]
+    metrics: Dict[str, Dict[str, Optional[float]]]
+
 class SimulationControlRequest(BaseModel):
     action: str  # "pause", "resume", "stop", "speed_up", "slow_down"
 
 # Global simulation manager
 class SimulationManager:
+    # Trading days between two persisted snapshots of a live run
+    SNAPSHOT_INTERVAL_DAYS = 20
+
     def __init__(self):
         self.active_simulations: Dict[str, Dict] = {}
         self.websocket_connections: Dict[str, WebSocket] = {}
     
-    async def start_simulation(self, simulation_id: str, params: TradeParameters, websocket: WebSocket, db: Session, user_id: int):
-        """Start a new simulation"""
-        simulator = MonteCarloTradingSimulator(params)
-        
-        # Create initial simulation record
+    async def start_simulation(self, simulation_id: str, params: TradeParameters, websocket: WebSocket, db: Session, user_id: int,
+                               simulator: Optional[MonteCarloTradingSimulator] = None):
+        """Start a new simulation, or continue the one restored from a snapshot"""
         service = SimulationService(db)
-        await service.create_simulation({
-            "simulation_id": simulation_id,
-            "user_id": user_id,
-            "name": getattr(params, 'name', ''),
-            "description": getattr(params, 'description', ''),
-            "initial_balance": params.initial_balance,
-            "risk_per_trade_percent": params.risk_per_trade_percent,
-            "risk_reward_ratio": params.risk_reward_ratio,
-            "max_trades_per_day": params.max_trades_per_day,
-            "monthly_cashout_percent": params.monthly_cashout_percent,
-            "win_rate": params.win_rate,
-            "simulation_days": params.simulation_days
-        })
+        if simulator is None:
+            simulator = MonteCarloTradingSimulator(params)
+            # Create initial simulation record
+            await service.create_simulation({
+                "simulation_id": simulation_id,
+                "user_id": user_id,
+                "name": getattr(params, 'name', ''),
+                "description": getattr(params, 'description', ''),
+                "initial_balance": params.initial_balance,
+                "risk_per_trade_percent": params.risk_per_trade_percent,
+                "risk_reward_ratio": params.risk_reward_ratio,
+                "max_trades_per_day": params.max_trades_per_day,
+                "monthly_cashout_percent": params.monthly_cashout_percent,
+                "win_rate": params.win_rate,
+                "simulation_days": params.simulation_days
+            })
         
+        resume_event = asyncio.Event()
+        resume_event.set()
         self.active_simulations[simulation_id] = {
             "simulator": simulator,
             "status": "running",
             "speed": 0.5,
             "current_day": 0,
-            "task": None
+            "task": None,
+            "resume_event": resume_event
         }
         
         self.websocket_connections[simulation_id] = websocket
+
+        # A run restored from a snapshot without history only has the days from here on
+        first_day = 0 if simulator.keep_history else simulator.days_simulated
+        resumed_results: List[DailyResult] = []
         
         # Create progress callback
         async def progress_callback(day: int, daily_result: DailyResult):
-            self.active_simulations[simulation_id]["current_day"] = day
+            simulation = self.active_simulations[simulation_id]
+            simulation["current_day"] = day
+            if not simulator.keep_history:
+                resumed_results.append(daily_result)
             
             # Send real-time update to frontend
             await websocket.send_json({
@@ -153,12 +313,26 @@ class SimulationManager:
                 }
             })
             
-            # Respect simulation speed
-            speed = self.active_simulations[simulation_id]["speed"]
+            # Pausing suspends the run between two days; its snapshot, history included, is
+            # persisted so that it can also be resumed after a restart. Live runs persist a
+            # snapshot every few days too, without the history, which would make each
+            # write grow with the run; a run resumed from one continues without history
+            if simulation["status"] == "paused":
+                await service.save_snapshot(simulation_id, simulator.snapshot())
+                await websocket.send_json({"type": "simulation_paused", "day": day})
+                await simulation["resume_event"].wait()
+                await websocket.send_json({"type": "simulation_resumed", "day": day})
+            elif simulator.days_simulated % self.SNAPSHOT_INTERVAL_DAYS == 0:
+                await service.save_snapshot(simulation_id, simulator.snapshot(history=False))
+            
+            # Respect simulation speed; pacing lives here, the simulator itself never sleeps
+            speed = simulation["speed"]
             if speed < 1.0:
                 await asyncio.sleep(0.1 / speed)
             elif speed > 1.0:
                 await asyncio.sleep(0.001)  # Faster simulation
+            else:
+                await asyncio.sleep(0.01)
         
         # Start simulation task
         task = asyncio.create_task(simulator.run_simulation(progress_callback))
@@ -166,6 +340,8 @@ class SimulationManager:
         
         try:
             daily_results, metrics = await task
+            if not simulator.keep_history:
+                daily_results = resumed_results
             
             # Convert NumPy types to regular Python types
             def convert_numpy_types(obj):
@@ -184,7 +360,7 @@ class SimulationManager:
                 "final_balance": simulator.current_balance,
                 "total_pnl": simulator.current_balance - params.initial_balance,
                 "max_drawdown": simulator.max_drawdown,
-                "total_trades": len(simulator.all_trades),
+                "total_trades": metrics.total_trades,
                 "win_rate_actual": metrics.overall_win_rate,
                 "sharpe_ratio": convert_numpy_types(metrics.sharpe_ratio),
                 "profit_factor": convert_numpy_types(metrics.profit_factor),
@@ -227,6 +403,7 @@ class SimulationManager:
             # Send final results to WebSocket
             await websocket.send_json({
                 "type": "simulation_complete",
+                "first_day": first_day,
                 "daily_results": [
                     {
                         "date": r.date.isoformat(),
@@ -283,12 +460,12 @@ class SimulationManager:
         simulation = self.active_simulations[simulation_id]
         
         if action == "pause":
+            # The run suspends itself after the current day
             simulation["status"] = "paused"
-            if simulation["task"]:
-                simulation["task"].cancel()
+            simulation["resume_event"].clear()
         elif action == "resume":
             simulation["status"] = "running"
-            # Resume logic would be more complex in real implementation
+            simulation["resume_event"].set()
         elif action == "stop":
             simulation["status"] = "stopped"
             if simulation["task"]:
@@ -320,9 +497,15 @@ async def lifespan(app: FastAPI):
     finally:
         db.close()
     
+    # Warm up the simulation worker pool
+    start_executor()
+
+    # Drop the stored ensembles that expired while the server was down
+    sweep_stores()
+    
     yield
     # Shutdown
-    pass
+    shutdown_executor()
 
 # Create FastAPI app
 app = FastAPI(
@@ -380,24 +563,194 @@ async def db_health_check(db: Session = Depends(get_db)):
 @app.post("/simulation/start", response_model=SimulationResponse)
 async def start_simulation(request: SimulationRequest):
     """Start a new Monte Carlo simulation"""
+    # The request model validates the parameters; the run itself starts over the WebSocket
     simulation_id = str(uuid.uuid4())
     
-    # Convert request to TradeParameters
-    params = TradeParameters(
+    return SimulationResponse(
+        simulation_id=simulation_id,
+        status="created",
+        message="Simulation created. Connect via WebSocket to start."
+    )
+
+def regime_model(request: Optional[RegimeModelRequest]) -> Optional[RegimeModel]:
+    if request is None:
+        return None
+    try:
+        return RegimeModel(**request.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def outcome_distribution(request: TradeModelRequest) -> Optional[OutcomeDistribution]:
+    if request.outcomes is None:
+        return None
+    if request.regimes is not None:
+        raise HTTPException(status_code=422, detail="regimes and outcomes both set the win rate; use one of them")
+    try:
+        return OutcomeDistribution(**request.outcomes.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _trade_parameters(request: SimulationRequest) -> TradeParameters:
+    """TradeParameters of a request, with its regimes, outcomes and risk rules when it has them"""
+    trade_model = {}
+    if isinstance(request, TradeModelRequest):
+        trade_model = dict(
+            regimes=regime_model(request.regimes),
+            outcomes=outcome_distribution(request),
+            risk_rules=RiskRules(**request.risk_rules.dict()) if request.risk_rules else None
+        )
+    return TradeParameters(
+        name=request.name,
+        description=request.description,
         initial_balance=request.initial_balance,
         risk_per_trade_percent=request.risk_per_trade_percent,
         risk_reward_ratio=request.risk_reward_ratio,
         max_trades_per_day=request.max_trades_per_day,
         monthly_cashout_percent=request.monthly_cashout_percent,
         win_rate=request.win_rate,
-        simulation_days=request.simulation_days
+        simulation_days=request.simulation_days,
+        seed=request.seed,
+        market_type=request.market_type.value,
+        **trade_model
     )
+
+@app.post("/simulation/ensemble", response_model=EnsembleResponse)
+async def run_ensemble_simulation(request: EnsembleRequest):
+    """Run many paths of the same parameters and return percentile bands and metric distributions"""
+    params = _trade_parameters(request)
     
-    return SimulationResponse(
-        simulation_id=simulation_id,
-        status="created",
-        message="Simulation created. Connect via WebSocket to start."
-    )
+    if request.checkpoint_days and not all(0 < day <= request.simulation_days for day in request.checkpoint_days):
+        raise HTTPException(status_code=422, detail=f"Checkpoint days must be within 1..{request.simulation_days}")
+
+    # Runs on the shared process pool so the event loop stays free for other requests
+    result = await run_ensemble_parallel(params, request.n_paths, sampling=request.sampling,
+                                         control_variate=request.control_variate, compact=request.compact,
+                                         streaks=request.streaks,
+                                         target_balance_percent=request.target_balance_percent,
+                                         ruin_balance_percent=request.ruin_balance_percent,
+                                         checkpoint_days=request.checkpoint_days)
+    return result.to_dict()
+
+@app.post("/simulation/ensemble/adaptive", response_model=AdaptiveEnsembleResponse)
+async def run_adaptive_ensemble_simulation(request: AdaptiveEnsembleRequest):
+    """Grow an ensemble batch by batch until the requested precision is reached or the budget runs out"""
+    params = _trade_parameters(request)
+    try:
+        targets = [PrecisionTarget(**target.dict()) for target in request.targets]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    result = await run_adaptive_ensemble_parallel(params, targets, request.batch_paths, request.max_paths,
+                                                  request.confidence, request.ruin_balance_percent)
+    return result.to_dict()
+
+@app.post("/simulation/sweep", response_model=SweepResponse)
+async def run_parameter_sweep(request: SweepRequest):
+    """Heatmaps of median final balance, P95 drawdown and ruin probability over a parameter grid.
+
+    Every grid point is evaluated on the same random draws, so neighbouring cells differ
+    by their parameters only.
+    """
+    params = _trade_parameters(request)
+    grids = (request.risk_per_trade_percent_grid, request.risk_reward_ratio_grid, request.win_rate_grid)
+    # Grid values get the same bounds as the single-valued fields
+    if any(not 0 < value <= 10 for value in request.risk_per_trade_percent_grid or []) \
+            or any(value <= 0 for value in request.risk_reward_ratio_grid or []) \
+            or any(not 0 < value < 1 for value in request.win_rate_grid or []):
+        raise HTTPException(status_code=422, detail="Grid values must be within the bounds of the simulation parameters")
+
+    result = await run_sweep_parallel(params, request.n_paths, *grids,
+                                      ruin_balance_percent=request.ruin_balance_percent)
+    return result.to_dict()
+
+@app.post("/simulation/optimize-risk", response_model=RiskOptimizationResponse)
+async def optimize_risk_per_trade(request: RiskOptimizationRequest):
+    """Risk per trade with the highest median growth whose P95 max drawdown stays within the limit"""
+    if request.min_risk_percent >= request.max_risk_percent:
+        raise HTTPException(status_code=422, detail="min_risk_percent must be below max_risk_percent")
+    params = _trade_parameters(request)
+
+    # The search is sequential, so it runs whole on one worker of the shared pool
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(get_executor(), optimize_risk, params, request.n_paths,
+                                        request.max_drawdown_percent, request.min_risk_percent,
+                                        request.max_risk_percent)
+    return result.to_dict()
+
+@app.post("/simulation/final-balance", response_model=FinalBalanceResponse)
+def solve_final_balance_distribution(request: FinalBalanceRequest):
+    """Exact final-balance quantiles and risk of ruin, sampled only when cashout makes them path dependent"""
+    params = _trade_parameters(request)
+    return solve_final_balance(params, threshold=request.threshold).to_dict()
+
+@app.post("/simulation/ensemble/stored", response_model=StoredEnsembleResponse)
+async def run_stored_ensemble_simulation(request: StoredEnsembleRequest, current_user: User = Depends(get_current_user)):
+    """Run an ensemble and keep its paths on disk for follow-up queries by the same user"""
+    params = _trade_parameters(request)
+    try:
+        stored = await run_stored_ensemble_parallel(params, request.n_paths, uuid.uuid4().hex, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return stored.summary()
+
+def open_stored_ensemble(job_id: str, user: User) -> StoredEnsemble:
+    """A stored ensemble of the user; those of other users are reported as missing"""
+    try:
+        stored = StoredEnsemble(job_id)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Stored ensemble not found")
+    if stored.owner_id != user.id:
+        raise HTTPException(status_code=404, detail="Stored ensemble not found")
+    return stored
+
+@app.get("/simulation/ensemble/{job_id}/bands")
+def get_stored_ensemble_bands(job_id: str, first_day: int = 0, last_day: Optional[int] = None,
+                              current_user: User = Depends(get_current_user)):
+    """Balance percentile bands of a stored ensemble over a range of trading days"""
+    stored = open_stored_ensemble(job_id, current_user)
+    try:
+        bands = stored.balance_bands(first_day, last_day)
+    except IndexError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    last_day = stored.n_days - 1 if last_day is None else last_day
+    return {"dates": stored.dates[first_day:last_day + 1], "balance_percentiles": bands}
+
+@app.get("/simulation/ensemble/{job_id}/paths/{path}")
+def get_stored_ensemble_path(job_id: str, path: int, current_user: User = Depends(get_current_user)):
+    """Daily ending balances of one path of a stored ensemble"""
+    stored = open_stored_ensemble(job_id, current_user)
+    try:
+        return {"dates": stored.dates, "ending_balance": stored.path(path)}
+    except IndexError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/simulation/ensemble/{job_id}/days/{day}")
+def get_stored_ensemble_day(job_id: str, day: int, current_user: User = Depends(get_current_user)):
+    """Distribution of the balance across the paths of a stored ensemble at one trading day"""
+    stored = open_stored_ensemble(job_id, current_user)
+    try:
+        distribution = stored.day_distribution(day)
+    except IndexError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"date": stored.dates[day], "balance": distribution}
+
+@app.get("/simulation/ensemble/{job_id}/first_passage")
+def get_stored_ensemble_first_passage(job_id: str, target_balance_percent: Optional[float] = Query(None, gt=0),
+                                      ruin_balance_percent: Optional[float] = Query(None, gt=0, lt=100),
+                                      current_user: User = Depends(get_current_user)):
+    """CDFs by trading day of the first time the paths of a stored ensemble reach a target or ruin balance"""
+    stored = open_stored_ensemble(job_id, current_user)
+    if target_balance_percent is None and ruin_balance_percent is None:
+        raise HTTPException(status_code=422, detail="Give target_balance_percent, ruin_balance_percent or both")
+    return {"dates": stored.dates, **stored.first_passage(target_balance_percent, ruin_balance_percent)}
+
+@app.delete("/simulation/ensemble/{job_id}")
+def delete_stored_ensemble(job_id: str, current_user: User = Depends(get_current_user)):
+    """Delete the files of a stored ensemble"""
+    open_stored_ensemble(job_id, current_user)
+    if not delete_store(job_id):
+        raise HTTPException(status_code=404, detail="Stored ensemble not found")
+    return {"status": "success"}
 
 @app.post("/simulation/{simulation_id}/control")
 async def control_simulation(simulation_id: str, control: SimulationControlRequest):
@@ -425,10 +778,10 @@ async def websocket_endpoint(websocket: WebSocket, simulation_id: str, db=Depend
     await websocket.accept()
     
     try:
-        # Wait for start message with auth token
+        # Wait for start (or resume) message with auth token
         data = await websocket.receive_json()
-        if data.get("type") != "start_simulation":
-            await websocket.send_json({"error": "Expected start_simulation message"})
+        if data.get("type") not in ("start_simulation", "resume_simulation"):
+            await websocket.send_json({"error": "Expected start_simulation or resume_simulation message"})
             return
         
         # Authenticate user
@@ -448,6 +801,28 @@ async def websocket_endpoint(websocket: WebSocket, simulation_id: str, db=Depend
             await websocket.send_json({"error": "Authentication failed"})
             return
         
+        if data["type"] == "resume_simulation":
+            # Continue a paused or interrupted run from its last persisted snapshot
+            if simulation_id in simulation_manager.active_simulations:
+                await websocket.send_json({"error": "Simulation is already running"})
+                return
+            record = await SimulationService(db).get_simulation(simulation_id)
+            if not record or record.user_id != user.id or record.snapshot is None:
+                await websocket.send_json({"error": "No resumable simulation found"})
+                return
+            simulator = MonteCarloTradingSimulator.from_snapshot(record.snapshot)
+            await websocket.send_json({
+                "type": "simulation_restored",
+                "days_simulated": simulator.days_simulated,
+                # Empty when the run was interrupted between two pauses: live runs persist
+                # their snapshot without history
+                "history": simulator.keep_history,
+                "daily_results": record.snapshot["daily_results"]
+            })
+            await simulation_manager.start_simulation(simulation_id, simulator.params, websocket, db, user.id,
+                                                      simulator=simulator)
+            return
+        
         # Get simulation parameters
         params_data = data.get("params")
         if not params_data:
@@ -527,15 +902,15 @@ async def websocket_endpoint(websocket: WebSocket, simulation_id: str, db=Depend
                     "final_balance": simulator.current_balance,
                     "total_pnl": simulator.current_balance - simulator.params.initial_balance,
                     "max_drawdown": simulator.max_drawdown,
-                    "total_trades": len(simulator.all_trades),
+                    "total_trades": metrics.total_trades,
                     "win_rate_actual": simulator.win_rate,
                     "sharpe_ratio": simulator.sharpe_ratio,
                     "profit_factor": simulator.profit_factor,
                     "daily_results": simulator.daily_results,
                     "metrics": {
-                        "total_trades": len(simulator.all_trades),
-                        "total_wins": len([t for t in simulator.all_trades if t["result"] == "win"]),
-                        "total_losses": len([t for t in simulator.all_trades if t["result"] == "loss"]),
+                        "total_trades": metrics.total_trades,
+                        "total_wins": int(simulator.trade_log.is_win.sum()),
+                        "total_losses": int((~simulator.trade_log.is_win).sum()),
                         "overall_win_rate": simulator.win_rate,
                         "total_pnl": simulator.current_balance - simulator.params.initial_balance,
                         "max_drawdown": simulator.max_drawdown,
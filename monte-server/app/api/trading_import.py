@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+from functools import partial
 import json
+import numpy as np
 import pandas as pd
 from io import StringIO
 
@@ -11,9 +15,25 @@ from app.models.user import User
 from app.utils.csv_parser import BinanceCSVParser, CSVValidator, detect_csv_type
 from app.services.auth_service import get_current_user
 from app.services.trading_analysis_service import TradingAnalysisService
+from app.services.bootstrap_service import BootstrapService
+from app.core.bootstrap import BootstrapSimulator
+from app.core.monte_carlo_simulator import TradeParameters
+from app.core.trading_calendar import MarketType
+from app.core.ensemble_executor import run_ensemble_parallel
 
 router = APIRouter(prefix="/trading", tags=["trading"])
 
+class BootstrapRequest(BaseModel):
+    initial_balance: float = Field(..., gt=0, description="Initial trading balance")
+    position_size_percent: float = Field(10, gt=0, le=100, description="Share of the balance put in every trade")
+    monthly_cashout_percent: float = Field(0, ge=0, le=100, description="Monthly profit realization percentage")
+    simulation_days: int = Field(365, gt=0, le=1095, description="Number of days to simulate")
+    n_paths: int = Field(1000, gt=0, le=100000, description="Number of simulated paths")
+    method: str = Field("iid", pattern="^(iid|block)$", description="iid or block bootstrap of the trade returns")
+    block_size: int = Field(5, gt=0, le=100, description="Consecutive trades per block of the block bootstrap")
+    seed: Optional[int] = Field(None, ge=0, description="Random seed; the same seed reproduces the same results")
+    market_type: MarketType = Field(MarketType.CRYPTO, description="Trading calendar of the history and the simulation")
+
 @router.post("/test-csv")
 async def test_csv_upload(file: UploadFile = File(...)):
     """CSV dosyasını test etmek için basit endpoint"""
@@ -387,4 +407,54 @@ async def get_analysis_by_id(
             "end": analysis.data_period_end.isoformat() if analysis.data_period_end else None
         },
         "total_trades_analyzed": analysis.total_trades_analyzed
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/bootstrap")
+async def bootstrap_simulation(
+    request: BootstrapRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Kullanıcının gerçekleşmiş işlem getirilerini yeniden örnekleyerek (bootstrap) bakiye yolları üretir"""
+    # The queries and the FIFO pairing of the fills block, so they run off the event loop
+    history = await run_in_threadpool(BootstrapService(db).get_trade_history, current_user.id)
+    if not len(history):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bootstrap için kapanmış işlem bulunamadı. Lütfen önce alım ve satımları içeren CSV dosyanızı yükleyin."
+        )
+
+    returns = history.returns
+    daily_trade_counts = history.daily_trade_counts(request.market_type)
+    # As in the bootstrap, a trade that doesn't gain is a loss
+    winning = returns > 0
+    average_win = returns[winning].mean() if np.any(winning) else 0.0
+    average_loss = -returns[~winning].mean() if not np.all(winning) else 0.0
+    # Closest fixed win rate / R:R description of the history; the bootstrap itself
+    # only uses the balance, horizon, cashout, calendar and seed
+    params = TradeParameters(
+        name="Bootstrap",
+        initial_balance=request.initial_balance,
+        risk_per_trade_percent=request.position_size_percent,
+        risk_reward_ratio=float(average_win / average_loss) if average_loss > 0 else 1.0,
+        max_trades_per_day=int(daily_trade_counts.max()),
+        monthly_cashout_percent=request.monthly_cashout_percent,
+        win_rate=history.win_rate,
+        simulation_days=request.simulation_days,
+        seed=request.seed,
+        market_type=request.market_type.value
+    )
+    simulator = partial(BootstrapSimulator, history=history, position_size_percent=request.position_size_percent,
+                        method=request.method, block_size=request.block_size)
+
+    result = await run_ensemble_parallel(params, request.n_paths, simulator=simulator)
+    return {
+        **result.to_dict(),
+        "history": {
+            "closed_trades": len(history),
+            "win_rate": history.win_rate,
+            "average_return": float(returns.mean()),
+            "trades_per_day": float(daily_trade_counts.mean())
+        }
+    }
@@ -0,0 +1,245 @@
+import math
+import os
+import tempfile
+import numpy as np
+from dataclasses import dataclass, replace
+from datetime import datetime
+from statistics import NormalDist
+from typing import List, Dict, Optional, Tuple
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    PATH_BLOCK_SIZE,
+    trading_calendar_for
+)
+from app.core.ensemble import BAND_PERCENTILES, EnsembleResult, METRIC_FIELDS, metric_distribution
+
+# Trading days reduced at once when the bands are computed from the spilled balances
+BAND_CHUNK_DAYS = 64
+
+# Per-path indicator of the balance falling to the ruin level; its mean is the ruin probability
+RUIN_METRIC = "ruin"
+STATISTICS = ("mean", "median", "p5", "p25", "p75", "p95")
+
+
+@dataclass
+class PrecisionTarget:
+    """Wanted confidence-interval half-width of one statistic of one metric across paths.
+
+    The half-width is relative to the estimate by default (0.01 is +/-1%); absolute
+    targets suit probabilities close to zero, like the ruin probability.
+    """
+    metric: str
+    statistic: str = "median"
+    half_width: float = 0.01
+    relative: bool = True
+
+    def __post_init__(self):
+        if self.metric not in METRIC_FIELDS and self.metric != RUIN_METRIC:
+            raise ValueError(f"Unknown metric: {self.metric}")
+        if self.statistic not in STATISTICS:
+            raise ValueError(f"Unknown statistic: {self.statistic}")
+        if self.half_width <= 0:
+            raise ValueError("half_width must be positive")
+
+
+@dataclass
+class AdaptiveEnsembleResult(EnsembleResult):
+    """Ensemble that was grown until its precision targets were met or its budget ran out"""
+    converged: bool = False
+    confidence: float = 0.95
+    precision: Optional[List[Dict]] = None
+
+    def to_dict(self) -> Dict:
+        result = super().to_dict()
+        result.update({
+            "converged": self.converged,
+            "confidence": self.confidence,
+            "precision": self.precision
+        })
+        return result
+
+
+def confidence_interval(values: np.ndarray, statistic: str, z: float) -> Tuple[float, float]:
+    """Estimate and confidence-interval half-width of a statistic over paths.
+
+    Means use the normal approximation, Wilson's interval for 0/1 indicators so that a
+    probability of zero still needs enough paths; quantiles use the distribution-free
+    interval between order statistics.
+    """
+    values = values[np.isfinite(values)]
+    n = values.size
+    if n == 0:
+        return math.nan, math.inf
+    if statistic == "mean":
+        estimate = float(values.mean())
+        if np.all((values == 0) | (values == 1)):
+            spread = math.sqrt(estimate * (1 - estimate) / n + z * z / (4 * n * n))
+            return estimate, z * spread / (1 + z * z / n)
+        return estimate, z * float(values.std(ddof=1)) / math.sqrt(n) if n > 1 else math.inf
+
+    q = 0.5 if statistic == "median" else int(statistic[1:]) / 100
+    ordered = np.sort(values)
+    spread = z * math.sqrt(n * q * (1 - q))
+    lower = math.floor(n * q - spread)
+    upper = math.ceil(n * q + spread)
+    if lower < 0 or upper >= n:
+        return float(np.quantile(ordered, q)), math.inf
+    return float(np.quantile(ordered, q)), float(ordered[upper] - ordered[lower]) / 2
+
+
+class AdaptiveEnsemble:
+    """Sequential stopping state of an ensemble grown batch by batch.
+
+    Paths are numbered as in one large ensemble with the same seed, so a run that stops
+    after n paths holds exactly the first n paths of that ensemble.
+
+    Only the per-path values the precision checks need are kept in memory, in arrays
+    sized for max_paths: the metrics and the lowest balance of every path. The daily
+    balances go to a temporary (days, paths) file that the final bands are reduced from,
+    a few days at a time; close() deletes it.
+    """
+
+    def __init__(self, params: TradeParameters, targets: List[PrecisionTarget], batch_paths: int = 1024,
+                 max_paths: int = 100000, confidence: float = 0.95, ruin_balance_percent: float = 50.0):
+        if not targets:
+            raise ValueError("At least one precision target is required")
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if params.seed is None:
+            params = replace(params, seed=np.random.SeedSequence().entropy)
+        self.params = params
+        self.targets = targets
+        self.batch_paths = max(PATH_BLOCK_SIZE, -(-batch_paths // PATH_BLOCK_SIZE) * PATH_BLOCK_SIZE)
+        self.max_paths = max_paths
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.ruin_balance = params.initial_balance * ruin_balance_percent / 100
+        self.n_paths = 0
+        self.precision: List[Dict] = []
+        self._metrics: Dict[str, np.ndarray] = {}
+        self._min_balance = np.empty(max_paths)
+        self._balance_path: Optional[str] = None
+        self._balances: Optional[np.ndarray] = None
+
+    @property
+    def converged(self) -> bool:
+        return bool(self.precision) and all(report["met"] for report in self.precision)
+
+    def next_batch(self) -> Optional[Tuple[int, int]]:
+        """(first_path, n_paths) of the next batch, or None once the run should stop"""
+        if self.converged or self.n_paths >= self.max_paths:
+            return None
+        n_paths = self.batch_paths
+        if self.precision:
+            # The half-width shrinks like 1/sqrt(n): aim straight for the slowest target
+            ratio = max(report["relative_half_width" if report["relative"] else "half_width"] / report["target"]
+                        for report in self.precision)
+            if math.isfinite(ratio):
+                wanted = math.ceil(self.n_paths * ratio * ratio * 1.1) - self.n_paths
+                n_paths = max(n_paths, -(-wanted // PATH_BLOCK_SIZE) * PATH_BLOCK_SIZE)
+        return self.n_paths, min(n_paths, self.max_paths - self.n_paths)
+
+    def add_batch(self, ending_balance: np.ndarray, metrics: Dict[str, np.ndarray]):
+        """Add the next paths: their (paths, days) balances and per-path metrics"""
+        if self._balances is None:
+            fd, self._balance_path = tempfile.mkstemp(suffix=".npy")
+            os.close(fd)
+            self._balances = np.lib.format.open_memmap(self._balance_path, mode='w+', dtype=np.float64,
+                                                       shape=(ending_balance.shape[1], self.max_paths))
+            self._metrics = {name: np.empty(self.max_paths, dtype=values.dtype) for name, values in metrics.items()}
+        paths = slice(self.n_paths, self.n_paths + ending_balance.shape[0])
+        self._balances[:, paths] = ending_balance.T
+        for name, values in metrics.items():
+            self._metrics[name][paths] = values
+        self._min_balance[paths] = np.min(ending_balance, axis=1, initial=np.inf)
+        self.n_paths = paths.stop
+        self.precision = self._precision_report()
+
+    def close(self):
+        """Delete the spilled balances; the ensemble can't produce its result afterwards"""
+        self._balances = None
+        if self._balance_path is not None:
+            os.remove(self._balance_path)
+            self._balance_path = None
+
+    def _values(self, metric: str) -> np.ndarray:
+        if metric == RUIN_METRIC:
+            return (self._min_balance[:self.n_paths] <= self.ruin_balance).astype(float)
+        return self._metrics[metric][:self.n_paths].astype(float)
+
+    def _bands(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """Balance and drawdown percentile bands of the paths so far, BAND_CHUNK_DAYS days at a time"""
+        n_days = self._balances.shape[0]
+        balance_bands = np.empty((len(BAND_PERCENTILES), n_days))
+        drawdown_bands = np.empty((len(BAND_PERCENTILES), n_days))
+        # The running peak of every path is carried from one chunk of days to the next
+        peak_balance = np.full(self.n_paths, self.params.initial_balance)
+        for start in range(0, n_days, BAND_CHUNK_DAYS):
+            rows = np.asarray(self._balances[start:start + BAND_CHUNK_DAYS, :self.n_paths])
+            peaks = np.maximum(np.maximum.accumulate(rows, axis=0), peak_balance)
+            peak_balance = peaks[-1]
+            days = slice(start, start + len(rows))
+            balance_bands[:, days] = np.percentile(rows, BAND_PERCENTILES, axis=1)
+            drawdown_bands[:, days] = np.percentile((peaks - rows) / peaks * 100, BAND_PERCENTILES, axis=1)
+        return ({f"p{q}": band for q, band in zip(BAND_PERCENTILES, balance_bands)},
+                {f"p{q}": band for q, band in zip(BAND_PERCENTILES, drawdown_bands)})
+
+    def _precision_report(self) -> List[Dict]:
+        report = []
+        for target in self.targets:
+            estimate, half_width = confidence_interval(self._values(target.metric), target.statistic, self.z)
+            relative_half_width = half_width / abs(estimate) if estimate else math.inf
+            achieved = relative_half_width if target.relative else half_width
+            report.append({
+                "metric": target.metric,
+                "statistic": target.statistic,
+                "estimate": estimate,
+                "half_width": half_width,
+                "relative_half_width": relative_half_width,
+                "relative": target.relative,
+                "target": target.half_width,
+                "met": achieved <= target.half_width
+            })
+        return report
+
+    def result(self, start_date: datetime) -> AdaptiveEnsembleResult:
+        balance_bands, drawdown_bands = self._bands()
+        return AdaptiveEnsembleResult(
+            params=self.params,
+            n_paths=self.n_paths,
+            seed=self.params.seed,
+            start_date=start_date,
+            calendar=trading_calendar_for(self.params, start_date),
+            balance_bands=balance_bands,
+            drawdown_bands=drawdown_bands,
+            metric_distributions={name: metric_distribution(self._metrics[name][:self.n_paths])
+                                  for name in METRIC_FIELDS},
+            converged=self.converged,
+            confidence=self.confidence,
+            precision=[
+                # JSON has no infinity; a target that could not be estimated reports None
+                {key: (None if isinstance(value, float) and not math.isfinite(value) else value)
+                 for key, value in report.items()}
+                for report in self.precision
+            ]
+        )
+
+
+def run_adaptive_ensemble(params: TradeParameters, targets: List[PrecisionTarget], batch_paths: int = 1024,
+                          max_paths: int = 100000, confidence: float = 0.95, ruin_balance_percent: float = 50.0,
+                          start_date: Optional[datetime] = None) -> AdaptiveEnsembleResult:
+    """Simulate batches of paths until every precision target is met or max_paths is reached"""
+    ensemble = AdaptiveEnsemble(params, targets, batch_paths, max_paths, confidence, ruin_balance_percent)
+    start_date = start_date or datetime.now()
+    try:
+        batch = ensemble.next_batch()
+        while batch is not None:
+            first_path, n_paths = batch
+            result = VectorizedMonteCarloSimulator(ensemble.params, n_paths, first_path=first_path).run(start_date)
+            ensemble.add_batch(result.ending_balance, result.metrics)
+            batch = ensemble.next_batch()
+        return ensemble.result(start_date)
+    finally:
+        ensemble.close()
@@ -0,0 +1,165 @@
+import math
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    daily_trade_count_pmf,
+    expected_final_balance,
+    trading_calendar_for
+)
+from app.core.ensemble import BAND_PERCENTILES
+
+# (wins, losses) outcomes less likely than this are dropped; the mass they carry in
+# total stays far below the resolution of any reported probability
+MIN_OUTCOME_PROBABILITY = 1e-16
+# Half-width of the wins window around its mean, in standard deviations
+WINS_WINDOW_SIGMAS = 12
+# Paths of the ensemble used when the final balance is path dependent
+FALLBACK_PATHS = 10000
+
+
+@dataclass
+class FinalBalanceDistribution:
+    """Distribution of the final balance of one run, solved exactly or estimated by sampling"""
+    method: str                         # "analytic" or "sampled"
+    n_trading_days: int
+    quantiles: Dict[str, float]         # p5 ... p95 of the final balance
+    expected_final_balance: float
+    expected_log_growth: float          # E[log(final balance / initial balance)]
+    threshold: Optional[float] = None
+    probability_below: Optional[float] = None
+    n_paths: Optional[int] = None       # size of the ensemble when sampled
+
+    def to_dict(self) -> Dict:
+        return {
+            'method': self.method,
+            'n_trading_days': self.n_trading_days,
+            'quantiles': self.quantiles,
+            'expected_final_balance': self.expected_final_balance,
+            'expected_log_growth': self.expected_log_growth,
+            'threshold': self.threshold,
+            'probability_below': self.probability_below,
+            'n_paths': self.n_paths,
+        }
+
+
+def is_path_independent(params: TradeParameters) -> bool:
+    """Whether the final balance depends only on the number of wins and losses.
+
+    Cashouts depend on the balance at each month end, and a loss factor <= 0 stops
+    trading once the account is wiped out, so both need the full path. A regime model
+    makes the days dependent, an outcome distribution has more than two trade factors
+    and risk rules react to the path, so all of them are sampled as well.
+    """
+    return (params.monthly_cashout_percent <= 0 and params.risk_per_trade_percent < 100
+            and params.regimes is None and params.outcomes is None and params.risk_rules is None)
+
+
+def trade_count_pmf(max_trades: int, n_trading_days: int) -> np.ndarray:
+    """Distribution of the total number of trades over n_trading_days, by FFT convolution"""
+    daily = daily_trade_count_pmf(max_trades)
+    size = n_trading_days * max_trades + 1
+    if size == 1:
+        return np.ones(1)
+    fft_size = 1 << (size - 1).bit_length()
+    pmf = np.fft.irfft(np.fft.rfft(daily, fft_size) ** n_trading_days, fft_size)[:size]
+    np.clip(pmf, 0, None, out=pmf)
+    return pmf / pmf.sum()
+
+
+def _discrete_quantiles(values: np.ndarray, probabilities: np.ndarray, levels: Sequence[float]) -> np.ndarray:
+    """Inverse CDF of a discrete distribution at each level"""
+    order = np.argsort(values, kind='stable')
+    cdf = np.cumsum(probabilities[order])
+    cdf /= cdf[-1]
+    index = np.minimum(np.searchsorted(cdf, levels, side='left'), len(cdf) - 1)
+    return values[order][index]
+
+
+def _outcome_distribution(params: TradeParameters, n_trading_days: int):
+    """Probabilities of every likely (trades, wins) pair, as flat arrays"""
+    win_rate = params.win_rate
+    n_pmf = trade_count_pmf(params.max_trades_per_day, n_trading_days)
+    trades = np.flatnonzero(n_pmf > MIN_OUTCOME_PROBABILITY)
+    if win_rate <= 0 or win_rate >= 1:
+        return trades, trades * int(win_rate >= 1), n_pmf[trades]
+
+    # Wins given the trade count are Binomial(trades, win rate); only a window around the
+    # mean carries any probability
+    half_width = math.ceil(WINS_WINDOW_SIGMAS * math.sqrt(trades[-1] * win_rate * (1 - win_rate))) + 1
+    wins = np.rint(trades * win_rate).astype(np.int64)[:, None] + np.arange(-half_width, half_width + 1)
+    valid = (wins >= 0) & (wins <= trades[:, None])
+    wins = np.clip(wins, 0, trades[:, None])
+    losses = trades[:, None] - wins
+
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, trades[-1] + 1)))])
+    log_binomial = (log_factorial[trades][:, None] - log_factorial[wins] - log_factorial[losses]
+                    + wins * math.log(win_rate) + losses * math.log(1 - win_rate))
+    probability = np.where(valid, n_pmf[trades][:, None] * np.exp(log_binomial), 0)
+
+    likely = probability > MIN_OUTCOME_PROBABILITY
+    return np.broadcast_to(trades[:, None], wins.shape)[likely], wins[likely], probability[likely]
+
+
+def solve_final_balance(params: TradeParameters, threshold: Optional[float] = None,
+                        start_date: Optional[datetime] = None,
+                        fallback_paths: int = FALLBACK_PATHS) -> FinalBalanceDistribution:
+    """Exact final-balance distribution of a run, or an ensemble estimate when it is path dependent.
+
+    Without cashout, the final balance is initial * win_factor^wins * loss_factor^losses:
+    the trade count over the run is the sum of the capped Poisson daily counts and the
+    wins given the trade count are binomial, so the distribution is a finite mixture.
+    """
+    start_date = start_date or datetime.now()
+    n_trading_days = len(trading_calendar_for(params, start_date))
+    if not is_path_independent(params):
+        return _sample_final_balance(params, threshold, start_date, n_trading_days, fallback_paths)
+
+    initial_balance = params.initial_balance
+    risk_fraction = params.risk_per_trade_percent / 100
+    log_win_factor = math.log1p(risk_fraction * params.risk_reward_ratio)
+    log_loss_factor = math.log1p(-risk_fraction)
+
+    trades, wins, probability = _outcome_distribution(params, n_trading_days)
+    log_growth = wins * log_win_factor + (trades - wins) * log_loss_factor
+    levels = np.array(BAND_PERCENTILES) / 100
+    quantiles = initial_balance * np.exp(_discrete_quantiles(log_growth, probability, levels))
+
+    mean_trades = n_trading_days * float(np.dot(np.arange(params.max_trades_per_day + 1),
+                                                daily_trade_count_pmf(params.max_trades_per_day)))
+    probability_below = None
+    if threshold is not None:
+        below = initial_balance * np.exp(log_growth) < threshold
+        probability_below = min(float(probability[below].sum() / probability.sum()), 1.0)
+
+    return FinalBalanceDistribution(
+        method="analytic",
+        n_trading_days=n_trading_days,
+        quantiles={f"p{p}": float(q) for p, q in zip(BAND_PERCENTILES, quantiles)},
+        expected_final_balance=expected_final_balance(params, n_trading_days),
+        expected_log_growth=mean_trades * (params.win_rate * log_win_factor + (1 - params.win_rate) * log_loss_factor),
+        threshold=threshold,
+        probability_below=probability_below
+    )
+
+
+def _sample_final_balance(params: TradeParameters, threshold: Optional[float], start_date: datetime,
+                          n_trading_days: int, n_paths: int) -> FinalBalanceDistribution:
+    final_balance = VectorizedMonteCarloSimulator(params, n_paths).run(start_date).metrics['final_balance']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_growth = np.log(np.maximum(final_balance, 0) / params.initial_balance)
+    return FinalBalanceDistribution(
+        method="sampled",
+        n_trading_days=n_trading_days,
+        quantiles={f"p{p}": float(q) for p, q in
+                   zip(BAND_PERCENTILES, np.percentile(final_balance, BAND_PERCENTILES, method='inverted_cdf'))},
+        expected_final_balance=float(final_balance.mean()),
+        expected_log_growth=float(log_growth.mean()),
+        threshold=threshold,
+        probability_below=float(np.mean(final_balance < threshold)) if threshold is not None else None,
+        n_paths=n_paths
+    )
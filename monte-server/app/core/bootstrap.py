@@ -0,0 +1,191 @@
+import math
+import numpy as np
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    compound_balances
+)
+from app.core.trading_calendar import MarketType, get_trading_calendar
+
+BOOTSTRAP_METHODS = ("iid", "block")
+
+
+@dataclass(frozen=True, eq=False)
+class TradeHistory:
+    """Realized trades of a user, reduced to the compact arrays the bootstrap resamples"""
+    returns: np.ndarray    # (n_trades,) return of every closed position on its cost basis, in close order
+    closed_on: np.ndarray  # (n_trades,) datetime64[D] close date of every trade
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    @property
+    def win_rate(self) -> float:
+        return float(np.mean(self.returns > 0)) if len(self) else 0.0
+
+    def daily_trade_counts(self, market_type: MarketType = MarketType.EQUITIES) -> np.ndarray:
+        """Closed trades on every trading day of the history, idle days included.
+
+        Trades closed on a day the market is shut count towards the next trading day.
+        """
+        if not len(self):
+            return np.zeros(1, dtype=np.int64)
+        first_day = self.closed_on.min()
+        offsets = (self.closed_on - first_day).astype(np.int64)
+        calendar = get_trading_calendar(first_day.item(), int(offsets.max()) + 1, market_type)
+        if not len(calendar):
+            return np.array([len(self)])
+        day = np.minimum(np.searchsorted(calendar.day_offsets, offsets), len(calendar) - 1)
+        return np.bincount(day, minlength=len(calendar))
+
+
+def trade_history_from_fills(fills: Iterable) -> TradeHistory:
+    """Pair buy and sell fills into closed positions, first in first out per symbol.
+
+    Fills are TradingData rows or anything with the same attributes. Every fill that
+    reduces an open position closes one trade, whose return is its profit after
+    commissions over the cost basis of the quantity it closed. Commissions are only
+    deducted when they are paid in the quote asset of the symbol.
+    """
+    open_lots: Dict[str, deque] = defaultdict(deque)  # [signed quantity, price, fee per unit]
+    returns = []
+    closed_on = []
+    for fill in sorted(fills, key=lambda fill: fill.trade_time):
+        if not fill.quantity or not fill.price:
+            continue
+        side = getattr(fill.side, 'value', fill.side)
+        remaining = fill.quantity if side == 'BUY' else -fill.quantity
+        paid_in_quote = fill.commission_asset and fill.symbol.endswith(fill.commission_asset)
+        fee_per_unit = (fill.commission or 0.0) / fill.quantity if paid_in_quote else 0.0
+
+        lots = open_lots[fill.symbol]
+        pnl = 0.0
+        cost_basis = 0.0
+        while remaining and lots and (lots[0][0] > 0) != (remaining > 0):
+            lot = lots[0]
+            direction = 1 if lot[0] > 0 else -1  # a long lot is closed by a sell
+            matched = min(abs(remaining), abs(lot[0]))
+            pnl += direction * matched * (fill.price - lot[1]) - matched * (lot[2] + fee_per_unit)
+            cost_basis += matched * lot[1]
+            lot[0] -= direction * matched
+            remaining += direction * matched
+            if math.isclose(lot[0], 0, abs_tol=1e-12):
+                lots.popleft()
+        if cost_basis > 0:
+            returns.append(pnl / cost_basis)
+            closed_on.append(np.datetime64(fill.trade_time.date(), 'D'))
+        if not math.isclose(remaining, 0, abs_tol=1e-12):
+            lots.append([remaining, fill.price, fee_per_unit])
+
+    history = TradeHistory(
+        returns=np.array(returns, dtype=float),
+        closed_on=np.array(closed_on, dtype='M8[D]')
+    )
+    history.returns.setflags(write=False)
+    history.closed_on.setflags(write=False)
+    return history
+
+
+class BootstrapSimulator(VectorizedMonteCarloSimulator):
+    """Batch engine that resamples realized trade returns instead of drawing win/loss outcomes.
+
+    Each trading day takes a trade count drawn from the daily counts of the history, and
+    each trade moves the balance by position_size_percent of it times a resampled return:
+    independently for "iid", or read in order from circular blocks of block_size
+    consecutive historical trades for "block", which keeps short-range dependence such as
+    streaks. TradeParameters only provide the balance, horizon, cashout, calendar and seed.
+    """
+    def __init__(self, params: TradeParameters, n_paths: int, history: TradeHistory,
+                 position_size_percent: float = 100.0, method: str = "iid", block_size: int = 5,
+                 first_path: int = 0, streaks: bool = False, checkpoint_days: Optional[Sequence[int]] = None):
+        super().__init__(params, n_paths, first_path=first_path, streaks=streaks, checkpoint_days=checkpoint_days)
+        if not len(history):
+            raise ValueError("The trade history has no closed trades")
+        if method not in BOOTSTRAP_METHODS:
+            raise ValueError(f"method must be one of {', '.join(BOOTSTRAP_METHODS)}")
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.history = history
+        self.position_fraction = position_size_percent / 100
+        self.method = method
+        self.block_size = block_size
+        self.daily_trade_counts = history.daily_trade_counts(MarketType(params.market_type))
+
+    def _resample_returns(self, rng: np.random.Generator, trades_taken: np.ndarray, max_trades: int) -> np.ndarray:
+        """(trade slots, paths, days) historical returns of every trade"""
+        returns = self.history.returns
+        n_paths, n_days = trades_taken.shape
+        if self.method == "iid":
+            return returns[rng.integers(0, len(returns), (max_trades, n_paths, n_days))]
+
+        # Every path reads its trades in order from a sequence of circular blocks
+        n_trades = int(trades_taken.sum(axis=1).max())
+        starts = rng.integers(0, len(returns), (n_paths, -(-n_trades // self.block_size)))
+        sequence = (starts[:, :, None] + np.arange(self.block_size)).reshape(n_paths, -1) % len(returns)
+        first_trade = np.cumsum(trades_taken, axis=1) - trades_taken
+        order = np.minimum(first_trade + np.arange(max_trades)[:, None, None], sequence.shape[1] - 1)
+        return returns[sequence[np.arange(n_paths)[:, None], order]]
+
+    def _simulate_block(self, rng: np.random.Generator, n_paths: int, cashout_days: np.ndarray) -> Dict[str, np.ndarray]:
+        params = self.params
+        n_days = len(cashout_days)
+        counts = self.daily_trade_counts
+        trades_taken = counts[rng.integers(0, len(counts), (n_paths, n_days))].astype(np.int16)
+        max_trades = int(trades_taken.max(initial=0))
+        taken = np.arange(max_trades)[:, None, None] < trades_taken
+
+        trade_returns = self._resample_returns(rng, trades_taken, max_trades) if max_trades else np.zeros(taken.shape)
+        trade_returns = np.where(taken, trade_returns, 0)
+        # A position can lose at most the balance it was sized from
+        step = np.maximum(trade_returns * self.position_fraction, -1)
+        winning = taken & (trade_returns > 0)
+        losing = taken & ~winning
+        wins = winning.sum(axis=0, dtype=np.int16)
+        losses = losing.sum(axis=0, dtype=np.int16)
+
+        balances = compound_balances(np.prod(1 + step, axis=0), cashout_days, params.initial_balance,
+                                     params.monthly_cashout_percent)
+        starting_balance = balances['starting_balance']
+        ending_balance = balances['ending_balance']
+
+        # Walk the trade slots for each trade's profit from the balance in front of it
+        balance = starting_balance.copy()
+        gross_profit = np.zeros(n_paths)
+        gross_loss = np.zeros(n_paths)
+        largest_win = np.zeros(n_paths)
+        largest_loss = np.zeros(n_paths)
+        daily_amounts = self._daily_trade_amounts(n_paths, n_days)
+        for slot in range(max_trades):
+            pnl = balance * step[slot]
+            win_pnl = np.where(winning[slot], pnl, 0)
+            loss_pnl = np.where(losing[slot], -pnl, 0)
+            gross_profit += win_pnl.sum(axis=1)
+            gross_loss += loss_pnl.sum(axis=1)
+            np.maximum(largest_win, win_pnl.max(axis=1, initial=0), out=largest_win)
+            np.maximum(largest_loss, loss_pnl.max(axis=1, initial=0), out=largest_loss)
+            self._add_trade_slot(daily_amounts, win_pnl, loss_pnl)
+            balance += pnl
+
+        return {
+            'starting_balance': starting_balance,
+            'ending_balance': ending_balance,
+            'trades_taken': trades_taken,
+            'wins': wins,
+            'losses': losses,
+            'total_trades': wins.sum(axis=1) + losses.sum(axis=1),
+            'total_wins': wins.sum(axis=1),
+            'total_losses': losses.sum(axis=1),
+            'total_pnl': (ending_balance - starting_balance).sum(axis=1),
+            'total_cashout': balances['total_cashout'],
+            'final_balance': balances['final_balance'],
+            'gross_profit': gross_profit,
+            'gross_loss': gross_loss,
+            'largest_win': largest_win,
+            'largest_loss': largest_loss,
+            **self._block_streaks(winning, losing, wins, losses),
+            **self._checkpoint_trade_totals(daily_amounts)
+        }
@@ -0,0 +1,234 @@
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import List, Dict, Optional
+from datetime import datetime
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    SimulationMetrics,
+    BatchSimulationResult,
+    VectorizedMonteCarloSimulator,
+    PATH_BLOCK_SIZE,
+    checkpoint_trading_days,
+    expected_final_balance
+)
+from app.core.path_statistics import (
+    StreakStatistics,
+    drawdown_percent,
+    first_passage_day,
+    first_passage_cdf
+)
+from app.core.trading_calendar import TradingCalendar
+from app.core.variance_reduction import SamplingMethod, variance_reduction_report
+
+# Percentiles of the fan chart bands
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+METRIC_FIELDS = [field.name for field in fields(SimulationMetrics)]
+
+
+@dataclass
+class EnsembleResult:
+    """Percentile bands and metric distributions of many paths of one TradeParameters"""
+    params: TradeParameters
+    n_paths: int
+    seed: int
+    start_date: datetime
+    calendar: TradingCalendar
+    balance_bands: Dict[str, np.ndarray]   # "p5".."p95" -> (n_days,) ending balance
+    drawdown_bands: Dict[str, np.ndarray]  # "p5".."p95" -> (n_days,) drawdown in percent
+    metric_distributions: Dict[str, Dict[str, Optional[float]]]
+    variance_reduction: Optional[Dict] = None  # mean final balance estimate and its effective sample size
+    streaks: Optional[Dict[str, Dict]] = None  # "day"/"trade" -> longest streak distributions and histograms
+    first_passage: Optional[Dict[str, Dict]] = None  # "target"/"ruin" -> first-passage CDF by trading day
+    checkpoints: Optional[List[Dict]] = None  # metric distributions over the first n calendar days
+
+    def to_dict(self) -> Dict:
+        return {
+            "n_paths": self.n_paths,
+            "seed": self.seed,
+            "dates": [date.isoformat() for date in self.calendar.dates(self.start_date)],
+            "balance_percentiles": {name: band.tolist() for name, band in self.balance_bands.items()},
+            "drawdown_percentiles": {name: band.tolist() for name, band in self.drawdown_bands.items()},
+            "metrics": self.metric_distributions,
+            "variance_reduction": self.variance_reduction,
+            "streaks": self.streaks,
+            "first_passage": self.first_passage,
+            "checkpoints": self.checkpoints
+        }
+
+
+def _bands(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-day percentile bands of a (paths, days) matrix"""
+    if values.shape[1] == 0:
+        return {f"p{q}": np.empty(0) for q in BAND_PERCENTILES}
+    bands = np.percentile(values, BAND_PERCENTILES, axis=0)
+    return {f"p{q}": band for q, band in zip(BAND_PERCENTILES, bands)}
+
+
+def metric_distribution(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """Summary statistics of one metric across paths.
+
+    Non-finite values (e.g. the infinite profit factor of a path without losses) are
+    left out of the statistics and reported as a fraction instead.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    distribution: Dict[str, Optional[float]] = {
+        "non_finite_fraction": 1 - finite.size / values.size if values.size else 0.0
+    }
+    if finite.size == 0:
+        distribution.update({"mean": None, "std": None, "min": None, "max": None})
+        distribution.update({f"p{q}": None for q in BAND_PERCENTILES})
+        return distribution
+    distribution.update({
+        "mean": float(finite.mean()),
+        "std": float(finite.std()),
+        "min": float(finite.min()),
+        "max": float(finite.max())
+    })
+    for q, value in zip(BAND_PERCENTILES, np.percentile(finite, BAND_PERCENTILES)):
+        distribution[f"p{q}"] = float(value)
+    return distribution
+
+
+def streak_summary(streaks: StreakStatistics) -> Dict:
+    """Distributions of the longest streaks across paths, and the number of streaks of each length"""
+    return {
+        "longest_winning": metric_distribution(streaks.longest_winning),
+        "longest_losing": metric_distribution(streaks.longest_losing),
+        "winning_counts": streaks.winning_counts.tolist(),
+        "losing_counts": streaks.losing_counts.tolist()
+    }
+
+
+def first_passage_summary(first_day: np.ndarray, n_days: int, balance: float) -> Dict:
+    """CDF of the first day a level is crossed, with the paths censored at the horizon.
+
+    All paths share the same horizon, so the empirical CDF needs no survival estimator:
+    censored paths simply never enter it, and the median day is None when fewer than
+    half of the paths cross.
+    """
+    cdf = first_passage_cdf(first_day, n_days)
+    crossed = first_day[first_day >= 0]
+    probability = float(cdf[-1]) if n_days else 0.0
+    return {
+        "balance": balance,
+        "probability": probability,
+        "censored_fraction": 1 - probability,
+        "median_day": int(np.argmax(cdf >= 0.5)) if probability >= 0.5 else None,
+        "mean_day_if_crossed": float(crossed.mean()) if crossed.size else None,
+        "cdf": cdf.tolist()
+    }
+
+
+def first_passage_report(ending_balance: np.ndarray, initial_balance: float,
+                         target_balance_percent: Optional[float] = None,
+                         ruin_balance_percent: Optional[float] = None) -> Optional[Dict[str, Dict]]:
+    """Time to reach target_balance_percent and to fall to ruin_balance_percent of the initial balance"""
+    n_days = ending_balance.shape[1]
+    report = {}
+    if target_balance_percent is not None:
+        target = initial_balance * target_balance_percent / 100
+        report["target"] = first_passage_summary(first_passage_day(ending_balance, target), n_days, target)
+    if ruin_balance_percent is not None:
+        ruin = initial_balance * ruin_balance_percent / 100
+        report["ruin"] = first_passage_summary(first_passage_day(ending_balance, ruin, above=False), n_days, ruin)
+    return report or None
+
+
+def checkpoint_summaries(calendar: TradingCalendar, start_date: datetime,
+                         checkpoints: Dict[int, Dict[str, np.ndarray]]) -> List[Dict]:
+    """Metric distributions at every checkpoint, with the last trading day it covers"""
+    days = sorted(checkpoints)
+    summaries = []
+    for day, n_trading_days in zip(days, checkpoint_trading_days(calendar, days)):
+        summaries.append({
+            "days": day,
+            "trading_days": n_trading_days,
+            "last_date": calendar.date(n_trading_days - 1, start_date).isoformat() if n_trading_days else None,
+            "metrics": {name: metric_distribution(checkpoints[day][name]) for name in METRIC_FIELDS}
+        })
+    return summaries
+
+
+def final_balance_control(params: TradeParameters, metrics: Dict[str, np.ndarray]) -> Optional[np.ndarray]:
+    """Per-path balance the wins and losses of a path compound to, without cashout.
+
+    Its mean is known exactly (expected_final_balance) and it tracks the final balance
+    closely, which makes it a control variate; None when a loss can wipe out the account
+    and cut trading short, when a regime model or risk rules leave its mean unknown, or
+    when an outcome distribution makes a path's balance more than its wins and losses.
+    """
+    risk_fraction = params.risk_per_trade_percent / 100
+    if (risk_fraction >= 1 or params.regimes is not None or params.outcomes is not None
+            or params.risk_rules is not None):
+        return None
+    log_factor = (metrics['total_wins'] * np.log1p(risk_fraction * params.risk_reward_ratio)
+                  + metrics['total_losses'] * np.log1p(-risk_fraction))
+    return params.initial_balance * np.exp(log_factor)
+
+
+def summarize_paths(params: TradeParameters, seed: int, start_date: datetime, calendar: TradingCalendar,
+                    ending_balance: np.ndarray, metrics: Dict[str, np.ndarray],
+                    sampling: SamplingMethod = SamplingMethod.PLAIN,
+                    control_variate: bool = False,
+                    streaks: Optional[Dict[str, StreakStatistics]] = None,
+                    target_balance_percent: Optional[float] = None,
+                    ruin_balance_percent: Optional[float] = None,
+                    checkpoints: Optional[Dict[int, Dict[str, np.ndarray]]] = None) -> EnsembleResult:
+    """Reduce (paths, days) ending balances and per-path metrics to bands and distributions.
+
+    For antithetic or stratified paths, or with control_variate, the result also reports
+    the mean final balance estimate and the effective sample size it is worth. With a
+    target or ruin balance, it reports when the paths first reach it, and with
+    checkpoints, the metric distributions over each of the shorter horizons.
+    """
+    variance_reduction = None
+    if sampling != SamplingMethod.PLAIN or control_variate:
+        control = final_balance_control(params, metrics) if control_variate else None
+        variance_reduction = {
+            "sampling": SamplingMethod(sampling).value,
+            "control_variate": control is not None,
+            "metric": "final_balance",
+            **variance_reduction_report(
+                metrics['final_balance'], sampling, PATH_BLOCK_SIZE, control,
+                expected_final_balance(params, len(calendar)) if control is not None else None
+            )
+        }
+    return EnsembleResult(
+        params=params,
+        n_paths=ending_balance.shape[0],
+        seed=seed,
+        start_date=start_date,
+        calendar=calendar,
+        balance_bands=_bands(ending_balance),
+        drawdown_bands=_bands(drawdown_percent(ending_balance, params.initial_balance)),
+        metric_distributions={name: metric_distribution(metrics[name]) for name in METRIC_FIELDS},
+        variance_reduction=variance_reduction,
+        streaks={level: streak_summary(stats) for level, stats in streaks.items()} if streaks else None,
+        first_passage=first_passage_report(ending_balance, params.initial_balance,
+                                           target_balance_percent, ruin_balance_percent),
+        checkpoints=checkpoint_summaries(calendar, start_date, checkpoints) if checkpoints else None
+    )
+
+
+def summarize_batch(batch: BatchSimulationResult) -> EnsembleResult:
+    """Reduce a batch of simulated paths to fan chart bands and metric distributions"""
+    return summarize_paths(batch.params, batch.seed, batch.start_date, batch.calendar,
+                           batch.ending_balance, batch.metrics, streaks=batch.streaks,
+                           checkpoints=batch.checkpoints)
+
+
+def run_ensemble(params: TradeParameters, n_paths: int, start_date: Optional[datetime] = None,
+                 sampling: SamplingMethod = SamplingMethod.PLAIN, control_variate: bool = False,
+                 compact: bool = False, streaks: bool = False,
+                 target_balance_percent: Optional[float] = None,
+                 ruin_balance_percent: Optional[float] = None,
+                 checkpoint_days: Optional[List[int]] = None) -> EnsembleResult:
+    """Simulate n_paths paths of the same parameters and summarize them"""
+    batch = VectorizedMonteCarloSimulator(params, n_paths, sampling=sampling, compact=compact,
+                                          streaks=streaks, checkpoint_days=checkpoint_days).run(start_date)
+    return summarize_paths(batch.params, batch.seed, batch.start_date, batch.calendar,
+                           batch.ending_balance, batch.metrics, sampling, control_variate, batch.streaks,
+                           target_balance_percent, ruin_balance_percent, batch.checkpoints)
@@ -0,0 +1,268 @@
+import os
+import asyncio
+import multiprocessing
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from functools import partial
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    COMPACT_BALANCE_DTYPE,
+    PATH_BLOCK_SIZE,
+    STREAK_LEVELS,
+    trading_calendar_for
+)
+from app.core.path_statistics import StreakStatistics
+from app.core.ensemble import EnsembleResult, summarize_paths
+from app.core.adaptive import AdaptiveEnsemble, AdaptiveEnsembleResult, PrecisionTarget
+from app.core.sweep import SweepResult, sweep_axes, sweep_paths, summarize_sweep
+from app.core.variance_reduction import SamplingMethod
+from app.core.result_store import StoredEnsemble, create_store, write_shard, write_metadata
+
+# Worker processes of the shared pool; defaults to one per core
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "0")) or os.cpu_count() or 1
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_up_worker():
+    """Pay for the NumPy import and first-call overheads once per worker process"""
+    VectorizedMonteCarloSimulator(
+        TradeParameters(initial_balance=1000, risk_per_trade_percent=1, risk_reward_ratio=1,
+                        max_trades_per_day=1, simulation_days=7, seed=0),
+        1
+    ).run(datetime(2024, 1, 1))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Shared process pool, created on first use and kept warm between requests"""
+    global _executor
+    if _executor is None:
+        # Workers are spawned rather than forked from the threaded server process
+        _executor = ProcessPoolExecutor(
+            max_workers=SIMULATION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up_worker
+        )
+    return _executor
+
+
+def start_executor():
+    """Start every worker up front so the first ensemble request doesn't pay for it"""
+    executor = get_executor()
+    for future in [executor.submit(os.getpid) for _ in range(SIMULATION_WORKERS)]:
+        future.result()
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def plan_shards(n_paths: int, n_shards: int) -> List[Tuple[int, int]]:
+    """Split n_paths into at most n_shards (first_path, n_paths) shards of whole path blocks"""
+    n_blocks = -(-n_paths // PATH_BLOCK_SIZE)
+    n_shards = max(1, min(n_shards, n_blocks))
+    shards = []
+    first_block = 0
+    for shard in range(n_shards):
+        shard_blocks = n_blocks // n_shards + (1 if shard < n_blocks % n_shards else 0)
+        first_path = first_block * PATH_BLOCK_SIZE
+        last_path = min((first_block + shard_blocks) * PATH_BLOCK_SIZE, n_paths)
+        shards.append((first_path, last_path - first_path))
+        first_block += shard_blocks
+    return shards
+
+
+def simulate_shard(params: TradeParameters, first_path: int, n_paths: int, start_date: datetime,
+                   simulator: Callable[..., VectorizedMonteCarloSimulator] = VectorizedMonteCarloSimulator,
+                   balance_path: Optional[str] = None, first_row: int = 0
+                   ) -> Tuple[Optional[np.ndarray], Dict[str, np.ndarray], Optional[Dict[str, StreakStatistics]],
+                              Optional[Dict[int, Dict[str, np.ndarray]]]]:
+    """Run one shard and return only what the parent needs to merge.
+
+    That is the balances and metrics of its paths, plus their streaks and checkpoint
+    metrics when the simulator computes them. With balance_path, the balances are
+    written into rows first_row.. of that .npy matrix instead, and None is returned in
+    their place, so the (paths, days) matrix never goes through the pipe.
+
+    simulator builds the engine from (params, n_paths, first_path=...); it is pickled to
+    the worker, so it must be a class or a functools.partial of one.
+    """
+    batch = simulator(params, n_paths, first_path=first_path).run(start_date)
+    ending_balance = batch.ending_balance
+    if balance_path is not None:
+        balances = np.load(balance_path, mmap_mode='r+')
+        balances[first_row:first_row + n_paths] = ending_balance
+        balances.flush()
+        del balances
+        ending_balance = None
+    return ending_balance, batch.metrics, batch.streaks, batch.checkpoints
+
+
+def _create_balance_file(n_paths: int, n_days: int, dtype: np.dtype) -> str:
+    """Temporary (paths, days) .npy matrix for the shards to write their balances into"""
+    fd, path = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+    np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(n_paths, n_days)).flush()
+    return path
+
+
+async def _simulate_sharded(params: TradeParameters, first_path: int, n_paths: int, start_date: datetime,
+                            n_shards: Optional[int] = None,
+                            simulator: Callable[..., VectorizedMonteCarloSimulator] = VectorizedMonteCarloSimulator,
+                            dtype: np.dtype = np.float64
+                            ) -> Tuple[np.ndarray, Dict[str, np.ndarray], Optional[Dict[str, StreakStatistics]],
+                                       Optional[Dict[int, Dict[str, np.ndarray]]]]:
+    """Simulate paths first_path.. on the process pool and merge the shards in path order.
+
+    The workers write their (paths, days) balances of the given dtype straight into a
+    shared temporary file; only the per-path results are pickled back.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    n_days = len(trading_calendar_for(params, start_date))
+    balance_path = await loop.run_in_executor(None, _create_balance_file, n_paths, n_days, dtype)
+    try:
+        shards = await asyncio.gather(*[
+            loop.run_in_executor(executor, simulate_shard, params, first_path + shard_first, shard_paths,
+                                 start_date, simulator, balance_path, shard_first)
+            for shard_first, shard_paths in plan_shards(n_paths, n_shards or SIMULATION_WORKERS)
+        ])
+        ending_balance = await loop.run_in_executor(None, np.load, balance_path)
+    finally:
+        os.remove(balance_path)
+
+    metrics = {name: np.concatenate([shard[1][name] for shard in shards]) for name in shards[0][1]}
+    streaks = None
+    if shards[0][2] is not None:
+        streaks = {level: StreakStatistics.concatenate([shard[2][level] for shard in shards])
+                   for level in STREAK_LEVELS}
+    checkpoints = None
+    if shards[0][3] is not None:
+        checkpoints = {day: {name: np.concatenate([shard[3][day][name] for shard in shards])
+                             for name in shards[0][3][day]}
+                       for day in shards[0][3]}
+    return ending_balance, metrics, streaks, checkpoints
+
+
+async def run_ensemble_parallel(params: TradeParameters, n_paths: int,
+                                start_date: Optional[datetime] = None,
+                                n_shards: Optional[int] = None,
+                                simulator: Callable[..., VectorizedMonteCarloSimulator] = VectorizedMonteCarloSimulator,
+                                sampling: SamplingMethod = SamplingMethod.PLAIN,
+                                control_variate: bool = False,
+                                compact: bool = False,
+                                streaks: bool = False,
+                                target_balance_percent: Optional[float] = None,
+                                ruin_balance_percent: Optional[float] = None,
+                                checkpoint_days: Optional[List[int]] = None) -> EnsembleResult:
+    """Run an ensemble on the process pool, one shard of path blocks per worker.
+
+    The seed and the start date are fixed in the parent, so the merged result is
+    bit-identical to run_ensemble with the same seed, whatever the number of shards.
+    """
+    if sampling != SamplingMethod.PLAIN:
+        simulator = partial(simulator, sampling=sampling)
+    if compact:
+        simulator = partial(simulator, compact=True)
+    if streaks:
+        simulator = partial(simulator, streaks=True)
+    if checkpoint_days:
+        simulator = partial(simulator, checkpoint_days=checkpoint_days)
+    if params.seed is None:
+        params = replace(params, seed=np.random.SeedSequence().entropy)
+    start_date = start_date or datetime.now()
+
+    loop = asyncio.get_running_loop()
+    ending_balance, metrics, shard_streaks, checkpoints = await _simulate_sharded(
+        params, 0, n_paths, start_date, n_shards, simulator, COMPACT_BALANCE_DTYPE if compact else np.float64)
+    # Percentiles over the merged paths are cheap next to the simulation, but still
+    # kept off the event loop
+    calendar = trading_calendar_for(params, start_date)
+    return await loop.run_in_executor(None, summarize_paths, params, params.seed, start_date, calendar,
+                                      ending_balance, metrics, sampling, control_variate, shard_streaks,
+                                      target_balance_percent, ruin_balance_percent, checkpoints)
+
+
+async def run_stored_ensemble_parallel(params: TradeParameters, n_paths: int, job_id: str,
+                                       owner_id: Optional[int] = None,
+                                       start_date: Optional[datetime] = None,
+                                       n_shards: Optional[int] = None,
+                                       directory: Optional[str] = None) -> StoredEnsemble:
+    """Run an ensemble whose workers write their paths into a memory-mapped store.
+
+    Only the per-path metrics travel back to the parent; the balances stay on disk for
+    later queries through the returned StoredEnsemble, which records owner_id.
+    """
+    if params.seed is None:
+        params = replace(params, seed=np.random.SeedSequence().entropy)
+    start_date = start_date or datetime.now()
+    n_days = len(trading_calendar_for(params, start_date))
+    loop = asyncio.get_running_loop()
+    path = await loop.run_in_executor(None, create_store, job_id, n_days, n_paths, directory)
+
+    executor = get_executor()
+    shards = await asyncio.gather(*[
+        loop.run_in_executor(executor, write_shard, path, params, first_path, shard_paths, start_date)
+        for first_path, shard_paths in plan_shards(n_paths, n_shards or SIMULATION_WORKERS)
+    ])
+    metrics = {name: np.concatenate([shard[name] for shard in shards]) for name in shards[0]}
+    await loop.run_in_executor(None, write_metadata, job_id, params, start_date, metrics, owner_id, directory)
+    return StoredEnsemble(job_id, directory)
+
+
+async def run_sweep_parallel(params: TradeParameters, n_paths: int,
+                             risk_per_trade_percent: Optional[List[float]] = None,
+                             risk_reward_ratio: Optional[List[float]] = None,
+                             win_rate: Optional[List[float]] = None,
+                             ruin_balance_percent: float = 50.0,
+                             start_date: Optional[datetime] = None,
+                             n_shards: Optional[int] = None) -> SweepResult:
+    """Run a common-random-numbers parameter sweep on the process pool, sharded by path blocks"""
+    axes = sweep_axes(params, risk_per_trade_percent, risk_reward_ratio, win_rate)
+    if params.seed is None:
+        params = replace(params, seed=np.random.SeedSequence().entropy)
+    start_date = start_date or datetime.now()
+    calendar = trading_calendar_for(params, start_date)
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    shards = await asyncio.gather(*[
+        loop.run_in_executor(executor, sweep_paths, params, axes, calendar, first_path, shard_paths,
+                             ruin_balance_percent)
+        for first_path, shard_paths in plan_shards(n_paths, n_shards or SIMULATION_WORKERS)
+    ])
+
+    results = [np.concatenate([shard[index] for shard in shards], axis=-1) for index in range(3)]
+    return await loop.run_in_executor(None, summarize_sweep, params, start_date, calendar, axes,
+                                      ruin_balance_percent, *results)
+
+
+async def run_adaptive_ensemble_parallel(params: TradeParameters, targets: List[PrecisionTarget],
+                                         batch_paths: int = 1024, max_paths: int = 100000,
+                                         confidence: float = 0.95, ruin_balance_percent: float = 50.0,
+                                         start_date: Optional[datetime] = None) -> AdaptiveEnsembleResult:
+    """Adaptive-precision ensemble whose batches are sharded over the process pool"""
+    ensemble = AdaptiveEnsemble(params, targets, batch_paths, max_paths, confidence, ruin_balance_percent)
+    start_date = start_date or datetime.now()
+    loop = asyncio.get_running_loop()
+    try:
+        batch = ensemble.next_batch()
+        while batch is not None:
+            first_path, n_paths = batch
+            ending_balance, metrics, _, _ = await _simulate_sharded(ensemble.params, first_path, n_paths, start_date)
+            await loop.run_in_executor(None, ensemble.add_batch, ending_balance, metrics)
+            # The batch is on disk now; don't hold it while the next one is simulated
+            del ending_balance
+            batch = ensemble.next_batch()
+        return await loop.run_in_executor(None, ensemble.result, start_date)
+    finally:
+        ensemble.close()
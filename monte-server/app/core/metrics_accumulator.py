@@ -0,0 +1,135 @@
+import math
+from typing import Dict, List, Optional
+
+
+class ExactSum:
+    """Running float sum without rounding error, equal to math.fsum of all added values.
+
+    Keeps Shewchuk's non-overlapping partials, of which there are only ever a handful.
+    """
+
+    def __init__(self):
+        self._partials: List[float] = []
+
+    def add(self, value: float):
+        partials = []
+        for partial in self._partials:
+            if abs(value) < abs(partial):
+                value, partial = partial, value
+            high = value + partial
+            low = partial - (high - value)
+            if low:
+                partials.append(low)
+            value = high
+        partials.append(value)
+        self._partials = partials
+
+    @property
+    def value(self) -> float:
+        return math.fsum(self._partials)
+
+    @property
+    def partials(self) -> List[float]:
+        return list(self._partials)
+
+    @classmethod
+    def from_partials(cls, partials: List[float]) -> "ExactSum":
+        exact_sum = cls()
+        exact_sum._partials = [float(partial) for partial in partials]
+        return exact_sum
+
+
+class MetricsAccumulator:
+    """Online SimulationMetrics inputs, in constant memory whatever the length of the run.
+
+    Counts, gross profit/loss, extremes and streaks match _calculate_metrics exactly; the
+    daily return mean and variance use Welford's update, and _calculate_metrics reports
+    this Sharpe ratio as well.
+    """
+
+    def __init__(self):
+        self.total_trades = 0
+        self.total_wins = 0
+        self.total_pnl = ExactSum()
+        self.gross_profit = ExactSum()
+        self.gross_loss = ExactSum()
+        self.largest_win = 0.0
+        self.largest_loss = 0.0
+        # Welford state of the daily returns
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        # Day-level streaks
+        self.current_streak = 0
+        self.streak_type: Optional[str] = None
+        self.max_winning_streak = 0
+        self.max_losing_streak = 0
+
+    @property
+    def total_losses(self) -> int:
+        return self.total_trades - self.total_wins
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable state; exact sums keep their partials so nothing is rounded"""
+        state = {name: value for name, value in vars(self).items() if not isinstance(value, ExactSum)}
+        state.update({name: value.partials for name, value in vars(self).items() if isinstance(value, ExactSum)})
+        return state
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "MetricsAccumulator":
+        accumulator = cls()
+        for name, value in snapshot.items():
+            if isinstance(getattr(accumulator, name), ExactSum):
+                value = ExactSum.from_partials(value)
+            setattr(accumulator, name, value)
+        return accumulator
+
+    def add_trade(self, is_win: bool, pnl: float):
+        self.total_trades += 1
+        self.total_pnl.add(pnl)
+        if is_win:
+            self.total_wins += 1
+            self.gross_profit.add(pnl)
+            self.largest_win = max(self.largest_win, pnl)
+        else:
+            self.gross_loss.add(abs(pnl))
+            self.largest_loss = max(self.largest_loss, abs(pnl))
+
+    def add_day(self, starting_balance: float, daily_pnl: float, wins: int, losses: int):
+        if starting_balance > 0:
+            daily_return = daily_pnl / starting_balance
+            self.return_count += 1
+            delta = daily_return - self.return_mean
+            self.return_mean += delta / self.return_count
+            self.return_m2 += delta * (daily_return - self.return_mean)
+        self._update_streaks(wins, losses)
+
+    def _update_streaks(self, wins: int, losses: int):
+        if wins > 0 and losses == 0:
+            if self.streak_type == 'win':
+                self.current_streak += 1
+            else:
+                self.current_streak = 1
+                self.streak_type = 'win'
+        elif losses > 0 and wins == 0:
+            if self.streak_type == 'loss':
+                self.current_streak += 1
+            else:
+                self.current_streak = 1
+                self.streak_type = 'loss'
+        else:
+            # Mixed day or no trades - reset streak
+            self.current_streak = 0
+            self.streak_type = None
+
+        if self.streak_type == 'win':
+            self.max_winning_streak = max(self.max_winning_streak, self.current_streak)
+        elif self.streak_type == 'loss':
+            self.max_losing_streak = max(self.max_losing_streak, self.current_streak)
+
+    @property
+    def sharpe_ratio(self) -> float:
+        if self.return_count == 0:
+            return 0
+        std = math.sqrt(self.return_m2 / self.return_count)
+        return self.return_mean / std * math.sqrt(252) if std > 0 else 0
@@ -1,11 +1,29 @@
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Sequence, Tuple, Union
 from datetime import datetime, timedelta
 import asyncio
+import math
 from enum import Enum
 
+from app.core.trade_log import TradeLog
+from app.core.trading_calendar import MarketType, TradingCalendar, get_trading_calendar
+from app.core.metrics_accumulator import MetricsAccumulator
+from app.core.outcomes import OutcomeDistribution
+from app.core.regimes import RegimeModel, next_regime, sample_regimes
+from app.core.risk_rules import RiskRules, intraday_trades
+from app.core.variance_reduction import SamplingMethod, sample_uniforms
+from app.core import path_statistics
+from app.core.path_statistics import (
+    StreakStatistics,
+    running_peak,
+    drawdown_percent,
+    longest_run,
+    day_streaks,
+    trade_streaks
+)
+
 class TradeOutcome(Enum):
     WIN = "win"
     LOSS = "loss"
@@ -21,6 +39,21 @@ class TradeParameters:
     monthly_cashout_percent: float = 0.0  # % of profit to cash out monthly
     win_rate: float = 0.55  # Default win rate (slightly profitable)
     simulation_days: int = 365
+    seed: Optional[int] = None  # None draws fresh entropy for every run
+    market_type: str = MarketType.EQUITIES.value  # equities (Mon-Fri), crypto (24/7) or fx (Sun-Fri)
+    regimes: Optional[RegimeModel] = None  # overrides win_rate with a per-day regime when set
+    outcomes: Optional[OutcomeDistribution] = None  # overrides win_rate and risk_reward_ratio with R multiples when set
+    risk_rules: Optional[RiskRules] = None  # daily stops and drawdown risk cut, none by default
+
+    def __post_init__(self):
+        if isinstance(self.regimes, dict):
+            self.regimes = RegimeModel(**self.regimes)
+        if isinstance(self.outcomes, dict):
+            self.outcomes = OutcomeDistribution(**self.outcomes)
+        if isinstance(self.risk_rules, dict):
+            self.risk_rules = RiskRules(**self.risk_rules)
+        if self.regimes is not None and self.outcomes is not None:
+            raise ValueError("A regime model and an outcome distribution both set the win rate; use one of them")
 
 @dataclass
 class DailyResult:
@@ -56,26 +89,52 @@ class SimulationMetrics:
     largest_win: float
     largest_loss: float
 
+def trading_calendar_for(params: TradeParameters, start_date: datetime) -> TradingCalendar:
+    """Shared precomputed calendar of a run starting at start_date"""
+    return get_trading_calendar(start_date.date(), params.simulation_days, MarketType(params.market_type))
+
 class MonteCarloTradingSimulator:
-    def __init__(self, params: TradeParameters):
+    # Days simulated between two yields to the event loop in headless mode
+    HEADLESS_CHUNK_DAYS = 64
+    # Format of snapshot(); bumped whenever its content changes
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, params: TradeParameters, keep_history: bool = True):
         self.params = params
+        self.rng = np.random.default_rng(params.seed)
+        # Without history, neither daily results nor trades are kept and the metrics
+        # come from the online accumulator, in constant memory
+        self.keep_history = keep_history
         self.daily_results: List[DailyResult] = []
         self.current_balance = params.initial_balance
         self.peak_balance = params.initial_balance
         self.total_cashout = 0.0
-        self.current_streak = 0
-        self.streak_type = None
-        self.max_winning_streak = 0
-        self.max_losing_streak = 0
         self.max_drawdown = 0.0
         self.max_drawdown_duration = 0
         self.current_drawdown_duration = 0
-        # Trade tracking
-        self.all_trades: List[Dict] = []
+        # Trade tracking; days_simulated is also the index of the next trading day
+        self.days_simulated = 0
+        self.start_date: Optional[datetime] = None
+        # Regime of the current day, with a regime model
+        self.regime: Optional[int] = None
+        self.metrics_accumulator = MetricsAccumulator()
+        self.trade_log: Optional[TradeLog] = None
+        if keep_history:
+            expected_trades = params.max_trades_per_day * 0.7 * params.simulation_days * 5 / 7
+            self.trade_log = TradeLog(int(expected_trades * 1.1) + 16)
     
-    def simulate_single_trade(self) -> Tuple[TradeOutcome, float]:
-        is_win = np.random.random() < self.params.win_rate
-        risk_amount = self.current_balance * (self.params.risk_per_trade_percent / 100)
+    @property
+    def win_rate(self) -> float:
+        if self.regime is None:
+            return self.params.win_rate
+        return self.params.regimes.regimes[self.regime].win_rate
+
+    def simulate_single_trade(self, risk_multiplier: float = 1.0) -> Tuple[TradeOutcome, float]:
+        risk_amount = self.current_balance * (self.params.risk_per_trade_percent / 100) * risk_multiplier
+        if self.params.outcomes is not None:
+            r_multiple = float(self.params.outcomes.sample(np.array(self.rng.random())))
+            return (TradeOutcome.WIN if r_multiple > 0 else TradeOutcome.LOSS), risk_amount * r_multiple
+        is_win = self.rng.random() < self.win_rate
         if is_win:
             pnl = risk_amount * self.params.risk_reward_ratio
             return TradeOutcome.WIN, pnl
@@ -85,34 +144,38 @@ class MonteCarloTradingSimulator:
     
     def simulate_single_day(self, date: datetime) -> DailyResult:
         starting_balance = self.current_balance
-        daily_trades = []
         expected_trades = self.params.max_trades_per_day * 0.7 # to make it more realistic
-        num_trades = min(np.random.poisson(expected_trades), self.params.max_trades_per_day)
+        if self.params.regimes is not None:
+            self.regime = next_regime(self.params.regimes, self.regime, self.rng.random())
+            expected_trades *= self.params.regimes.regimes[self.regime].trade_frequency
+        num_trades = min(self.rng.poisson(expected_trades), self.params.max_trades_per_day)
         wins = 0
         losses = 0
         daily_pnl = 0.0
+        rules = self.params.risk_rules
+        risk_multiplier = 1.0
+        if rules is not None and rules.cuts_risk(starting_balance, self.peak_balance):
+            risk_multiplier = rules.drawdown_risk_multiplier
         
         for trade_idx in range(num_trades):
             if self.current_balance <= 0:
                 break
-            outcome, pnl = self.simulate_single_trade()
+            if rules is not None and rules.stops_day(losses, self.current_balance, starting_balance):
+                break
+            outcome, pnl = self.simulate_single_trade(risk_multiplier)
             self.current_balance += pnl
             daily_pnl += pnl
-            trade_record = {
-                'date': date,
-                'outcome': outcome,
-                'pnl': pnl,
-                'balance_after': self.current_balance
-            }
-            daily_trades.append(trade_record)
-            self.all_trades.append(trade_record)
+            self.metrics_accumulator.add_trade(outcome == TradeOutcome.WIN, pnl)
+            if self.trade_log is not None:
+                self.trade_log.append(self.days_simulated, outcome == TradeOutcome.WIN, pnl, self.current_balance)
             
             if outcome == TradeOutcome.WIN:
                 wins += 1
             else:
                 losses += 1
                 
-        self._update_streaks(wins,losses)
+        self.metrics_accumulator.add_day(starting_balance, daily_pnl, wins, losses)
+        self.days_simulated += 1
         
         if self.current_balance > self.peak_balance:
             self.peak_balance = self.current_balance
@@ -144,28 +207,13 @@ class MonteCarloTradingSimulator:
             max_drawdown_to_date=self.max_drawdown
         )
     
-    def _update_streaks(self, wins: int, losses: int):
-        if wins > 0 and losses == 0:
-            if self.streak_type == 'win':
-                self.current_streak += 1
-            else:
-                self.current_streak = 1
-                self.streak_type = 'win'
-        elif losses > 0 and wins == 0:
-            if self.streak_type == 'loss':
-                self.current_streak += 1
-            else:
-                self.current_streak = 1
-                self.streak_type = 'loss'
-        else:
-            # Mixed day or no trades - reset streak
-            self.current_streak = 0
-            self.streak_type = None
-        
-        if self.streak_type == 'win':
-            self.max_winning_streak = max(self.max_winning_streak, self.current_streak)
-        elif self.streak_type == 'loss':
-            self.max_losing_streak = max(self.max_losing_streak, self.current_streak)
+    @property
+    def max_winning_streak(self) -> int:
+        return self.metrics_accumulator.max_winning_streak
+
+    @property
+    def max_losing_streak(self) -> int:
+        return self.metrics_accumulator.max_losing_streak
     
     def handle_monthly_cashout(self, date: datetime):
         """Handle monthly profit realization"""
@@ -176,25 +224,122 @@ class MonteCarloTradingSimulator:
                 self.current_balance -= cashout_amount
                 self.total_cashout += cashout_amount
     
-    async def run_simulation(self, progress_callback=None) -> Tuple[List[DailyResult], SimulationMetrics]:
-        start_date = datetime.now()
-        for day in range(self.params.simulation_days):
-            current_date = start_date + timedelta(days=day)
-            # TODO: make this optional to choose crypto and fx
-            if current_date.weekday() >= 5:  # Saturday = 5, Sunday = 6
-                continue
-            daily_result = self.simulate_single_day(current_date)
+    def _simulate_trading_day(self, calendar: TradingCalendar, start_date: datetime, index: int) -> DailyResult:
+        """Simulate the index-th trading day of the calendar, with its monthly cashout"""
+        current_date = calendar.date(index, start_date)
+        daily_result = self.simulate_single_day(current_date)
+        if self.keep_history:
             self.daily_results.append(daily_result)
-            if current_date.day == 1:
-                self.handle_monthly_cashout(current_date)
+        if calendar.cashout_days[index]:
+            self.handle_monthly_cashout(current_date)
+        return daily_result
+
+    def iter_days(self, start_date: Optional[datetime] = None) -> Iterator[DailyResult]:
+        """Simulate lazily, one trading day per iteration.
+
+        Consumers can stream the days out and stop early; the days not iterated over
+        are never computed. Without history nothing accumulates in the simulator. A
+        simulator restored from a snapshot continues from its next day, on the calendar
+        of its original start date.
+        """
+        self.start_date = self.start_date or start_date or datetime.now()
+        calendar = trading_calendar_for(self.params, self.start_date)
+        for index in range(self.days_simulated, len(calendar)):
+            yield self._simulate_trading_day(calendar, self.start_date, index)
+
+    async def aiter_days(self, start_date: Optional[datetime] = None) -> AsyncIterator[DailyResult]:
+        """iter_days for the event loop, which gets control back every HEADLESS_CHUNK_DAYS days"""
+        for daily_result in self.iter_days(start_date):
+            yield daily_result
+            if self.days_simulated % self.HEADLESS_CHUNK_DAYS == 0:
+                await asyncio.sleep(0)
+
+    def metrics(self) -> SimulationMetrics:
+        """Metrics of the days simulated so far"""
+        return self._calculate_metrics()
+
+    def run(self, start_date: Optional[datetime] = None) -> Tuple[List[DailyResult], SimulationMetrics]:
+        """Headless run at full speed, for batch callers outside the event loop"""
+        for _ in self.iter_days(start_date):
+            pass
+        return self.daily_results, self._calculate_metrics()
+
+    async def run_simulation(self, progress_callback=None) -> Tuple[List[DailyResult], SimulationMetrics]:
+        """Run the simulation inside the event loop.
+
+        With a progress_callback the run is paced by the callback, which presents every
+        day (and sleeps as the live view needs). Without one the run is headless: days are
+        computed at full speed and the event loop only gets control back every
+        HEADLESS_CHUNK_DAYS trading days.
+        """
+        async for daily_result in self.aiter_days():
             if progress_callback:
-                await progress_callback(day, daily_result)
-            await asyncio.sleep(0.01)
+                await progress_callback((daily_result.date - self.start_date).days, daily_result)
         metrics = self._calculate_metrics()
         return self.daily_results, metrics
 
+    def snapshot(self, history: bool = True) -> Dict:
+        """JSON-serializable state of the run between two trading days.
+
+        Holds the balances, drawdown and streak counters, the random generator state and
+        the next day index, plus the history when it is kept: from_snapshot() continues
+        the run exactly as if it had never stopped. Without history the snapshot stays
+        the same size however long the run, and continues it without history, with the
+        metrics of the whole run from the accumulator.
+        """
+        keep_history = self.keep_history and history
+        rng_state = self.rng.bit_generator.state
+        return {
+            "version": self.SNAPSHOT_VERSION,
+            "params": asdict(self.params),
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "days_simulated": self.days_simulated,
+            "current_balance": float(self.current_balance),
+            "peak_balance": float(self.peak_balance),
+            "total_cashout": float(self.total_cashout),
+            "max_drawdown": float(self.max_drawdown),
+            "max_drawdown_duration": self.max_drawdown_duration,
+            "current_drawdown_duration": self.current_drawdown_duration,
+            "regime": self.regime,
+            # The 128-bit generator words don't fit a JSON number exactly
+            "rng_state": {**rng_state, "state": {key: str(value) for key, value in rng_state["state"].items()}},
+            "metrics_accumulator": self.metrics_accumulator.snapshot(),
+            "keep_history": keep_history,
+            "daily_results": [
+                {**asdict(result), "date": result.date.isoformat()} for result in self.daily_results
+            ] if keep_history else [],
+            "trades": self.trade_log.snapshot() if keep_history and self.trade_log is not None else None
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "MonteCarloTradingSimulator":
+        """Simulator that continues the run a snapshot() was taken from"""
+        # Version 1 snapshots predate regime models, and so never carry a regime
+        if snapshot.get("version") not in (1, cls.SNAPSHOT_VERSION):
+            raise ValueError(f"Unsupported simulation snapshot version: {snapshot.get('version')}")
+        simulator = cls(TradeParameters(**snapshot["params"]), keep_history=snapshot["keep_history"])
+        simulator.start_date = datetime.fromisoformat(snapshot["start_date"]) if snapshot["start_date"] else None
+        for name in ("days_simulated", "current_balance", "peak_balance", "total_cashout", "max_drawdown",
+                     "max_drawdown_duration", "current_drawdown_duration"):
+            setattr(simulator, name, snapshot[name])
+        simulator.regime = snapshot.get("regime")
+        rng_state = snapshot["rng_state"]
+        simulator.rng.bit_generator.state = {
+            **rng_state, "state": {key: int(value) for key, value in rng_state["state"].items()}
+        }
+        simulator.metrics_accumulator = MetricsAccumulator.from_snapshot(snapshot["metrics_accumulator"])
+        simulator.daily_results = [
+            DailyResult(**{**result, "date": datetime.fromisoformat(result["date"])})
+            for result in snapshot["daily_results"]
+        ]
+        if snapshot["trades"] is not None:
+            simulator.trade_log = TradeLog.from_snapshot(snapshot["trades"])
+        return simulator
+
     def _calculate_metrics(self) -> SimulationMetrics:
-        if not self.all_trades:
+        if self.trade_log is None:
+            return self._accumulated_metrics()
+        if not len(self.trade_log):
             return SimulationMetrics(
                 total_trades=0, total_wins=0, total_losses=0,
                 overall_win_rate=0, total_pnl=0, max_drawdown=0,
@@ -204,36 +349,30 @@ class MonteCarloTradingSimulator:
                 profit_factor=0, average_win=0, average_loss=0,
                 largest_win=0, largest_loss=0
             )
-        total_trades = len(self.all_trades)
-        wins = [t for t in self.all_trades if t['outcome'] == TradeOutcome.WIN]
-        losses = [t for t in self.all_trades if t['outcome'] == TradeOutcome.LOSS]
+        total_trades = len(self.trade_log)
+        is_win = self.trade_log.is_win
+        pnl = self.trade_log.pnl
         
-        total_wins = len(wins)
-        total_losses = len(losses)
+        total_wins = int(np.count_nonzero(is_win))
+        total_losses = total_trades - total_wins
         overall_win_rate = total_wins / total_trades if total_trades > 0 else 0
         
-        total_pnl = sum(t['pnl'] for t in self.all_trades)
-        win_amounts = [t['pnl'] for t in wins]
-        loss_amounts = [abs(t['pnl']) for t in losses]
+        total_pnl = math.fsum(pnl)
+        win_amounts = pnl[is_win]
+        loss_amounts = np.abs(pnl[~is_win])
         
-        average_win = np.mean(win_amounts) if win_amounts else 0
-        average_loss = np.mean(loss_amounts) if loss_amounts else 0
-        largest_win = max(win_amounts) if win_amounts else 0
-        largest_loss = max(loss_amounts) if loss_amounts else 0
+        gross_profit = math.fsum(win_amounts)
+        gross_loss = math.fsum(loss_amounts)
+        average_win = gross_profit / total_wins if total_wins else 0
+        average_loss = gross_loss / total_losses if total_losses else 0
+        largest_win = float(win_amounts.max()) if total_wins else 0
+        largest_loss = float(loss_amounts.max()) if total_losses else 0
         
         # Profit factor
-        gross_profit = sum(win_amounts) if win_amounts else 0
-        gross_loss = sum(loss_amounts) if loss_amounts else 0
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
         
-        if self.daily_results:
-            daily_returns = [r.daily_pnl / r.starting_balance for r in self.daily_results if r.starting_balance > 0]
-            if daily_returns:
-                sharpe_ratio = np.mean(daily_returns) / np.std(daily_returns) * np.sqrt(252) if np.std(daily_returns) > 0 else 0
-            else:
-                sharpe_ratio = 0
-        else:
-            sharpe_ratio = 0
+        # The daily returns are only reduced online, so both metric paths report the same Sharpe ratio
+        sharpe_ratio = self.metrics_accumulator.sharpe_ratio
         
         return SimulationMetrics(
             total_trades=total_trades,
@@ -255,6 +394,695 @@ class MonteCarloTradingSimulator:
             largest_loss=largest_loss
         )
 
+
+    def _accumulated_metrics(self) -> SimulationMetrics:
+        """Same metrics as _calculate_metrics, from the online accumulator"""
+        acc = self.metrics_accumulator
+        if acc.total_trades == 0:
+            return SimulationMetrics(
+                total_trades=0, total_wins=0, total_losses=0,
+                overall_win_rate=0, total_pnl=0, max_drawdown=0,
+                max_drawdown_duration=0, longest_winning_streak=0,
+                longest_losing_streak=0, total_cashout=0,
+                final_balance=self.current_balance, sharpe_ratio=0,
+                profit_factor=0, average_win=0, average_loss=0,
+                largest_win=0, largest_loss=0
+            )
+        gross_profit = acc.gross_profit.value
+        gross_loss = acc.gross_loss.value
+        return SimulationMetrics(
+            total_trades=acc.total_trades,
+            total_wins=acc.total_wins,
+            total_losses=acc.total_losses,
+            overall_win_rate=acc.total_wins / acc.total_trades,
+            total_pnl=acc.total_pnl.value,
+            max_drawdown=self.max_drawdown,
+            max_drawdown_duration=self.max_drawdown_duration,
+            longest_winning_streak=acc.max_winning_streak,
+            longest_losing_streak=acc.max_losing_streak,
+            total_cashout=self.total_cashout,
+            final_balance=self.current_balance,
+            sharpe_ratio=acc.sharpe_ratio,
+            profit_factor=gross_profit / gross_loss if gross_loss > 0 else float('inf'),
+            average_win=gross_profit / acc.total_wins if acc.total_wins else 0,
+            average_loss=gross_loss / acc.total_losses if acc.total_losses else 0,
+            largest_win=acc.largest_win,
+            largest_loss=acc.largest_loss
+        )
+
+# Paths per independent random stream of the vectorized engine
+PATH_BLOCK_SIZE = 256
+# Storage of the daily arrays in compact mode; balances still compound in float64
+COMPACT_BALANCE_DTYPE = np.float32
+COMPACT_COUNT_DTYPE = np.int8
+# Outcome levels the engine can report streaks at: winning/losing days and trades
+STREAK_LEVELS = ("day", "trade")
+# Per-path totals that need the individual trades, kept per day for checkpoint metrics
+CHECKPOINT_TRADE_TOTALS = ('gross_profit', 'gross_loss', 'largest_win', 'largest_loss')
+
+
+@dataclass
+class BatchSimulationResult:
+    """Daily arrays of shape (n_paths, n_trading_days) and per-path metric arrays"""
+    params: TradeParameters
+    start_date: datetime
+    calendar: TradingCalendar
+    starting_balance: np.ndarray
+    ending_balance: np.ndarray
+    trades_taken: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+    metrics: Dict[str, np.ndarray]  # SimulationMetrics field name -> (n_paths,) array
+    seed: int  # root entropy; rerunning with it as TradeParameters.seed reproduces the paths
+    first_path: int = 0
+    streaks: Optional[Dict[str, StreakStatistics]] = None  # "day"/"trade" -> streaks, when requested
+    checkpoints: Optional[Dict[int, Dict[str, np.ndarray]]] = None  # calendar days -> metrics over that prefix
+
+    @property
+    def n_paths(self) -> int:
+        return self.ending_balance.shape[0]
+
+    @property
+    def dates(self) -> List[datetime]:
+        return self.calendar.dates(self.start_date)
+
+    @property
+    def daily_pnl(self) -> np.ndarray:
+        return self.ending_balance - self.starting_balance
+
+    @property
+    def peak_balance(self) -> np.ndarray:
+        return running_peak(self.ending_balance, self.params.initial_balance)
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """Drawdown from the running peak, in percent"""
+        return drawdown_percent(self.ending_balance, self.params.initial_balance)
+
+    @property
+    def max_drawdown_to_date(self) -> np.ndarray:
+        return np.maximum.accumulate(self.peak_balance - self.ending_balance, axis=1)
+
+    def daily_results(self, path: int) -> List[DailyResult]:
+        """Rebuild the DailyResult list of a single path"""
+        initial_balance = self.params.initial_balance
+        starting_balance = self.starting_balance[path].tolist()
+        ending_balance = self.ending_balance[path].tolist()
+        trades_taken = self.trades_taken[path].tolist()
+        wins = self.wins[path].tolist()
+        losses = self.losses[path].tolist()
+        peak_balance = initial_balance
+        max_drawdown = 0.0
+        results = []
+        for day, date in enumerate(self.dates):
+            peak_balance = max(peak_balance, ending_balance[day])
+            max_drawdown = max(max_drawdown, peak_balance - ending_balance[day])
+            results.append(DailyResult(
+                date=date,
+                starting_balance=starting_balance[day],
+                ending_balance=ending_balance[day],
+                trades_taken=trades_taken[day],
+                wins=wins[day],
+                losses=losses[day],
+                daily_pnl=ending_balance[day] - starting_balance[day],
+                win_rate=wins[day] / trades_taken[day] if trades_taken[day] > 0 else 0,
+                cumulative_pnl=ending_balance[day] - initial_balance,
+                drawdown=(peak_balance - ending_balance[day]) / peak_balance * 100,
+                max_drawdown_to_date=max_drawdown
+            ))
+        return results
+
+    def path_metrics(self, path: int) -> SimulationMetrics:
+        """SimulationMetrics of a single path"""
+        return SimulationMetrics(**{name: values[path].item() for name, values in self.metrics.items()})
+
+
+def path_block_seeds(seed: int, first_block: int, n_blocks: int) -> List[np.random.SeedSequence]:
+    """Child seeds of consecutive path blocks, as SeedSequence(seed).spawn() would produce them.
+
+    Every block of PATH_BLOCK_SIZE paths draws from its own stream, so any shard made of
+    whole blocks reproduces exactly the paths it would get in a serial run.
+    """
+    return [np.random.SeedSequence(seed, spawn_key=(block,)) for block in range(first_block, first_block + n_blocks)]
+
+
+def daily_trade_count_pmf(max_trades: int, trade_frequency: float = 1.0) -> np.ndarray:
+    """Distribution of one day's trade count, min(Poisson(0.7 * max trades * trade frequency), max trades)"""
+    expected_trades = max_trades * 0.7 * trade_frequency  # to make it more realistic
+    pmf = np.empty(max_trades + 1)
+    pmf[0] = np.exp(-expected_trades)
+    for k in range(1, max_trades):
+        pmf[k] = pmf[k - 1] * expected_trades / k
+    # Every draw beyond the cap takes the maximum number of trades
+    pmf[max_trades] = max(1 - pmf[:max_trades].sum(), 0)
+    return pmf
+
+
+def trade_counts_from_uniforms(uniforms: np.ndarray, max_trades: int) -> np.ndarray:
+    """Daily trade counts, min(Poisson(0.7 * max trades), max trades), by inverse CDF of uniforms"""
+    cdf = np.cumsum(daily_trade_count_pmf(max_trades)[:-1])
+    return np.searchsorted(cdf, uniforms, side='right').astype(np.int16)
+
+
+def regime_trade_counts(uniforms: np.ndarray, regime: np.ndarray, max_trades: int,
+                        trade_frequencies: np.ndarray) -> np.ndarray:
+    """Daily trade counts by inverse CDF when every (path, day) has the trade frequency of its regime.
+
+    The days of each regime are looked up in that regime's CDF with one binary search,
+    so the cost does not grow with max_trades.
+    """
+    trades_taken = np.empty(uniforms.shape, dtype=np.int16)
+    for index, frequency in enumerate(trade_frequencies):
+        days = regime == index
+        cdf = np.cumsum(daily_trade_count_pmf(max_trades, frequency)[:-1])
+        trades_taken[days] = np.searchsorted(cdf, uniforms[days], side='right')
+    return trades_taken
+
+
+def draw_trade_counts(rng: np.random.Generator, max_trades: int, n_paths: int, n_days: int) -> np.ndarray:
+    """Daily trade counts, min(Poisson(0.7 * max trades), max trades), for (paths, days)"""
+    return trade_counts_from_uniforms(rng.random((n_paths, n_days)), max_trades)
+
+
+def expected_final_balance(params: TradeParameters, n_trading_days: int) -> float:
+    """E[final balance] without cashout: the trade count generating function at the mean trade factor"""
+    risk_fraction = params.risk_per_trade_percent / 100
+    if params.outcomes is not None:
+        mean_factor = 1 + risk_fraction * params.outcomes.expected_r
+    else:
+        mean_factor = params.win_rate * (1 + risk_fraction * params.risk_reward_ratio) + (1 - params.win_rate) * (1 - risk_fraction)
+    daily = daily_trade_count_pmf(params.max_trades_per_day)
+    return params.initial_balance * float(np.polyval(daily[::-1], mean_factor)) ** n_trading_days
+
+
+def compound_balances(day_factor: np.ndarray, cashout_days: np.ndarray, initial_balance: float,
+                      monthly_cashout_percent: float) -> Dict[str, np.ndarray]:
+    """Daily balances of (paths, days) growth factors, with the monthly cashout applied.
+
+    Balances compound within each month through a cumulative product; the cashout is
+    taken at month boundaries, from the end-of-day balance of the first trading day.
+    """
+    n_paths, n_days = day_factor.shape
+    starting_balance = np.empty((n_paths, n_days))
+    ending_balance = np.empty((n_paths, n_days))
+    balance = np.full(n_paths, initial_balance, dtype=float)
+    total_cashout = np.zeros(n_paths)
+    segment_ends = np.flatnonzero(cashout_days).tolist()
+    if n_days and (not segment_ends or segment_ends[-1] != n_days - 1):
+        segment_ends.append(n_days - 1)
+    segment_start = 0
+    for segment_end in segment_ends:
+        segment = slice(segment_start, segment_end + 1)
+        ending_balance[:, segment] = balance[:, None] * np.cumprod(day_factor[:, segment], axis=1)
+        starting_balance[:, segment_start] = balance
+        starting_balance[:, segment_start + 1:segment_end + 1] = ending_balance[:, segment_start:segment_end]
+        balance = ending_balance[:, segment_end].copy()
+        if cashout_days[segment_end] and monthly_cashout_percent > 0:
+            current_profit = balance - initial_balance
+            cashout_amount = np.where(current_profit > 0, current_profit * (monthly_cashout_percent / 100), 0)
+            balance -= cashout_amount
+            total_cashout += cashout_amount
+        segment_start = segment_end + 1
+
+    return {
+        'starting_balance': starting_balance,
+        'ending_balance': ending_balance,
+        'final_balance': balance,
+        'total_cashout': total_cashout,
+    }
+
+
+def drawdown_rule_balances(day_factor: np.ndarray, cut_day_factor: np.ndarray, cashout_days: np.ndarray,
+                           initial_balance: float, monthly_cashout_percent: float,
+                           rules: RiskRules) -> Dict[str, np.ndarray]:
+    """Daily balances when the days the drawdown rule cuts grow by cut_day_factor instead.
+
+    Whether a day is cut depends on the balance in front of it, so the days are walked
+    one by one, each step vectorized across the paths. A day starting wiped out does not
+    trade. Also returns the (paths, days) mask of the cut days.
+    """
+    n_paths, n_days = day_factor.shape
+    # Day-major, so that every step reads and writes contiguous rows
+    day_factor = np.ascontiguousarray(day_factor.T)
+    cut_day_factor = np.ascontiguousarray(cut_day_factor.T)
+    starting_balance = np.empty((n_days, n_paths))
+    ending_balance = np.empty((n_days, n_paths))
+    cut_days = np.empty((n_days, n_paths), dtype=bool)
+    balance = np.full(n_paths, initial_balance, dtype=float)
+    peak_balance = balance.copy()
+    total_cashout = np.zeros(n_paths)
+    for day in range(n_days):
+        starting_balance[day] = balance
+        cut_days[day] = rules.cuts_risk(balance, peak_balance)
+        factor = np.where(cut_days[day], cut_day_factor[day], day_factor[day])
+        np.multiply(balance, factor, out=balance, where=balance > 0)
+        ending_balance[day] = balance
+        np.maximum(peak_balance, balance, out=peak_balance)
+        if cashout_days[day] and monthly_cashout_percent > 0:
+            current_profit = balance - initial_balance
+            cashout_amount = np.where(current_profit > 0, current_profit * (monthly_cashout_percent / 100), 0)
+            balance = balance - cashout_amount
+            total_cashout += cashout_amount
+
+    return {
+        'starting_balance': np.ascontiguousarray(starting_balance.T),
+        'ending_balance': np.ascontiguousarray(ending_balance.T),
+        'final_balance': balance,
+        'total_cashout': total_cashout,
+        'cut_days': np.ascontiguousarray(cut_days.T),
+    }
+
+
+def checkpoint_trading_days(calendar: TradingCalendar, checkpoint_days: Sequence[int]) -> List[int]:
+    """Number of trading days within the first n calendar days of a run, for each checkpoint"""
+    return np.searchsorted(calendar.day_offsets, checkpoint_days).tolist()
+
+
+def batch_metrics(arrays: Dict[str, np.ndarray], initial_balance: float) -> Dict[str, np.ndarray]:
+    """Per-path SimulationMetrics arrays from the daily arrays and per-path totals of a batch"""
+    starting_balance = arrays['starting_balance']
+    ending_balance = arrays['ending_balance']
+    wins = arrays['wins']
+    losses = arrays['losses']
+
+    # Drawdowns are measured against the running peak, starting from the initial balance
+    peak_balance = running_peak(ending_balance, initial_balance)
+    max_drawdown = np.max(peak_balance - ending_balance, axis=1, initial=0)
+    # A day extends the drawdown duration unless it sets a new peak
+    max_drawdown_duration = path_statistics.max_drawdown_duration(ending_balance, initial_balance, peak_balance)
+
+    longest_winning_streak = longest_run((wins > 0) & (losses == 0))
+    longest_losing_streak = longest_run((losses > 0) & (wins == 0))
+
+    valid_days = starting_balance > 0
+    daily_returns = np.divide(ending_balance - starting_balance, starting_balance,
+                              out=np.zeros_like(starting_balance), where=valid_days)
+    if starting_balance.shape[1]:
+        # Accumulated in float64 even over compact float32 returns
+        mean_return = np.mean(daily_returns, axis=1, where=valid_days, dtype=np.float64)
+        std_return = np.std(daily_returns, axis=1, where=valid_days, dtype=np.float64)
+    else:
+        # A calendar without trading days, e.g. a weekend
+        mean_return = std_return = np.zeros(starting_balance.shape[0])
+    sharpe_ratio = np.divide(mean_return, std_return, out=np.zeros_like(mean_return), where=std_return > 0) * np.sqrt(252)
+
+    total_trades = arrays['total_trades']
+    total_wins = arrays['total_wins']
+    total_losses = arrays['total_losses']
+    gross_profit = arrays['gross_profit']
+    gross_loss = arrays['gross_loss']
+    has_trades = total_trades > 0
+
+    def traded(values):
+        # Paths without any trade report zeroed metrics, like _calculate_metrics
+        return np.where(has_trades, values, 0)
+
+    metrics = {
+        'total_trades': total_trades,
+        'total_wins': total_wins,
+        'total_losses': total_losses,
+        'overall_win_rate': total_wins / np.maximum(total_trades, 1),
+        'total_pnl': arrays['total_pnl'],
+        'max_drawdown': traded(max_drawdown),
+        'max_drawdown_duration': traded(max_drawdown_duration),
+        'longest_winning_streak': traded(longest_winning_streak),
+        'longest_losing_streak': traded(longest_losing_streak),
+        'total_cashout': traded(arrays['total_cashout']),
+        'final_balance': arrays['final_balance'],
+        'sharpe_ratio': traded(sharpe_ratio),
+        'profit_factor': traded(np.divide(gross_profit, gross_loss, out=np.full_like(gross_profit, np.inf), where=gross_loss > 0)),
+        'average_win': gross_profit / np.maximum(total_wins, 1),
+        'average_loss': gross_loss / np.maximum(total_losses, 1),
+        'largest_win': arrays['largest_win'],
+        'largest_loss': arrays['largest_loss'],
+    }
+    return metrics
+
+
+class VectorizedMonteCarloSimulator:
+    """Batch engine that simulates many paths of the same TradeParameters at once.
+
+    Trade counts and outcomes are drawn in bulk as (trade slots x paths x trading days)
+    arrays and balances follow from cumulative products of the daily growth factors, so
+    each path keeps the DailyResult/SimulationMetrics semantics of MonteCarloTradingSimulator
+    without a Python loop per trade. Antithetic or stratified sampling correlates the
+    uniforms of the paths within each block to reduce the variance of the ensemble.
+
+    In compact mode each block is still simulated in float64, but its daily balances are
+    kept as float32 and its daily counts as int8, which halves the memory of the batch
+    and of every pass over it, such as the percentile bands. With streaks, each block
+    also run-length encodes its day and trade outcomes while they are at hand.
+
+    checkpoint_days asks for the metrics of every path over its first n calendar days
+    too, as prefix reductions of the same paths: a 30-day checkpoint of a 1095-day run
+    is what a 30-day run would report if it had drawn those paths.
+
+    Risk rules stop days early through masks built slot by slot over all paths and days;
+    only a drawdown rule, which depends on the balance in front of each day, walks the
+    days, with both the full and the reduced risk version of every day at hand.
+    """
+    def __init__(self, params: TradeParameters, n_paths: int, first_path: int = 0,
+                 sampling: SamplingMethod = SamplingMethod.PLAIN, compact: bool = False,
+                 streaks: bool = False, checkpoint_days: Optional[Sequence[int]] = None):
+        if n_paths <= 0:
+            raise ValueError("n_paths must be positive")
+        if first_path % PATH_BLOCK_SIZE:
+            raise ValueError(f"first_path must be a multiple of {PATH_BLOCK_SIZE}")
+        if checkpoint_days and not all(0 < day <= params.simulation_days for day in checkpoint_days):
+            raise ValueError(f"Checkpoint days must be within 1..{params.simulation_days}")
+        self.params = params
+        self.n_paths = n_paths
+        self.first_path = first_path
+        self.sampling = SamplingMethod(sampling)
+        self.compact = compact
+        self.streaks = streaks
+        self.checkpoint_days = sorted(set(checkpoint_days or ()))
+        self._checkpoint_trading_days: List[int] = []
+        self.seed = params.seed if params.seed is not None else np.random.SeedSequence().entropy
+
+    def run(self, start_date: Optional[datetime] = None) -> BatchSimulationResult:
+        params = self.params
+        start_date = start_date or datetime.now()
+        calendar = trading_calendar_for(params, start_date)
+        self._checkpoint_trading_days = checkpoint_trading_days(calendar, self.checkpoint_days)
+
+        first_block = self.first_path // PATH_BLOCK_SIZE
+        n_blocks = -(-self.n_paths // PATH_BLOCK_SIZE)
+        blocks = [
+            self._compact_block(self._simulate_block(
+                np.random.default_rng(block_seed),
+                min(PATH_BLOCK_SIZE, self.n_paths - block * PATH_BLOCK_SIZE),
+                calendar.cashout_days
+            ))
+            for block, block_seed in enumerate(path_block_seeds(self.seed, first_block, n_blocks))
+        ]
+        streaks = None
+        if self.streaks:
+            streaks = {level: StreakStatistics.concatenate([block.pop(f'{level}_streaks') for block in blocks])
+                       for level in STREAK_LEVELS}
+        arrays = {name: np.concatenate([block[name] for block in blocks]) for name in blocks[0]}
+        metrics = batch_metrics(arrays, params.initial_balance)
+        checkpoints = None
+        if self.checkpoint_days:
+            checkpoints = {
+                day: self._checkpoint_metrics(arrays, metrics, n_trading_days, index)
+                for index, (day, n_trading_days) in enumerate(zip(self.checkpoint_days, self._checkpoint_trading_days))
+            }
+
+        return BatchSimulationResult(
+            params=params,
+            start_date=start_date,
+            calendar=calendar,
+            starting_balance=arrays['starting_balance'],
+            ending_balance=arrays['ending_balance'],
+            trades_taken=arrays['trades_taken'],
+            wins=arrays['wins'],
+            losses=arrays['losses'],
+            metrics=metrics,
+            seed=self.seed,
+            first_path=self.first_path,
+            streaks=streaks,
+            checkpoints=checkpoints
+        )
+
+    def _checkpoint_metrics(self, arrays: Dict[str, np.ndarray], metrics: Dict[str, np.ndarray],
+                            n_trading_days: int, index: int) -> Dict[str, np.ndarray]:
+        """Per-path metrics over the first n_trading_days days of the batch arrays"""
+        starting_balance = arrays['starting_balance']
+        if n_trading_days == starting_balance.shape[1]:
+            return metrics
+        day = slice(0, n_trading_days)
+        wins = arrays['wins'][:, day]
+        losses = arrays['losses'][:, day]
+        total_wins = wins.sum(axis=1, dtype=np.int64)
+        total_losses = losses.sum(axis=1, dtype=np.int64)
+        # The cashout of a day is what separates its ending balance from the next starting balance
+        ending_balance = arrays['ending_balance'][:, day]
+        next_starting_balance = starting_balance[:, 1:n_trading_days + 1]
+        prefix = {
+            'starting_balance': starting_balance[:, day],
+            'ending_balance': ending_balance,
+            'wins': wins,
+            'losses': losses,
+            'total_trades': total_wins + total_losses,
+            'total_wins': total_wins,
+            'total_losses': total_losses,
+            'total_pnl': (ending_balance - starting_balance[:, day]).sum(axis=1, dtype=np.float64),
+            'total_cashout': (ending_balance - next_starting_balance).sum(axis=1, dtype=np.float64),
+            'final_balance': starting_balance[:, n_trading_days].astype(np.float64),
+            **{name: arrays[f'checkpoint_{name}'][:, index] for name in CHECKPOINT_TRADE_TOTALS}
+        }
+        return batch_metrics(prefix, self.params.initial_balance)
+
+    def _daily_trade_amounts(self, n_paths: int, n_days: int) -> Optional[Dict[str, np.ndarray]]:
+        """Per-day gross profit, gross loss and largest trades of a block, kept only for checkpoints"""
+        if not self.checkpoint_days:
+            return None
+        return {name: np.zeros((n_paths, n_days)) for name in CHECKPOINT_TRADE_TOTALS}
+
+    @staticmethod
+    def _add_trade_slot(daily_amounts: Optional[Dict[str, np.ndarray]], win_amount: np.ndarray,
+                        loss_amount: np.ndarray):
+        if daily_amounts is None:
+            return
+        daily_amounts['gross_profit'] += win_amount
+        daily_amounts['gross_loss'] += loss_amount
+        np.maximum(daily_amounts['largest_win'], win_amount, out=daily_amounts['largest_win'])
+        np.maximum(daily_amounts['largest_loss'], loss_amount, out=daily_amounts['largest_loss'])
+
+    def _checkpoint_trade_totals(self, daily_amounts: Optional[Dict[str, np.ndarray]],
+                                 profit_scale: float = 1.0) -> Dict[str, np.ndarray]:
+        """(paths, checkpoints) totals of the per-day trade amounts over the prefix of every checkpoint"""
+        if daily_amounts is None:
+            return {}
+        days = self._checkpoint_trading_days
+        totals = {
+            'gross_profit': [daily_amounts['gross_profit'][:, :n].sum(axis=1) * profit_scale for n in days],
+            'gross_loss': [daily_amounts['gross_loss'][:, :n].sum(axis=1) for n in days],
+            'largest_win': [daily_amounts['largest_win'][:, :n].max(axis=1, initial=0) * profit_scale for n in days],
+            'largest_loss': [daily_amounts['largest_loss'][:, :n].max(axis=1, initial=0) for n in days]
+        }
+        return {f'checkpoint_{name}': np.stack(values, axis=1) for name, values in totals.items()}
+
+    def _block_streaks(self, winning: np.ndarray, losing: np.ndarray,
+                       wins: np.ndarray, losses: np.ndarray) -> Dict[str, StreakStatistics]:
+        """Day and trade streaks of a block's (trade slots, paths, days) outcomes, when requested"""
+        if not self.streaks:
+            return {}
+        return {'day_streaks': day_streaks(wins, losses), 'trade_streaks': trade_streaks(winning, losing)}
+
+    def _compact_block(self, block: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Daily arrays of a simulated block in their storage dtypes; per-path totals stay float64"""
+        if not self.compact:
+            return block
+        block['starting_balance'] = block['starting_balance'].astype(COMPACT_BALANCE_DTYPE)
+        block['ending_balance'] = block['ending_balance'].astype(COMPACT_BALANCE_DTYPE)
+        # Counts beyond the int8 range, possible in bootstrapped histories, keep their dtype
+        if block['trades_taken'].max(initial=0) <= np.iinfo(COMPACT_COUNT_DTYPE).max:
+            for name in ('trades_taken', 'wins', 'losses'):
+                block[name] = block[name].astype(COMPACT_COUNT_DTYPE)
+        return block
+
+    def _apply_risk_rules(self, taken: np.ndarray, trade_r: np.ndarray,
+                          cashout_days: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray], Union[float, np.ndarray]]:
+        """Trades the risk rules let through, the balances they compound to and the risk fraction of every day.
+
+        The daily rules are masks over the trade slots; without them, every drawn trade is
+        taken and the days compound in closed form at either risk. The drawdown rule
+        replays at the reduced risk only the days that can be cut, and takes their trades
+        only on the days it does cut; without it, the days are not walked at all.
+        """
+        params = self.params
+        rules = params.risk_rules
+        risk_fraction = params.risk_per_trade_percent / 100
+        if rules.stops_days or self._can_wipe_out(risk_fraction):
+            allowed, day_factor = intraday_trades(rules, taken, trade_r, risk_fraction)
+        else:
+            # Nothing ends a day early, so every drawn trade is taken and the days grow as
+            # in the rule-free engine, at either risk
+            allowed = taken
+            day_factor = self._day_factor(taken, trade_r, risk_fraction)
+
+        # As in the rule-free engine, no trade follows a day that wiped out the account
+        full_allowed, full_day_factor = allowed, day_factor
+        if (day_factor <= 0).any():
+            wiped_out_before = np.zeros(day_factor.shape, dtype=bool)
+            wiped_out_before[:, 1:] = np.logical_or.accumulate(day_factor <= 0, axis=1)[:, :-1]
+            full_allowed = allowed & ~wiped_out_before
+            full_day_factor = np.where(wiped_out_before, 1, day_factor)
+        balances = compound_balances(full_day_factor, cashout_days, params.initial_balance,
+                                     params.monthly_cashout_percent)
+        if rules.drawdown_threshold_percent is None:
+            return full_allowed, balances, risk_fraction
+
+        # No day is cut before the first day a path's full-risk balances would cut, as the
+        # path follows them exactly up to there; only the days from there on get a
+        # reduced-risk version
+        peak_before = np.empty_like(balances['ending_balance'])
+        peak_before[:, :1] = params.initial_balance
+        peak_before[:, 1:] = running_peak(balances['ending_balance'][:, :-1], params.initial_balance)
+        would_cut = rules.cuts_risk(balances['starting_balance'], peak_before)
+        first_cut = np.where(would_cut.any(axis=1), np.argmax(would_cut, axis=1), day_factor.shape[1])
+        can_cut = np.arange(day_factor.shape[1]) >= first_cut[:, None]
+        if not can_cut.any():
+            return full_allowed, balances, risk_fraction
+
+        cut_risk = risk_fraction * rules.drawdown_risk_multiplier
+        if allowed is taken:
+            cut_day_factor = np.where(can_cut, self._day_factor(taken, trade_r, cut_risk), day_factor)
+        else:
+            n_slots = len(taken)
+            # Gathered by flat index, which keeps the slots contiguous, unlike a boolean mask
+            cells = np.flatnonzero(can_cut)
+            cut_allowed, cut_factor = intraday_trades(rules, np.take(taken.reshape(n_slots, -1), cells, axis=1),
+                                                      np.take(trade_r.reshape(n_slots, -1), cells, axis=1), cut_risk)
+            cut_day_factor = day_factor.copy()
+            cut_day_factor.flat[cells] = cut_factor
+        balances = drawdown_rule_balances(day_factor, cut_day_factor, cashout_days, params.initial_balance,
+                                          params.monthly_cashout_percent, rules)
+        # Days before the first cut only differ by rounding; their cut version is the full one
+        cut_days = balances.pop('cut_days') & can_cut
+        alive = balances['starting_balance'] > 0
+        if allowed is taken:
+            allowed = taken & alive if not alive.all() else taken
+        else:
+            if not alive.all():
+                allowed &= alive
+            allowed[:, cut_days] = cut_allowed[:, cut_days.flat[cells]] & alive[cut_days]
+        trade_risk = np.where(cut_days, cut_risk, risk_fraction)
+        return allowed, balances, trade_risk
+
+    def _can_wipe_out(self, risk_fraction: float) -> bool:
+        """Whether a single trade at this risk can leave the balance <= 0"""
+        outcomes = self.params.outcomes
+        return 1 + risk_fraction * (-1 if outcomes is None else outcomes.worst_r) <= 0
+
+    def _day_factor(self, taken: np.ndarray, trade_r: np.ndarray, risk_fraction: float) -> np.ndarray:
+        """Growth factor of every day taking all its drawn trades, computed as the rule-free engine does"""
+        params = self.params
+        if params.outcomes is None:
+            # A loss is -1R exactly; a win of risk_reward_ratio 0 still counts as a win
+            losses = (taken & (trade_r == -1)).sum(axis=0, dtype=np.int16)
+            wins = taken.sum(axis=0, dtype=np.int16) - losses
+            return np.power(1 + risk_fraction * params.risk_reward_ratio, wins) * np.power(1 - risk_fraction, losses)
+        return np.prod(np.where(taken, 1 + risk_fraction * trade_r, 1), axis=0)
+
+    def _simulate_block(self, rng: np.random.Generator, n_paths: int, cashout_days: np.ndarray) -> Dict[str, np.ndarray]:
+        """Simulate a block of paths, returning its daily arrays and per-path totals"""
+        params = self.params
+        n_days = len(cashout_days)
+        max_trades = params.max_trades_per_day
+        risk_fraction = params.risk_per_trade_percent / 100
+        win_factor = 1 + risk_fraction * params.risk_reward_ratio
+        loss_factor = 1 - risk_fraction
+
+        regimes = params.regimes
+        if regimes is None:
+            trades_taken = trade_counts_from_uniforms(sample_uniforms(rng, (n_paths, n_days), self.sampling), max_trades)
+            win_rate = params.win_rate
+        else:
+            # The regime of every day is drawn first and sets its trade count and win rate
+            regime = sample_regimes(regimes, sample_uniforms(rng, (n_paths, n_days), self.sampling))
+            trades_taken = regime_trade_counts(sample_uniforms(rng, (n_paths, n_days), self.sampling), regime,
+                                               max_trades, regimes.trade_frequencies)
+            win_rate = regimes.win_rates[regime]
+        outcomes = params.outcomes
+        rules = params.risk_rules
+        trade_uniforms = sample_uniforms(rng, (max_trades, n_paths, n_days), self.sampling)
+        if outcomes is None:
+            is_win = trade_uniforms < win_rate
+            wipes_out = ~is_win if loss_factor <= 0 else None
+            # The rules follow the balance trade by trade, from each trade's R multiple
+            # (risk_reward_ratio or -1 exactly, without np.where's scalar broadcasts)
+            trade_r = None if rules is None else is_win * params.risk_reward_ratio - ~is_win
+        else:
+            # Every trade draws its R multiple from the alias table, one uniform each
+            trade_r = outcomes.sample(trade_uniforms)
+            is_win = trade_r > 0
+            trade_factor = 1 + risk_fraction * trade_r
+            wipes_out = trade_factor <= 0 if 1 + risk_fraction * outcomes.worst_r <= 0 else None
+        taken = np.arange(max_trades)[:, None, None] < trades_taken
+
+        # Fraction of the balance each trade stakes, per (path, day) when the rules cut it
+        trade_risk = risk_fraction
+        balances = None
+        if rules is not None:
+            taken, balances, trade_risk = self._apply_risk_rules(taken, trade_r, cashout_days)
+        elif wipes_out is not None:
+            # A loss can wipe out the account; like the scalar engine, no trade is
+            # executed once the balance is <= 0, for the rest of the day and the run
+            wiped_out = np.logical_or.accumulate(taken & wipes_out, axis=0)
+            taken[1:] &= ~wiped_out[:-1]
+            wiped_out_before = np.zeros((n_paths, n_days), dtype=bool)
+            wiped_out_before[:, 1:] = np.logical_or.accumulate(wiped_out[-1], axis=1)[:, :-1]
+            taken &= ~wiped_out_before
+
+        winning = taken & is_win
+        losing = taken & ~is_win
+        wins = winning.sum(axis=0, dtype=np.int16)
+        losses = losing.sum(axis=0, dtype=np.int16)
+        if balances is None:
+            if outcomes is None:
+                day_factor = np.power(win_factor, wins) * np.power(loss_factor, losses)
+            else:
+                day_factor = np.prod(np.where(taken, trade_factor, 1), axis=0)
+            balances = compound_balances(day_factor, cashout_days, params.initial_balance,
+                                         params.monthly_cashout_percent)
+        starting_balance = balances['starting_balance']
+        ending_balance = balances['ending_balance']
+
+        # Walk the trade slots to get each trade's stake from the balance in front of it
+        stake = starting_balance * trade_risk
+        gross_profit = np.zeros(n_paths)
+        gross_loss = np.zeros(n_paths)
+        largest_win = np.zeros(n_paths)
+        largest_loss = np.zeros(n_paths)
+        daily_amounts = self._daily_trade_amounts(n_paths, n_days)
+        # Plain wins pay risk_reward_ratio times their stake, applied to the totals at the end
+        profit_scale = params.risk_reward_ratio if outcomes is None else 1.0
+        # Growth of the next stake per unit of a plain win or loss
+        if rules is None:
+            win_growth, loss_growth = win_factor - 1, risk_fraction
+        else:
+            win_growth, loss_growth = params.risk_reward_ratio * trade_risk, trade_risk
+        for slot in range(max_trades):
+            if outcomes is None:
+                win_stake = stake * winning[slot]
+                loss_stake = stake * losing[slot]
+            else:
+                pnl = stake * trade_r[slot]
+                win_stake = pnl * winning[slot]
+                loss_stake = -pnl * losing[slot]
+            gross_profit += win_stake.sum(axis=1)
+            gross_loss += loss_stake.sum(axis=1)
+            np.maximum(largest_win, win_stake.max(axis=1, initial=0), out=largest_win)
+            np.maximum(largest_loss, loss_stake.max(axis=1, initial=0), out=largest_loss)
+            self._add_trade_slot(daily_amounts, win_stake, loss_stake)
+            if outcomes is None:
+                stake += win_stake * win_growth - loss_stake * loss_growth
+            else:
+                stake += (win_stake - loss_stake) * trade_risk
+
+        return {
+            'starting_balance': starting_balance,
+            'ending_balance': ending_balance,
+            'trades_taken': trades_taken,
+            'wins': wins,
+            'losses': losses,
+            'total_trades': wins.sum(axis=1) + losses.sum(axis=1),
+            'total_wins': wins.sum(axis=1),
+            'total_losses': losses.sum(axis=1),
+            'total_pnl': (ending_balance - starting_balance).sum(axis=1),
+            'total_cashout': balances['total_cashout'],
+            'final_balance': balances['final_balance'],
+            'gross_profit': gross_profit * profit_scale,
+            'gross_loss': gross_loss,
+            'largest_win': largest_win * profit_scale,
+            'largest_loss': largest_loss,
+            **self._block_streaks(winning, losing, wins, losses),
+            **self._checkpoint_trade_totals(daily_amounts, profit_scale)
+        }
+
             
 if __name__ == "__main__":
     params = TradeParameters(
@@ -0,0 +1,181 @@
+import math
+import numpy as np
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    PATH_BLOCK_SIZE,
+    draw_trade_counts,
+    path_block_seeds,
+    trading_calendar_for
+)
+from app.core.sweep import compound_outcomes, require_fixed_trade_model
+
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+
+@dataclass
+class RiskOptimizationResult:
+    """Best risk per trade under a drawdown limit, with the metrics of every evaluated risk"""
+    params: TradeParameters
+    n_paths: int
+    seed: int
+    max_drawdown_limit: float
+    risk_per_trade_percent: Optional[float]  # None when even the smallest risk breaks the limit
+    drawdown_bound: bool                     # the limit, not the growth curve, set the optimum
+    profile: Dict[str, float]
+    evaluations: List[Dict[str, float]]
+
+    def to_dict(self) -> Dict:
+        return {
+            "n_paths": self.n_paths,
+            "seed": self.seed,
+            "max_drawdown_limit": self.max_drawdown_limit,
+            "risk_per_trade_percent": self.risk_per_trade_percent,
+            "drawdown_bound": self.drawdown_bound,
+            "profile": self.profile,
+            "evaluations": self.evaluations
+        }
+
+
+class RiskOptimizer:
+    """Search of the risk per trade over one fixed set of simulated trade outcomes.
+
+    Wins and losses don't depend on the risk per trade, so they are drawn once (exactly
+    as VectorizedMonteCarloSimulator draws them) and every candidate risk only compounds
+    the balances. With these common random numbers the metrics are deterministic,
+    piecewise smooth functions of the risk, which bisection and golden-section search need.
+    """
+
+    def __init__(self, params: TradeParameters, n_paths: int, start_date: Optional[datetime] = None):
+        if n_paths <= 0:
+            raise ValueError("n_paths must be positive")
+        require_fixed_trade_model(params)
+        if params.seed is None:
+            params = replace(params, seed=np.random.SeedSequence().entropy)
+        self.params = params
+        self.n_paths = n_paths
+        self.calendar = trading_calendar_for(params, start_date or datetime.now())
+        self.wins, self.losses = self._draw_outcomes()
+        self._evaluations: Dict[float, Dict[str, float]] = {}
+
+    def _draw_outcomes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Daily (paths, days) win and loss counts, path block by path block"""
+        params = self.params
+        max_trades = params.max_trades_per_day
+        n_days = len(self.calendar)
+        wins = np.empty((self.n_paths, n_days), dtype=np.int16)
+        losses = np.empty((self.n_paths, n_days), dtype=np.int16)
+        n_blocks = -(-self.n_paths // PATH_BLOCK_SIZE)
+        for block, block_seed in enumerate(path_block_seeds(params.seed, 0, n_blocks)):
+            rng = np.random.default_rng(block_seed)
+            paths = slice(block * PATH_BLOCK_SIZE, min((block + 1) * PATH_BLOCK_SIZE, self.n_paths))
+            trades_taken = draw_trade_counts(rng, max_trades, paths.stop - paths.start, n_days)
+            is_win = rng.random((max_trades,) + trades_taken.shape) < params.win_rate
+            taken = np.arange(max_trades)[:, None, None] < trades_taken
+            wins[paths] = (taken & is_win).sum(axis=0, dtype=np.int16)
+            losses[paths] = trades_taken - wins[paths]
+        return wins, losses
+
+    def evaluate(self, risk_per_trade_percent: float) -> Dict[str, float]:
+        """Ensemble metrics at one risk per trade, cached per risk"""
+        risk_per_trade_percent = float(risk_per_trade_percent)
+        if risk_per_trade_percent in self._evaluations:
+            return self._evaluations[risk_per_trade_percent]
+
+        params = self.params
+        risk = risk_per_trade_percent / 100
+        trade_counts = np.arange(params.max_trades_per_day + 1)
+        win_powers = (1 + risk * params.risk_reward_ratio) ** trade_counts
+        loss_powers = (1 - risk) ** trade_counts
+        outcomes = [
+            compound_outcomes(win_powers[self.wins[paths]] * loss_powers[self.losses[paths]], self.calendar, params)
+            for paths in (slice(start, start + PATH_BLOCK_SIZE) for start in range(0, self.n_paths, PATH_BLOCK_SIZE))
+        ]
+        final_balance = np.concatenate([outcome['final_balance'] for outcome in outcomes])
+        total_cashout = np.concatenate([outcome['total_cashout'] for outcome in outcomes])
+        max_drawdown_percent = np.concatenate([outcome['max_drawdown_percent'] for outcome in outcomes])
+        # Growth counts the cashed out profits, which left the account but were earned
+        wealth = final_balance + total_cashout
+        with np.errstate(divide='ignore'):
+            median_log_growth = float(np.log(np.median(wealth) / params.initial_balance))
+
+        evaluation = {
+            "risk_per_trade_percent": risk_per_trade_percent,
+            "median_final_balance": float(np.median(final_balance)),
+            "median_log_growth": median_log_growth,
+            "p95_max_drawdown_percent": float(np.percentile(max_drawdown_percent, 95)),
+            "median_max_drawdown_percent": float(np.median(max_drawdown_percent)),
+            "probability_of_loss": float(np.mean(wealth < params.initial_balance)),
+        }
+        self._evaluations[risk_per_trade_percent] = evaluation
+        return evaluation
+
+    def max_risk_within_limit(self, limit: float, low: float, high: float, tolerance: float) -> Optional[float]:
+        """Largest risk whose P95 max drawdown stays within limit, by bisection"""
+        if self.evaluate(low)["p95_max_drawdown_percent"] > limit:
+            return None
+        if self.evaluate(high)["p95_max_drawdown_percent"] <= limit:
+            return high
+        while high - low > tolerance:
+            middle = (low + high) / 2
+            if self.evaluate(middle)["p95_max_drawdown_percent"] <= limit:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def max_growth_risk(self, low: float, high: float, tolerance: float) -> float:
+        """Risk of the highest median growth within [low, high], by golden-section search"""
+        def growth(risk: float) -> float:
+            return self.evaluate(risk)["median_log_growth"]
+
+        left = high - GOLDEN_RATIO * (high - low)
+        right = low + GOLDEN_RATIO * (high - low)
+        while high - low > tolerance:
+            if growth(left) >= growth(right):
+                high, right = right, left
+                left = high - GOLDEN_RATIO * (high - low)
+            else:
+                low, left = left, right
+                right = low + GOLDEN_RATIO * (high - low)
+        # The search only narrows the bracket; its ends may be the best points seen
+        return max((low, left, right, high), key=growth)
+
+    @property
+    def evaluations(self) -> List[Dict[str, float]]:
+        return [self._evaluations[risk] for risk in sorted(self._evaluations)]
+
+
+def optimize_risk(params: TradeParameters, n_paths: int = 2000, max_drawdown_percent: float = 20.0,
+                  min_risk_percent: float = 0.1, max_risk_percent: float = 10.0, tolerance: float = 0.01,
+                  start_date: Optional[datetime] = None) -> RiskOptimizationResult:
+    """Risk per trade maximizing the median growth with a P95 max drawdown within max_drawdown_percent.
+
+    The limit bounds the search range first; the growth of fixed-fractional betting is
+    unimodal in the risk (the Kelly curve), so when its peak is beyond that bound the
+    bound itself is the optimum.
+    """
+    if not 0 < min_risk_percent < max_risk_percent < 100:
+        raise ValueError("Risk bounds must satisfy 0 < min_risk_percent < max_risk_percent < 100")
+    optimizer = RiskOptimizer(params, n_paths, start_date)
+    upper = optimizer.max_risk_within_limit(max_drawdown_percent, min_risk_percent, max_risk_percent, tolerance)
+    if upper is None:
+        risk = None
+        profile = optimizer.evaluate(min_risk_percent)
+    else:
+        risk = optimizer.max_growth_risk(min_risk_percent, upper, tolerance)
+        profile = optimizer.evaluate(risk)
+
+    return RiskOptimizationResult(
+        params=optimizer.params,
+        n_paths=n_paths,
+        seed=optimizer.params.seed,
+        max_drawdown_limit=max_drawdown_percent,
+        risk_per_trade_percent=risk,
+        drawdown_bound=upper is not None and upper < max_risk_percent and risk >= upper - tolerance,
+        profile=profile,
+        evaluations=optimizer.evaluations
+    )
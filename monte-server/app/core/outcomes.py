@@ -0,0 +1,88 @@
+import numpy as np
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Tuple
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(1) draws from a discrete distribution of n outcomes.
+
+    Every column holds probability mass 1/n, split between its own outcome and at most
+    one alias, so a draw is one column pick and one comparison whatever n is.
+    """
+
+    def __init__(self, probabilities: np.ndarray):
+        n = len(probabilities)
+        scaled = np.asarray(probabilities, dtype=float) * n / np.sum(probabilities)
+        self.accept = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            column, donor = small.pop(), large.pop()
+            self.accept[column] = scaled[column]
+            self.alias[column] = donor
+            # The donor gives the column what it lacks and may fall short of 1 itself
+            scaled[donor] -= 1 - scaled[column]
+            (small if scaled[donor] < 1 else large).append(donor)
+        # Whatever is left holds mass 1 up to rounding and keeps its own outcome
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        """Outcome indices from uniforms of any shape, one uniform per draw.
+
+        The integer part of u * n picks the column and the fractional part decides
+        between the column's outcome and its alias.
+        """
+        n = len(self.accept)
+        scaled = uniforms * n
+        column = np.minimum(scaled.astype(np.intp), n - 1)
+        return np.where(scaled - column < self.accept[column], column, self.alias[column])
+
+
+@dataclass
+class OutcomeDistribution:
+    """Discrete distribution of trade results in R multiples, 1R being the amount risked.
+
+    Replaces the win of risk_reward_ratio or loss of -1R of a fixed win rate with any
+    mix of partial wins, breakevens and slippage tails. A trade wins when its R
+    multiple is positive, like a bootstrapped trade with a positive return.
+    """
+    r_multiples: List[float]
+    probabilities: List[float]  # normalized, so the counts of an empirical histogram work as they are
+
+    def __post_init__(self):
+        weights = np.asarray(self.probabilities, dtype=float)
+        if len(self.r_multiples) == 0 or weights.shape != (len(self.r_multiples),):
+            raise ValueError("An outcome distribution needs one probability per R multiple")
+        if np.any(weights < 0) or not np.isfinite(weights).all() or weights.sum() <= 0:
+            raise ValueError("Outcome probabilities must be non-negative with a positive total")
+        if not np.isfinite(np.asarray(self.r_multiples, dtype=float)).all():
+            raise ValueError("R multiples must be finite")
+
+    @cached_property
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        weights = np.asarray(self.probabilities, dtype=float)
+        return np.asarray(self.r_multiples, dtype=float), weights / weights.sum()
+
+    @cached_property
+    def alias_table(self) -> AliasTable:
+        return AliasTable(self._arrays[1])
+
+    @property
+    def win_rate(self) -> float:
+        r_multiples, probabilities = self._arrays
+        return float(probabilities[r_multiples > 0].sum())
+
+    @property
+    def expected_r(self) -> float:
+        r_multiples, probabilities = self._arrays
+        return float(r_multiples @ probabilities)
+
+    @property
+    def worst_r(self) -> float:
+        r_multiples, probabilities = self._arrays
+        return float(r_multiples[probabilities > 0].min())
+
+    def sample(self, uniforms: np.ndarray) -> np.ndarray:
+        """R multiple of every draw, from uniforms of any shape"""
+        return self._arrays[0][self.alias_table.sample(uniforms)]
@@ -0,0 +1,167 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Array versions of the per-day peak, drawdown and streak bookkeeping of the scalar
+# simulator, for whole (paths, days) matrices in a few NumPy passes each.
+
+
+def running_peak(ending_balance: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Running peak of (paths, days) balances, starting from the initial balance"""
+    return np.maximum(np.maximum.accumulate(ending_balance, axis=1), initial_balance)
+
+
+def drawdown(ending_balance: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Drawdown of (paths, days) balances from their running peak, in currency"""
+    return running_peak(ending_balance, initial_balance) - ending_balance
+
+
+def drawdown_percent(ending_balance: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Drawdown of (paths, days) balances from their running peak, in percent"""
+    peak_balance = running_peak(ending_balance, initial_balance)
+    return (peak_balance - ending_balance) / peak_balance * 100
+
+
+def max_drawdown(ending_balance: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Largest drawdown of every path, in currency; 0 for paths without days"""
+    return np.max(drawdown(ending_balance, initial_balance), axis=1, initial=0)
+
+
+def longest_run(mask: np.ndarray) -> np.ndarray:
+    """Longest run of consecutive True values along axis 1 of a (paths, days) mask.
+
+    Every False day stamps its 1-based index, a running maximum carries the last stamp
+    forward, and the distance to it is the length of the run in progress.
+    """
+    n_days = mask.shape[1]
+    dtype = np.int16 if n_days < np.iinfo(np.int16).max else np.int32
+    day = np.arange(1, n_days + 1, dtype=dtype)
+    last_break = np.multiply(~mask, day, dtype=dtype)
+    np.maximum.accumulate(last_break, axis=1, out=last_break)
+    np.subtract(day, last_break, out=last_break)
+    return last_break.max(axis=1, initial=0).astype(np.int64)
+
+
+def max_drawdown_duration(ending_balance: np.ndarray, initial_balance: float,
+                          peak_balance: Optional[np.ndarray] = None) -> np.ndarray:
+    """Longest stretch of days without a new peak, as the scalar simulator counts it.
+
+    A day extends the duration unless its balance exceeds the peak before it, so days
+    at the peak (or without trades) count as underwater too. peak_balance saves a pass
+    when the running peak is already at hand.
+    """
+    if peak_balance is None:
+        peak_balance = running_peak(ending_balance, initial_balance)
+    previous_peak = np.empty_like(peak_balance)
+    previous_peak[:, :1] = initial_balance
+    previous_peak[:, 1:] = peak_balance[:, :-1]
+    return longest_run(ending_balance <= previous_peak)
+
+
+@dataclass
+class StreakStatistics:
+    """Longest winning and losing streak of every path, and how many streaks of each length occurred"""
+    longest_winning: np.ndarray  # (n_paths,)
+    longest_losing: np.ndarray   # (n_paths,)
+    winning_counts: np.ndarray   # number of winning streaks of each length, indexed by length
+    losing_counts: np.ndarray
+
+    @classmethod
+    def concatenate(cls, parts: List["StreakStatistics"]) -> "StreakStatistics":
+        """Statistics of consecutive path blocks, as if computed over all their paths at once"""
+        def total(counts):
+            merged = np.zeros(max(len(part_counts) for part_counts in counts), dtype=np.int64)
+            for part_counts in counts:
+                merged[:len(part_counts)] += part_counts
+            return merged
+
+        return cls(
+            longest_winning=np.concatenate([part.longest_winning for part in parts]),
+            longest_losing=np.concatenate([part.longest_losing for part in parts]),
+            winning_counts=total([part.winning_counts for part in parts]),
+            losing_counts=total([part.losing_counts for part in parts])
+        )
+
+
+def run_lengths(labels: np.ndarray, row_starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Run-length encoding of the rows of a flat label sequence.
+
+    row_starts holds the index at which every row begins, in increasing order, so rows
+    can have different lengths. Returns the row, label and length of every maximal run
+    of equal labels, in sequence order; a run never spans two rows.
+    """
+    is_start = np.empty(labels.size, dtype=bool)
+    if labels.size:
+        is_start[0] = True
+        np.not_equal(labels[1:], labels[:-1], out=is_start[1:])
+        is_start[row_starts[row_starts < labels.size]] = True
+    starts = np.flatnonzero(is_start)
+    rows = np.searchsorted(row_starts, starts, side='right') - 1
+    return rows, labels[starts], np.diff(starts, append=labels.size)
+
+
+def _longest_per_row(rows: np.ndarray, lengths: np.ndarray, n_rows: int) -> np.ndarray:
+    """Longest of the runs of each row, given in row order; 0 for rows without runs"""
+    longest = np.zeros(n_rows, dtype=np.int64)
+    if lengths.size:
+        first = np.flatnonzero(np.diff(rows, prepend=-1))
+        longest[rows[first]] = np.maximum.reduceat(lengths, first)
+    return longest
+
+
+def streak_statistics(labels: np.ndarray, row_starts: np.ndarray, n_rows: int) -> StreakStatistics:
+    """Streaks of a flat sequence of +1 (win), -1 (loss) and 0 (neither, ends any streak) labels"""
+    rows, run_labels, lengths = run_lengths(labels, row_starts)
+    winning = run_labels == 1
+    losing = run_labels == -1
+    return StreakStatistics(
+        longest_winning=_longest_per_row(rows[winning], lengths[winning], n_rows),
+        longest_losing=_longest_per_row(rows[losing], lengths[losing], n_rows),
+        winning_counts=np.bincount(lengths[winning], minlength=1),
+        losing_counts=np.bincount(lengths[losing], minlength=1)
+    )
+
+
+def day_streaks(wins: np.ndarray, losses: np.ndarray) -> StreakStatistics:
+    """Streaks of winning and losing days of (paths, days) win and loss counts.
+
+    Like the scalar simulator, a day only wins (loses) with wins (losses) and no losses
+    (wins); mixed days and days without trades end both streaks.
+    """
+    n_paths, n_days = wins.shape
+    labels = ((wins > 0) & (losses == 0)).view(np.int8) - ((losses > 0) & (wins == 0)).view(np.int8)
+    return streak_statistics(labels.ravel(), np.arange(n_paths) * n_days, n_paths)
+
+
+def trade_streaks(winning: np.ndarray, losing: np.ndarray) -> StreakStatistics:
+    """Streaks of consecutive winning and losing trades of (trade slots, paths, days) outcomes.
+
+    Trades follow each other slot by slot within a day and day by day, and slots
+    without a trade are skipped, so a streak can run across days.
+    """
+    n_paths = winning.shape[1]
+    labels = (winning.view(np.int8) - losing.view(np.int8)).transpose(1, 2, 0).reshape(n_paths, -1)
+    taken = labels != 0
+    row_starts = np.zeros(n_paths, dtype=np.int64)
+    np.cumsum(np.count_nonzero(taken, axis=1)[:-1], out=row_starts[1:])
+    return streak_statistics(labels[taken], row_starts, n_paths)
+
+
+def first_passage_day(ending_balance: np.ndarray, level: float, above: bool = True) -> np.ndarray:
+    """First day each path's (paths, days) balance reaches level (above) or falls to it (not above).
+
+    Paths that never do are censored at the horizon and get -1.
+    """
+    n_paths, n_days = ending_balance.shape
+    if n_days == 0:
+        return np.full(n_paths, -1, dtype=np.int64)
+    crossed = ending_balance >= level if above else ending_balance <= level
+    first_day = np.argmax(crossed, axis=1)
+    first_day[~crossed[np.arange(n_paths), first_day]] = -1
+    return first_day
+
+
+def first_passage_cdf(first_day: np.ndarray, n_days: int) -> np.ndarray:
+    """Fraction of all paths that have crossed by each day; censored paths never count"""
+    counts = np.bincount(first_day[first_day >= 0], minlength=n_days)
+    return np.cumsum(counts) / max(first_day.size, 1)
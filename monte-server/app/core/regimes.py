@@ -0,0 +1,98 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Tolerance on the probabilities of a row of the transition matrix summing to 1
+PROBABILITY_TOLERANCE = 1e-9
+
+
+@dataclass
+class MarketRegime:
+    name: str = ""
+    win_rate: float = 0.55
+    trade_frequency: float = 1.0  # multiplies the expected number of trades per day
+
+
+@dataclass
+class RegimeModel:
+    """Hidden Markov model of market conditions, e.g. a "normal" and a "cold" regime.
+
+    The regime of each trading day follows a Markov chain and sets the win rate and the
+    trade frequency of that day, so losing days cluster the way a fixed win rate can't.
+    """
+    regimes: List[MarketRegime]
+    transition_matrix: List[List[float]]  # [i][j]: probability that a regime i day is followed by a regime j day
+    initial_probabilities: Optional[List[float]] = None  # regime of the first day; None for the stationary distribution
+
+    def __post_init__(self):
+        # Rebuilt from plain dicts when parameters come back from JSON
+        self.regimes = [MarketRegime(**regime) if isinstance(regime, dict) else regime for regime in self.regimes]
+        n_regimes = len(self.regimes)
+        if n_regimes == 0:
+            raise ValueError("A regime model needs at least one regime")
+        transitions = np.asarray(self.transition_matrix, dtype=float)
+        if transitions.shape != (n_regimes, n_regimes):
+            raise ValueError(f"The transition matrix must be {n_regimes} x {n_regimes}")
+        if np.any(transitions < 0) or np.any(np.abs(transitions.sum(axis=1) - 1) > PROBABILITY_TOLERANCE):
+            raise ValueError("Every row of the transition matrix must be probabilities summing to 1")
+        if self.initial_probabilities is not None:
+            initial = np.asarray(self.initial_probabilities, dtype=float)
+            if initial.shape != (n_regimes,) or np.any(initial < 0) or abs(initial.sum() - 1) > PROBABILITY_TOLERANCE:
+                raise ValueError(f"The initial probabilities must be {n_regimes} probabilities summing to 1")
+        for regime in self.regimes:
+            if not 0 <= regime.win_rate <= 1 or regime.trade_frequency < 0:
+                raise ValueError(f"Invalid win rate or trade frequency in regime {regime.name!r}")
+
+    @property
+    def win_rates(self) -> np.ndarray:
+        return np.array([regime.win_rate for regime in self.regimes])
+
+    @property
+    def trade_frequencies(self) -> np.ndarray:
+        return np.array([regime.trade_frequency for regime in self.regimes])
+
+    def stationary_probabilities(self) -> np.ndarray:
+        """Long-run share of days in each regime: the left eigenvector of the transition matrix"""
+        transitions = np.asarray(self.transition_matrix, dtype=float)
+        n_regimes = len(self.regimes)
+        # pi (P - I) = 0 with sum(pi) = 1, solved in the least-squares sense for reducible chains
+        system = np.vstack([transitions.T - np.eye(n_regimes), np.ones(n_regimes)])
+        target = np.zeros(n_regimes + 1)
+        target[-1] = 1
+        probabilities = np.linalg.lstsq(system, target, rcond=None)[0]
+        probabilities = np.clip(probabilities, 0, None)
+        return probabilities / probabilities.sum()
+
+    def start_probabilities(self) -> np.ndarray:
+        if self.initial_probabilities is None:
+            return self.stationary_probabilities()
+        return np.asarray(self.initial_probabilities, dtype=float)
+
+
+def next_regime(model: RegimeModel, regime: Optional[int], uniform: float) -> int:
+    """Regime of the next day of one path, None meaning the run has not started"""
+    probabilities = model.start_probabilities() if regime is None else model.transition_matrix[regime]
+    return int(np.searchsorted(np.cumsum(probabilities)[:-1], uniform, side='right'))
+
+
+def sample_regimes(model: RegimeModel, uniforms: np.ndarray) -> np.ndarray:
+    """Regime of every (path, day) from (paths, days) uniforms, by inverse CDF of the chain.
+
+    The first day draws from the start probabilities and every later day from the row of
+    the day before: the chain is a loop over days, each step vectorized across all paths.
+    """
+    n_paths, n_days = uniforms.shape
+    if n_days == 0 or len(model.regimes) == 1:
+        return np.zeros((n_paths, n_days), dtype=np.int8)
+    regimes = np.empty((n_days, n_paths), dtype=np.int8)
+    columns = np.ascontiguousarray(uniforms.T)
+    # thresholds[k][i]: probability of moving from regime i to one of the regimes 0..k
+    thresholds = np.cumsum(np.asarray(model.transition_matrix, dtype=float), axis=1)[:, :-1].T.copy()
+    regimes[0] = np.searchsorted(np.cumsum(model.start_probabilities())[:-1], columns[0], side='right')
+    for day in range(1, n_days):
+        regime = regimes[day - 1]
+        # The next regime is the number of thresholds of the current row the uniform passes
+        np.greater_equal(columns[day], thresholds[0][regime], out=regimes[day], casting='unsafe')
+        for threshold in thresholds[1:]:
+            regimes[day] += columns[day] >= threshold[regime]
+    return regimes.T
@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    PATH_BLOCK_SIZE,
+    trading_calendar_for
+)
+from app.core.ensemble import BAND_PERCENTILES, METRIC_FIELDS, metric_distribution, first_passage_summary
+
+# Directory of the stored ensembles, one subdirectory per job
+ENSEMBLE_STORE_DIR = os.getenv("ENSEMBLE_STORE_DIR", "ensemble_store")
+# Paths simulated at once while writing a shard, so a worker never holds all of them
+WRITE_CHUNK_PATHS = 16 * PATH_BLOCK_SIZE
+# Trading days reduced at once by band queries
+QUERY_CHUNK_DAYS = 64
+# Stored ensembles are deleted this long after they were written
+ENSEMBLE_STORE_TTL_HOURS = float(os.getenv("ENSEMBLE_STORE_TTL_HOURS", "24"))
+# Disk space all stored ensembles may take together; the oldest make way for new ones
+ENSEMBLE_STORE_MAX_BYTES = int(float(os.getenv("ENSEMBLE_STORE_MAX_GB", "20")) * 2 ** 30)
+
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _job_dir(job_id: str, directory: Optional[str] = None) -> str:
+    if not _JOB_ID.match(job_id):
+        raise ValueError(f"Invalid ensemble job id: {job_id}")
+    return os.path.join(directory or ENSEMBLE_STORE_DIR, job_id)
+
+
+def _dir_bytes(job_dir: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(job_dir) if entry.is_file())
+
+
+def sweep_stores(directory: Optional[str] = None, reserve_bytes: int = 0,
+                 now: Optional[float] = None) -> List[str]:
+    """Delete the stored ensembles past ENSEMBLE_STORE_TTL_HOURS, then the oldest complete
+    ones until reserve_bytes more fit under ENSEMBLE_STORE_MAX_BYTES. Returns their job ids.
+
+    Jobs still being written have no metadata yet and are only deleted once expired.
+    """
+    root = directory or ENSEMBLE_STORE_DIR
+    if not os.path.isdir(root):
+        return []
+    expires_before = (now or time.time()) - ENSEMBLE_STORE_TTL_HOURS * 3600
+    jobs = sorted((entry.stat().st_mtime, entry.name) for entry in os.scandir(root)
+                  if entry.is_dir() and _JOB_ID.match(entry.name))
+    deleted = []
+    kept = []
+    for written, job_id in jobs:
+        if written < expires_before:
+            delete_store(job_id, directory)
+            deleted.append(job_id)
+        else:
+            kept.append(job_id)
+
+    job_bytes = {job_id: _dir_bytes(os.path.join(root, job_id)) for job_id in kept}
+    used_bytes = sum(job_bytes.values())
+    for job_id in kept:
+        if used_bytes + reserve_bytes <= ENSEMBLE_STORE_MAX_BYTES:
+            break
+        if os.path.exists(os.path.join(root, job_id, "metadata.json")):
+            delete_store(job_id, directory)
+            deleted.append(job_id)
+            used_bytes -= job_bytes[job_id]
+    return deleted
+
+
+def create_store(job_id: str, n_days: int, n_paths: int, directory: Optional[str] = None) -> str:
+    """Allocate the (days, paths) balance matrix of a job on disk and return its path.
+
+    The matrix is stored day-major: the distribution at one day and the bands of a day
+    range are contiguous rows, and a single path is one strided column. Expired and, if
+    the store is full, the oldest stored ensembles are deleted first.
+    """
+    matrix_bytes = n_days * n_paths * np.dtype(np.float64).itemsize
+    if matrix_bytes > ENSEMBLE_STORE_MAX_BYTES:
+        raise ValueError("The ensemble is larger than the store size cap")
+    sweep_stores(directory, reserve_bytes=matrix_bytes)
+    job_dir = _job_dir(job_id, directory)
+    os.makedirs(job_dir, exist_ok=True)
+    path = os.path.join(job_dir, "ending_balance.npy")
+    np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(n_days, n_paths)).flush()
+    return path
+
+
+def write_shard(path: str, params: TradeParameters, first_path: int, n_paths: int,
+                start_date: datetime) -> Dict[str, np.ndarray]:
+    """Simulate paths first_path.. into their columns of a stored matrix, returning their metrics.
+
+    Runs in the pool workers, which write straight into the mapped file, chunk by chunk.
+    """
+    balances = np.load(path, mmap_mode='r+')
+    metrics: List[Dict[str, np.ndarray]] = []
+    for chunk_first in range(first_path, first_path + n_paths, WRITE_CHUNK_PATHS):
+        chunk_paths = min(WRITE_CHUNK_PATHS, first_path + n_paths - chunk_first)
+        batch = VectorizedMonteCarloSimulator(params, chunk_paths, first_path=chunk_first).run(start_date)
+        balances[:, chunk_first:chunk_first + chunk_paths] = batch.ending_balance.T
+        metrics.append(batch.metrics)
+    balances.flush()
+    del balances
+    return {name: np.concatenate([chunk[name] for chunk in metrics]) for name in metrics[0]}
+
+
+def write_metadata(job_id: str, params: TradeParameters, start_date: datetime,
+                   metrics: Dict[str, np.ndarray], owner_id: Optional[int] = None,
+                   directory: Optional[str] = None):
+    """Store the owner, parameters, dates and per-path metrics next to the balance matrix.
+
+    Written last, so a job only counts as stored once all of its paths are.
+    """
+    job_dir = _job_dir(job_id, directory)
+    np.savez(os.path.join(job_dir, "metrics.npz"), **{name: metrics[name] for name in METRIC_FIELDS})
+    metadata = {
+        "owner_id": owner_id,
+        "params": asdict(params),
+        "start_date": start_date.isoformat(),
+        "dates": [date.isoformat() for date in trading_calendar_for(params, start_date).dates(start_date)]
+    }
+    with open(os.path.join(job_dir, "metadata.json"), "w") as file:
+        json.dump(metadata, file)
+
+
+def delete_store(job_id: str, directory: Optional[str] = None) -> bool:
+    job_dir = _job_dir(job_id, directory)
+    if not os.path.isdir(job_dir):
+        return False
+    shutil.rmtree(job_dir)
+    return True
+
+
+class StoredEnsemble:
+    """Read-only queries on a stored ensemble, answered from the memory-mapped matrix.
+
+    Only the rows or columns a query needs are read, and repeated queries are served
+    from the OS page cache rather than from a copy in this process.
+    """
+
+    def __init__(self, job_id: str, directory: Optional[str] = None):
+        job_dir = _job_dir(job_id, directory)
+        metadata_path = os.path.join(job_dir, "metadata.json")
+        if not os.path.exists(metadata_path):
+            raise FileNotFoundError(f"No stored ensemble {job_id}")
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+        self.job_id = job_id
+        self.owner_id: Optional[int] = metadata.get("owner_id")
+        self.params = TradeParameters(**metadata["params"])
+        self.start_date = datetime.fromisoformat(metadata["start_date"])
+        self.dates: List[str] = metadata["dates"]
+        self.ending_balance = np.load(os.path.join(job_dir, "ending_balance.npy"), mmap_mode='r')
+        self._metrics_path = os.path.join(job_dir, "metrics.npz")
+
+    @property
+    def n_days(self) -> int:
+        return self.ending_balance.shape[0]
+
+    @property
+    def n_paths(self) -> int:
+        return self.ending_balance.shape[1]
+
+    def _day_range(self, first_day: int, last_day: Optional[int]) -> range:
+        last_day = self.n_days - 1 if last_day is None else last_day
+        if not 0 <= first_day <= last_day < self.n_days:
+            raise IndexError(f"Day range must be within 0..{self.n_days - 1}")
+        return range(first_day, last_day + 1)
+
+    def metric_distributions(self) -> Dict[str, Dict[str, Optional[float]]]:
+        with np.load(self._metrics_path) as metrics:
+            return {name: metric_distribution(metrics[name]) for name in METRIC_FIELDS}
+
+    def balance_bands(self, first_day: int = 0, last_day: Optional[int] = None) -> Dict[str, List[float]]:
+        """Percentile bands of the balance over a range of trading days, QUERY_CHUNK_DAYS rows at a time"""
+        days = self._day_range(first_day, last_day)
+        bands = np.empty((len(BAND_PERCENTILES), len(days)))
+        for start in range(0, len(days), QUERY_CHUNK_DAYS):
+            rows = self.ending_balance[days.start + start:min(days.start + start + QUERY_CHUNK_DAYS, days.stop)]
+            bands[:, start:start + len(rows)] = np.percentile(rows, BAND_PERCENTILES, axis=1)
+        return {f"p{q}": band.tolist() for q, band in zip(BAND_PERCENTILES, bands)}
+
+    def path(self, path: int) -> List[float]:
+        """Daily ending balances of one path"""
+        if not 0 <= path < self.n_paths:
+            raise IndexError(f"Path must be within 0..{self.n_paths - 1}")
+        return self.ending_balance[:, path].tolist()
+
+    def day_distribution(self, day: int) -> Dict[str, Optional[float]]:
+        """Distribution of the balance across paths at one trading day"""
+        self._day_range(day, day)
+        return metric_distribution(self.ending_balance[day])
+
+    def first_passage(self, target_balance_percent: Optional[float] = None,
+                      ruin_balance_percent: Optional[float] = None) -> Dict[str, Dict]:
+        """When the paths first reach a target or fall to a ruin balance, in percent of the initial balance.
+
+        Both levels are tracked in one pass over the matrix, QUERY_CHUNK_DAYS rows at a
+        time; paths still uncrossed at the horizon are censored.
+        """
+        initial_balance = self.params.initial_balance
+        levels = {}
+        if target_balance_percent is not None:
+            levels["target"] = (initial_balance * target_balance_percent / 100, True)
+        if ruin_balance_percent is not None:
+            levels["ruin"] = (initial_balance * ruin_balance_percent / 100, False)
+        first_day = {name: np.full(self.n_paths, -1, dtype=np.int64) for name in levels}
+
+        for start in range(0, self.n_days, QUERY_CHUNK_DAYS):
+            rows = self.ending_balance[start:start + QUERY_CHUNK_DAYS]
+            for name, (balance, above) in levels.items():
+                open_paths = np.flatnonzero(first_day[name] < 0)
+                crossed = rows[:, open_paths] >= balance if above else rows[:, open_paths] <= balance
+                hit = crossed.any(axis=0)
+                first_day[name][open_paths[hit]] = start + np.argmax(crossed[:, hit], axis=0)
+        return {name: first_passage_summary(first_day[name], self.n_days, balance)
+                for name, (balance, _) in levels.items()}
+
+    def summary(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "n_paths": self.n_paths,
+            "n_days": self.n_days,
+            "seed": self.params.seed,
+            "dates": self.dates,
+            "metrics": self.metric_distributions()
+        }
@@ -0,0 +1,76 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass
+class RiskRules:
+    """Risk controls a trader applies on top of the strategy, each one optional.
+
+    The daily rules end a day early: after max_losses_per_day losing trades, or once the
+    day has lost daily_loss_limit_percent of its starting balance. The drawdown rule
+    multiplies the risk per trade by drawdown_risk_multiplier on every day that starts
+    drawdown_threshold_percent or more below the peak balance.
+    """
+    max_losses_per_day: Optional[int] = None
+    daily_loss_limit_percent: Optional[float] = None
+    drawdown_threshold_percent: Optional[float] = None
+    drawdown_risk_multiplier: float = 0.5
+
+    def __post_init__(self):
+        if self.max_losses_per_day is not None and self.max_losses_per_day < 1:
+            raise ValueError("max_losses_per_day must be at least 1")
+        if self.daily_loss_limit_percent is not None and not 0 < self.daily_loss_limit_percent <= 100:
+            raise ValueError("daily_loss_limit_percent must be within (0, 100]")
+        if self.drawdown_threshold_percent is not None and not 0 < self.drawdown_threshold_percent < 100:
+            raise ValueError("drawdown_threshold_percent must be within (0, 100)")
+        if self.drawdown_risk_multiplier < 0:
+            raise ValueError("drawdown_risk_multiplier must not be negative")
+
+    @property
+    def stops_days(self) -> bool:
+        """Whether a daily rule can end a day before its last drawn trade"""
+        return self.max_losses_per_day is not None or self.daily_loss_limit_percent is not None
+
+    @property
+    def day_floor(self) -> float:
+        """Fraction of its starting balance at or below which a day stops trading; 0 is a wiped-out account"""
+        if self.daily_loss_limit_percent is None:
+            return 0.0
+        return 1 - self.daily_loss_limit_percent / 100
+
+    def stops_day(self, losses: int, balance: float, starting_balance: float) -> bool:
+        """Whether a day with these losses and balance so far takes no further trade"""
+        if self.max_losses_per_day is not None and losses >= self.max_losses_per_day:
+            return True
+        return balance <= starting_balance * self.day_floor
+
+    def cuts_risk(self, balance: float, peak_balance: float) -> bool:
+        """Whether a day starting at this balance trades at the reduced risk"""
+        if self.drawdown_threshold_percent is None:
+            return False
+        return balance <= peak_balance * (1 - self.drawdown_threshold_percent / 100)
+
+
+def intraday_trades(rules: RiskRules, taken: np.ndarray, trade_r: np.ndarray,
+                    risk_fraction: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Which (trade slots, paths, days) trades the daily rules let through, and the factor each day grows by.
+
+    The trade slots are walked in order, each step vectorized across all paths and days,
+    keeping every day's balance as a fraction of its start, its losses so far and whether
+    it has stopped. No trade follows one that leaves the balance <= 0, as in the scalar
+    engine.
+    """
+    allowed = np.empty_like(taken)
+    day_factor = np.ones(taken.shape[1:])
+    losses = np.zeros(taken.shape[1:], dtype=np.int16)
+    stopped = np.zeros(taken.shape[1:], dtype=bool)
+    for slot in range(len(taken)):
+        # taken and not stopped
+        np.greater(taken[slot], stopped, out=allowed[slot])
+        day_factor += day_factor * (risk_fraction * (trade_r[slot] * allowed[slot]))
+        stopped |= day_factor <= rules.day_floor
+        if rules.max_losses_per_day is not None:
+            losses += allowed[slot] & (trade_r[slot] <= 0)
+            stopped |= losses >= rules.max_losses_per_day
+    return allowed, day_factor
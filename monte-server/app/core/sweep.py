@@ -0,0 +1,171 @@
+import numpy as np
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.monte_carlo_simulator import (
+    TradeParameters,
+    PATH_BLOCK_SIZE,
+    compound_balances,
+    draw_trade_counts,
+    path_block_seeds,
+    trading_calendar_for
+)
+from app.core.path_statistics import running_peak
+from app.core.trading_calendar import TradingCalendar
+
+# Swept parameters, in the axis order of the heatmaps
+SWEEP_AXES = ('risk_per_trade_percent', 'risk_reward_ratio', 'win_rate')
+
+
+@dataclass
+class SweepResult:
+    """Heatmaps of a parameter sweep, each indexed [risk, reward ratio, win rate]"""
+    params: TradeParameters
+    n_paths: int
+    seed: int
+    start_date: datetime
+    calendar: TradingCalendar
+    axes: Dict[str, List[float]]
+    ruin_balance_percent: float
+    median_final_balance: np.ndarray
+    p95_max_drawdown_percent: np.ndarray
+    ruin_probability: np.ndarray
+
+    def to_dict(self) -> Dict:
+        return {
+            "n_paths": self.n_paths,
+            "seed": self.seed,
+            "axes": self.axes,
+            "ruin_balance_percent": self.ruin_balance_percent,
+            "median_final_balance": self.median_final_balance.tolist(),
+            "p95_max_drawdown_percent": self.p95_max_drawdown_percent.tolist(),
+            "ruin_probability": self.ruin_probability.tolist()
+        }
+
+
+def compound_outcomes(day_factor: np.ndarray, calendar: TradingCalendar,
+                      params: TradeParameters) -> Dict[str, np.ndarray]:
+    """Final balance, cashout, max drawdown in percent and lowest balance of (paths, days) growth factors"""
+    balances = compound_balances(day_factor, calendar.cashout_days, params.initial_balance,
+                                 params.monthly_cashout_percent)
+    ending_balance = balances['ending_balance']
+    peak_balance = running_peak(ending_balance, params.initial_balance)
+    return {
+        'final_balance': balances['final_balance'],
+        'total_cashout': balances['total_cashout'],
+        'max_drawdown_percent': (1 - np.min(ending_balance / peak_balance, axis=1, initial=1)) * 100,
+        'min_balance': np.min(ending_balance, axis=1, initial=np.inf),
+    }
+
+
+def require_fixed_trade_model(params: TradeParameters):
+    """Reject the params that compounding win and loss counts can't simulate.
+
+    Regime models, outcome distributions and risk rules all change how trades are drawn
+    or sized, so they would be silently replaced by the fixed win rate and risk.
+    """
+    if params.regimes is not None or params.outcomes is not None or params.risk_rules is not None:
+        raise ValueError("regimes, outcomes and risk_rules are not supported by sweeps and risk optimization")
+
+
+def sweep_axes(params: TradeParameters,
+               risk_per_trade_percent: Optional[Sequence[float]] = None,
+               risk_reward_ratio: Optional[Sequence[float]] = None,
+               win_rate: Optional[Sequence[float]] = None) -> Dict[str, List[float]]:
+    """Grid values of every swept parameter; axes left out keep the value of params"""
+    require_fixed_trade_model(params)
+    grid = (risk_per_trade_percent, risk_reward_ratio, win_rate)
+    axes = {name: [float(v) for v in ([getattr(params, name)] if values is None else values)]
+            for name, values in zip(SWEEP_AXES, grid)}
+    if not all(axes.values()):
+        raise ValueError("sweep grids must not be empty")
+    if any(risk >= 100 for risk in axes['risk_per_trade_percent']):
+        raise ValueError("risk_per_trade_percent must be below 100 in a sweep")
+    return axes
+
+
+def sweep_paths(params: TradeParameters, axes: Dict[str, List[float]], calendar: TradingCalendar,
+                first_path: int, n_paths: int, ruin_balance_percent: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Final balance, max drawdown in percent and ruin of n_paths paths at every grid point.
+
+    Trade counts and the uniforms behind every trade outcome are drawn once per path block,
+    exactly as VectorizedMonteCarloSimulator draws them, and each grid point only decides
+    which uniforms are wins and compounds the balances.
+    """
+    risks = np.array(axes['risk_per_trade_percent']) / 100
+    reward_ratios = np.array(axes['risk_reward_ratio'])
+    win_rates = axes['win_rate']
+    shape = (len(risks), len(reward_ratios), len(win_rates), n_paths)
+    final_balance = np.empty(shape)
+    max_drawdown_percent = np.empty(shape)
+    ruined = np.empty(shape, dtype=bool)
+
+    max_trades = params.max_trades_per_day
+    trade_counts = np.arange(max_trades + 1)
+    ruin_balance = params.initial_balance * ruin_balance_percent / 100
+    n_days = len(calendar)
+    first_block = first_path // PATH_BLOCK_SIZE
+    n_blocks = -(-n_paths // PATH_BLOCK_SIZE)
+    for block, block_seed in enumerate(path_block_seeds(params.seed, first_block, n_blocks)):
+        rng = np.random.default_rng(block_seed)
+        paths = slice(block * PATH_BLOCK_SIZE, min((block + 1) * PATH_BLOCK_SIZE, n_paths))
+        trades_taken = draw_trade_counts(rng, max_trades, paths.stop - paths.start, n_days)
+        outcome = rng.random((max_trades,) + trades_taken.shape)
+        taken = np.arange(max_trades)[:, None, None] < trades_taken
+
+        for k, rate in enumerate(win_rates):
+            wins = (taken & (outcome < rate)).sum(axis=0, dtype=np.int16)
+            losses = trades_taken - wins
+            for i, risk in enumerate(risks):
+                # Growth factor of each possible daily number of losses, then of wins
+                loss_factor = ((1 - risk) ** trade_counts)[losses]
+                for j, reward_ratio in enumerate(reward_ratios):
+                    day_factor = ((1 + risk * reward_ratio) ** trade_counts)[wins] * loss_factor
+                    outcome_statistics = compound_outcomes(day_factor, calendar, params)
+                    final_balance[i, j, k, paths] = outcome_statistics['final_balance']
+                    max_drawdown_percent[i, j, k, paths] = outcome_statistics['max_drawdown_percent']
+                    ruined[i, j, k, paths] = outcome_statistics['min_balance'] <= ruin_balance
+
+    return final_balance, max_drawdown_percent, ruined
+
+
+def summarize_sweep(params: TradeParameters, start_date: datetime, calendar: TradingCalendar,
+                    axes: Dict[str, List[float]], ruin_balance_percent: float, final_balance: np.ndarray,
+                    max_drawdown_percent: np.ndarray, ruined: np.ndarray) -> SweepResult:
+    """Reduce the per-path results of every grid point to heatmaps"""
+    return SweepResult(
+        params=params,
+        n_paths=final_balance.shape[-1],
+        seed=params.seed,
+        start_date=start_date,
+        calendar=calendar,
+        axes=axes,
+        ruin_balance_percent=ruin_balance_percent,
+        median_final_balance=np.median(final_balance, axis=-1),
+        p95_max_drawdown_percent=np.percentile(max_drawdown_percent, 95, axis=-1),
+        ruin_probability=ruined.mean(axis=-1)
+    )
+
+
+def run_sweep(params: TradeParameters, n_paths: int,
+              risk_per_trade_percent: Optional[Sequence[float]] = None,
+              risk_reward_ratio: Optional[Sequence[float]] = None,
+              win_rate: Optional[Sequence[float]] = None,
+              ruin_balance_percent: float = 50.0,
+              start_date: Optional[datetime] = None) -> SweepResult:
+    """Evaluate every point of a parameter grid on the same random draws (common random numbers).
+
+    Differences between grid points are due to the parameters, not to sampling noise, and
+    a grid point equal to params reproduces the ensemble of the same seed. A path is ruined
+    once an end-of-day balance falls to ruin_balance_percent of the initial balance.
+    """
+    if n_paths <= 0:
+        raise ValueError("n_paths must be positive")
+    axes = sweep_axes(params, risk_per_trade_percent, risk_reward_ratio, win_rate)
+    if params.seed is None:
+        params = replace(params, seed=np.random.SeedSequence().entropy)
+    start_date = start_date or datetime.now()
+    calendar = trading_calendar_for(params, start_date)
+    results = sweep_paths(params, axes, calendar, 0, n_paths, ruin_balance_percent)
+    return summarize_sweep(params, start_date, calendar, axes, ruin_balance_percent, *results)
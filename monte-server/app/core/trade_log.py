@@ -0,0 +1,63 @@
+import numpy as np
+from typing import Dict
+
+# One record per trade: 21 bytes instead of a few hundred for a dict with a datetime
+TRADE_DTYPE = np.dtype([
+    ('day', np.int32),              # index of the trading day in the run
+    ('is_win', np.bool_),
+    ('pnl', np.float64),
+    ('balance_after', np.float64),
+])
+
+
+class TradeLog:
+    """Growable columnar buffer of the trades of one simulation run"""
+
+    def __init__(self, capacity: int = 64):
+        self._trades = np.empty(max(capacity, 1), dtype=TRADE_DTYPE)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, day: int, is_win: bool, pnl: float, balance_after: float):
+        if self._size == len(self._trades):
+            grown = np.empty(2 * len(self._trades), dtype=TRADE_DTYPE)
+            grown[:self._size] = self._trades
+            self._trades = grown
+        self._trades[self._size] = (day, is_win, pnl, balance_after)
+        self._size += 1
+
+    def snapshot(self) -> Dict[str, list]:
+        """The logged trades as JSON-serializable columns"""
+        return {name: self.trades[name].tolist() for name in TRADE_DTYPE.names}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, list], capacity: int = 64) -> "TradeLog":
+        size = len(snapshot['day'])
+        log = cls(max(capacity, size))
+        for name in TRADE_DTYPE.names:
+            log._trades[name][:size] = snapshot[name]
+        log._size = size
+        return log
+
+    @property
+    def trades(self) -> np.ndarray:
+        """Structured array view of the logged trades"""
+        return self._trades[:self._size]
+
+    @property
+    def day(self) -> np.ndarray:
+        return self.trades['day']
+
+    @property
+    def is_win(self) -> np.ndarray:
+        return self.trades['is_win']
+
+    @property
+    def pnl(self) -> np.ndarray:
+        return self.trades['pnl']
+
+    @property
+    def balance_after(self) -> np.ndarray:
+        return self.trades['balance_after']
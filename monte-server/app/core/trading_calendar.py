@@ -0,0 +1,68 @@
+import numpy as np
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from enum import Enum
+from functools import lru_cache
+from typing import List
+
+
+class MarketType(str, Enum):
+    EQUITIES = "equities"  # Monday to Friday
+    CRYPTO = "crypto"      # 24/7
+    FX = "fx"              # Sunday to Friday
+
+
+@dataclass(frozen=True, eq=False)
+class TradingCalendar:
+    """Trading days of one run, precomputed as calendar-day offsets from the start date"""
+    start_date: date
+    simulation_days: int
+    market_type: MarketType
+    day_offsets: np.ndarray   # (n_trading_days,) calendar-day offset of every trading day
+    cashout_days: np.ndarray  # (n_trading_days,) True on the first trading day of a month
+
+    def __len__(self) -> int:
+        return len(self.day_offsets)
+
+    def date(self, index: int, start: datetime) -> datetime:
+        """Date of one trading day; start carries the time of day of the run"""
+        return start + timedelta(days=int(self.day_offsets[index]))
+
+    def dates(self, start: datetime) -> List[datetime]:
+        return [start + timedelta(days=offset) for offset in self.day_offsets.tolist()]
+
+
+@lru_cache(maxsize=512)
+def get_trading_calendar(start_date: date, simulation_days: int,
+                         market_type: MarketType = MarketType.EQUITIES) -> TradingCalendar:
+    """Calendar of a run, computed once per (start date, horizon, market type) and shared.
+
+    The monthly cashout falls on the first trading day of every month that starts within
+    the run, so months whose 1st is not a trading day are no longer skipped.
+    """
+    market_type = MarketType(market_type)
+    days = np.datetime64(start_date, 'D') + np.arange(simulation_days)
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    if market_type == MarketType.EQUITIES:
+        is_trading_day = weekday < 5
+    elif market_type == MarketType.FX:
+        is_trading_day = weekday != 5  # closed on Saturday
+    else:
+        is_trading_day = np.ones(simulation_days, dtype=bool)
+
+    day_offsets = np.flatnonzero(is_trading_day).astype(np.int32)
+    trading_days = days[day_offsets]
+    # Offset of the 1st of each trading day's month, relative to the start date
+    month_start_offsets = day_offsets - (trading_days - trading_days.astype('M8[M]')).astype(np.int64)
+    previous_offsets = np.concatenate([[-1], day_offsets[:-1]])
+    cashout_days = (month_start_offsets >= 0) & (previous_offsets < month_start_offsets)
+
+    day_offsets.setflags(write=False)
+    cashout_days.setflags(write=False)
+    return TradingCalendar(
+        start_date=start_date,
+        simulation_days=simulation_days,
+        market_type=market_type,
+        day_offsets=day_offsets,
+        cashout_days=cashout_days
+    )
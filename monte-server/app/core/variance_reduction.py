@@ -0,0 +1,121 @@
+import math
+import numpy as np
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+# Estimator variances below this fraction of the per-path variance are rounding noise
+EXACT_VARIANCE_RATIO = 1e-12
+# Paths of one Latin hypercube; a path block holds several, so that the standard error
+# rests on dozens of independent stratum means rather than a handful of block means
+STRATUM_PATHS = 32
+
+
+class SamplingMethod(str, Enum):
+    PLAIN = "plain"
+    ANTITHETIC = "antithetic"  # the second half of every path block mirrors the first, u -> 1 - u
+    STRATIFIED = "stratified"  # Latin hypercube over every STRATUM_PATHS paths of a block, for every draw
+
+
+def sample_uniforms(rng: np.random.Generator, shape: Tuple[int, ...],
+                    sampling: SamplingMethod = SamplingMethod.PLAIN) -> np.ndarray:
+    """Uniform draws for one path block, with the paths along axis -2 of shape.
+
+    Every path stays marginally uniform, so any statistic stays unbiased; only the
+    dependence between the paths of the block changes.
+    """
+    if sampling == SamplingMethod.ANTITHETIC:
+        n_paths = shape[-2]
+        half = rng.random(shape[:-2] + (-(-n_paths // 2),) + shape[-1:])
+        return np.concatenate([half, 1 - half], axis=-2)[..., :n_paths, :]
+    if sampling == SamplingMethod.STRATIFIED:
+        # Per draw, one random permutation of the m strata of each group of m paths, and
+        # one uniform within each stratum
+        n_paths = shape[-2]
+        n_full = n_paths // STRATUM_PATHS * STRATUM_PATHS
+        keys = rng.random(shape)
+        grouped = keys[..., :n_full, :].reshape(shape[:-2] + (-1, STRATUM_PATHS) + shape[-1:])
+        strata = np.concatenate([
+            np.argsort(grouped, axis=-2).reshape(shape[:-2] + (n_full,) + shape[-1:]),
+            np.argsort(keys[..., n_full:, :], axis=-2)
+        ], axis=-2)
+        group_size = np.where(np.arange(n_paths) < n_full, STRATUM_PATHS, n_paths - n_full)
+        return (strata + rng.random(shape)) / group_size[:, None]
+    return rng.random(shape)
+
+
+def mean_variance(values: np.ndarray, sampling: SamplingMethod, block_size: int) -> Optional[Tuple[float, int]]:
+    """Variance of the mean of per-path values, and the degrees of freedom it rests on.
+
+    Antithetic pairs and Latin hypercubes are dependent within but independent across,
+    so the variance comes from the spread of pair means or of STRATUM_PATHS-path group
+    means; None when there are too few of them to estimate it.
+    """
+    n = values.size
+    if sampling == SamplingMethod.PLAIN:
+        return (float(values.var(ddof=1)) / n, n - 1) if n > 1 else None
+
+    if sampling == SamplingMethod.ANTITHETIC:
+        n_blocks = n // block_size
+        blocks = values[:n_blocks * block_size].reshape(n_blocks, block_size)
+        half = block_size // 2
+        group_means = ((blocks[:, :half] + blocks[:, half:2 * half]) / 2).ravel()
+    else:
+        n_groups = n // STRATUM_PATHS
+        group_means = values[:n_groups * STRATUM_PATHS].reshape(n_groups, STRATUM_PATHS).mean(axis=1)
+    if group_means.size < 2:
+        return None
+    return float(group_means.var(ddof=1)) / group_means.size, group_means.size - 1
+
+
+def variance_reduction_report(values: np.ndarray, sampling: SamplingMethod, block_size: int,
+                              control: Optional[np.ndarray] = None,
+                              control_mean: Optional[float] = None) -> Dict[str, Optional[float]]:
+    """Mean of per-path values and the number of plain paths it is worth.
+
+    With a control of known mean, the estimate is corrected by the part of its sampling
+    error the control explains: mean(values) - beta * (mean(control) - control_mean),
+    beta being the regression slope of the values on the control. The effective sample
+    size is the number of plain Monte Carlo paths whose mean would be as precise, or
+    None when it can't be estimated or the estimate is exact. The standard error comes
+    with its degrees of freedom: with few of them, it is itself a rough estimate and
+    intervals should use Student's t.
+    """
+    values = np.asarray(values, dtype=float)
+    report: Dict[str, Optional[float]] = {
+        "mean": None,
+        "plain_mean": None,
+        "standard_error": None,
+        "degrees_of_freedom": None,
+        "effective_sample_size": None,
+        "gain": None,
+        "control_correlation": None
+    }
+    if values.size < 2 or not np.all(np.isfinite(values)):
+        return report
+
+    adjusted = values
+    if control is not None:
+        control = np.asarray(control, dtype=float)
+        covariance = np.cov(values, control)
+        if covariance[0, 0] > 0 and covariance[1, 1] > 0:
+            adjusted = values - covariance[0, 1] / covariance[1, 1] * (control - control_mean)
+            report["control_correlation"] = float(covariance[0, 1] / math.sqrt(covariance[0, 0] * covariance[1, 1]))
+
+    report["mean"] = float(adjusted.mean())
+    report["plain_mean"] = float(values.mean())
+    estimated = mean_variance(adjusted, sampling, block_size)
+    if estimated is None:
+        return report
+    variance, degrees_of_freedom = estimated
+    # The control's slope is estimated from the same paths
+    report["degrees_of_freedom"] = degrees_of_freedom - (adjusted is not values)
+    # A control that explains the values entirely (the final balance itself, without
+    # cashout) leaves only rounding noise: the estimate is exact, not infinitely sampled
+    report["standard_error"] = math.sqrt(variance)
+    if variance > values.var(ddof=1) * EXACT_VARIANCE_RATIO:
+        effective_sample_size = float(values.var(ddof=1)) / variance
+        report["effective_sample_size"] = effective_sample_size
+        report["gain"] = effective_sample_size / values.size
+    else:
+        report["standard_error"] = 0.0
+    return report
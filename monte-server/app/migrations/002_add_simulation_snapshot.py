@@ -0,0 +1,20 @@
+"""
+Migration: Add simulator snapshot to simulations table
+Date: 2026-10-18
+"""
+
+from sqlalchemy import text
+
+def upgrade(connection):
+    """Add the snapshot of unfinished runs to simulations table"""
+    connection.execute(text("""
+        ALTER TABLE simulations 
+        ADD COLUMN snapshot JSON NULL;
+    """))
+
+def downgrade(connection):
+    """Remove the snapshot of unfinished runs from simulations table"""
+    connection.execute(text("""
+        ALTER TABLE simulations 
+        DROP COLUMN IF EXISTS snapshot;
+    """))
@@ -36,6 +36,8 @@ class SimulationRecord(Base):
     # Detailed results (JSON)
     daily_results = Column(JSON, nullable=True)
     metrics = Column(JSON, nullable=True)
+    # Simulator state of an unfinished run, to resume it after a pause or a restart
+    snapshot = Column(JSON, nullable=True)
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -66,6 +68,7 @@ class SimulationRecord(Base):
             "metrics": self.metrics,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
-            "is_completed": self.is_completed
+            "is_completed": self.is_completed,
+            "is_resumable": self.snapshot is not None
         }
 
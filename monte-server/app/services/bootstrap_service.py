@@ -0,0 +1,49 @@
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Tuple
+
+from app.models.trading_data import TradingData
+from app.core.bootstrap import TradeHistory, trade_history_from_fills
+
+# Trade histories of recently simulated users, keyed by user id
+MAX_CACHED_HISTORIES = 256
+_history_cache: "OrderedDict[int, Tuple[Tuple[int, int], TradeHistory]]" = OrderedDict()
+
+
+class BootstrapService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_trade_history(self, user_id: int) -> TradeHistory:
+        """Realized trade returns of a user, rebuilt from the fills only when they have changed.
+
+        Imports only add rows and deletes remove them all, so the row count and the
+        highest id tell whether the cached history is still current.
+        """
+        version = tuple(self.db.query(func.count(TradingData.id), func.max(TradingData.id)).filter(
+            TradingData.user_id == user_id
+        ).one())
+        cached = _history_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            _history_cache.move_to_end(user_id)
+            return cached[1]
+
+        fills = self.db.query(
+            TradingData.symbol,
+            TradingData.side,
+            TradingData.quantity,
+            TradingData.price,
+            TradingData.commission,
+            TradingData.commission_asset,
+            TradingData.trade_time
+        ).filter(
+            TradingData.user_id == user_id
+        ).order_by(TradingData.trade_time.asc(), TradingData.id.asc()).all()
+
+        history = trade_history_from_fills(fills)
+        _history_cache[user_id] = (version, history)
+        _history_cache.move_to_end(user_id)
+        if len(_history_cache) > MAX_CACHED_HISTORIES:
+            _history_cache.popitem(last=False)
+        return history
@@ -48,6 +48,7 @@ class SimulationService:
         simulation.profit_factor = metrics.get("profit_factor")
         simulation.daily_results = data.get("daily_results", [])
         simulation.metrics = metrics
+        simulation.snapshot = None
         simulation.is_completed = True
         simulation.updated_at = datetime.now()
         
@@ -55,6 +56,15 @@ class SimulationService:
         self.db.refresh(simulation)
         return simulation
     
+    async def save_snapshot(self, simulation_id: str, snapshot: Dict) -> Optional[SimulationRecord]:
+        """Store the simulator state of an unfinished run"""
+        simulation = await self.get_simulation(simulation_id)
+        if simulation:
+            simulation.snapshot = snapshot
+            simulation.updated_at = datetime.now()
+            self.db.commit()
+        return simulation
+    
     async def get_simulation(self, simulation_id: str) -> Optional[SimulationRecord]:
         """Get simulation by ID"""
         return self.db.query(SimulationRecord).filter(
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Accuracy report of the compact (float32 / int8) mode of the vectorized engine.
+Runs every standard parameter set in float64 and in compact mode with the same seed,
+and prints the largest error of the fan chart bands and of the metric distributions,
+with the memory of the daily arrays and the run time of both modes.
+
+    python benchmarks/compact_accuracy.py --paths 20000 --days 365
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Add the server root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.monte_carlo_simulator import TradeParameters, VectorizedMonteCarloSimulator
+from app.core.ensemble import summarize_batch
+
+PARAMETER_SETS = {
+    "conservative": dict(risk_per_trade_percent=0.5, risk_reward_ratio=1.5, max_trades_per_day=2,
+                         monthly_cashout_percent=0.0, win_rate=0.50),
+    "standard": dict(risk_per_trade_percent=1.0, risk_reward_ratio=2.0, max_trades_per_day=3,
+                     monthly_cashout_percent=10.0, win_rate=0.55),
+    "aggressive": dict(risk_per_trade_percent=5.0, risk_reward_ratio=1.0, max_trades_per_day=10,
+                       monthly_cashout_percent=0.0, win_rate=0.52),
+    "losing": dict(risk_per_trade_percent=2.0, risk_reward_ratio=1.0, max_trades_per_day=5,
+                   monthly_cashout_percent=0.0, win_rate=0.45),
+}
+
+
+def daily_bytes(batch) -> int:
+    return sum(array.nbytes for array in (batch.starting_balance, batch.ending_balance,
+                                          batch.trades_taken, batch.wins, batch.losses))
+
+
+def relative_error(exact: np.ndarray, approximate: np.ndarray) -> float:
+    exact = np.asarray(exact, dtype=float)
+    approximate = np.asarray(approximate, dtype=float)
+    scale = np.maximum(np.abs(exact), 1e-12)
+    return float(np.max(np.abs(approximate - exact) / scale, initial=0))
+
+
+def metric_errors(exact, approximate):
+    """Largest relative error over the statistics of each metric, skipping undefined ones"""
+    errors = {}
+    for name, distribution in exact.metric_distributions.items():
+        pairs = [(value, approximate.metric_distributions[name][key]) for key, value in distribution.items()
+                 if key != "non_finite_fraction" and value is not None]
+        errors[name] = relative_error([pair[0] for pair in pairs], [pair[1] for pair in pairs]) if pairs else 0.0
+    return errors
+
+
+def report(n_paths: int, simulation_days: int):
+    start_date = datetime(2024, 1, 1)
+    print(f"{n_paths} paths x {simulation_days} days")
+    print(f"{'set':>13} {'balance band':>13} {'drawdown pp':>12} {'worst metric':>26} "
+          f"{'MB f64':>7} {'MB f32':>7} {'s f64':>6} {'s f32':>6}")
+    for name, values in PARAMETER_SETS.items():
+        params = TradeParameters(initial_balance=10000, simulation_days=simulation_days, seed=42, **values)
+        runs = {}
+        for compact in (False, True):
+            started = time.perf_counter()
+            batch = VectorizedMonteCarloSimulator(params, n_paths, compact=compact).run(start_date)
+            summary = summarize_batch(batch)
+            runs[compact] = (batch, summary, time.perf_counter() - started)
+        (exact_batch, exact, exact_time), (compact_batch, compact, compact_time) = runs[False], runs[True]
+
+        balance_error = max(relative_error(exact.balance_bands[key], compact.balance_bands[key])
+                            for key in exact.balance_bands)
+        drawdown_error = max(float(np.max(np.abs(exact.drawdown_bands[key] - compact.drawdown_bands[key]), initial=0))
+                             for key in exact.drawdown_bands)
+        errors = metric_errors(exact, compact)
+        worst = max(errors, key=errors.get)
+        print(f"{name:>13} {balance_error:>13.2e} {drawdown_error:>12.2e} {worst:>16} {errors[worst]:>9.2e} "
+              f"{daily_bytes(exact_batch) / 2**20:>7.1f} {daily_bytes(compact_batch) / 2**20:>7.1f} "
+              f"{exact_time:>6.2f} {compact_time:>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+    report(args.paths, args.days)
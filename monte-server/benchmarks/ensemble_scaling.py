@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark of the process-pool ensemble executor.
+Runs the same seeded ensemble on 1, 2, 4 and 8 shards, checks that every run is
+bit-identical to the serial one and prints the speedup over a single shard.
+
+    python benchmarks/ensemble_scaling.py --paths 40000 --days 365
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Add the server root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.monte_carlo_simulator import TradeParameters
+from app.core.ensemble import run_ensemble
+from app.core import ensemble_executor
+
+
+def same_result(a, b) -> bool:
+    return (
+        all(np.array_equal(a.balance_bands[k], b.balance_bands[k]) for k in a.balance_bands)
+        and all(np.array_equal(a.drawdown_bands[k], b.drawdown_bands[k]) for k in a.drawdown_bands)
+        and a.metric_distributions == b.metric_distributions
+    )
+
+
+async def benchmark(n_paths: int, simulation_days: int, shard_counts, repeats: int):
+    params = TradeParameters(
+        initial_balance=10000,
+        risk_per_trade_percent=1.0,
+        risk_reward_ratio=2.0,
+        max_trades_per_day=3,
+        monthly_cashout_percent=10.0,
+        win_rate=0.55,
+        simulation_days=simulation_days,
+        seed=42
+    )
+    start_date = datetime(2024, 1, 1)
+
+    ensemble_executor.SIMULATION_WORKERS = max(shard_counts)
+    ensemble_executor.start_executor()
+    try:
+        serial = run_ensemble(params, n_paths, start_date)
+        print(f"{n_paths} paths x {simulation_days} days, {os.cpu_count()} cores available")
+        print(f"{'shards':>6} {'seconds':>9} {'speedup':>8} {'identical':>10}")
+        baseline = None
+        for n_shards in shard_counts:
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                result = await ensemble_executor.run_ensemble_parallel(params, n_paths, start_date, n_shards)
+                timings.append(time.perf_counter() - started)
+            elapsed = min(timings)
+            baseline = baseline or elapsed
+            print(f"{n_shards:>6} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x {str(same_result(serial, result)):>10}")
+    finally:
+        ensemble_executor.shutdown_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=40000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.paths, args.days, args.shards, args.repeats))
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.adaptive import AdaptiveEnsemble, PrecisionTarget, run_adaptive_ensemble
+from app.core.ensemble import run_ensemble
+from app.core.monte_carlo_simulator import TradeParameters, VectorizedMonteCarloSimulator
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=10.0, win_rate=0.55,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+def test_stopped_run_holds_the_first_paths_of_the_ensemble():
+    params = make_params()
+    result = run_adaptive_ensemble(params, [PrecisionTarget("final_balance", "median", 0.02)],
+                                   batch_paths=256, max_paths=20000, start_date=START_DATE)
+    assert result.converged and 256 < result.n_paths < 20000
+    adaptive = result.to_dict()
+    for name, value in run_ensemble(params, result.n_paths, START_DATE).to_dict().items():
+        assert adaptive[name] == value, name
+
+
+def test_run_stops_at_the_first_batch_meeting_every_target():
+    params = make_params()
+    targets = [PrecisionTarget("final_balance", "median", 0.03), PrecisionTarget("ruin", "mean", 0.02, relative=False)]
+    ensemble = AdaptiveEnsemble(params, targets, batch_paths=256, max_paths=20000, ruin_balance_percent=90)
+    reports = []
+    batch = ensemble.next_batch()
+    while batch is not None:
+        first_path, n_paths = batch
+        assert first_path == ensemble.n_paths
+        paths = VectorizedMonteCarloSimulator(params, n_paths, first_path=first_path).run(START_DATE)
+        ensemble.add_batch(paths.ending_balance, paths.metrics)
+        reports.append(ensemble.precision)
+        batch = ensemble.next_batch()
+    ensemble.close()
+
+    assert all(report["met"] for report in reports[-1])
+    assert all(not all(report["met"] for report in batch_reports) for batch_reports in reports[:-1])
+    # The ruin indicator is checked against the lowest balance of every path
+    lowest = np.min(VectorizedMonteCarloSimulator(params, ensemble.n_paths).run(START_DATE).ending_balance, axis=1)
+    assert reports[-1][1]["estimate"] == np.mean(lowest <= 0.9 * params.initial_balance)
+
+
+def test_run_stops_at_the_path_budget():
+    result = run_adaptive_ensemble(make_params(), [PrecisionTarget("final_balance", "mean", 1e-6)],
+                                   batch_paths=256, max_paths=1000, start_date=START_DATE)
+    assert not result.converged
+    assert result.n_paths == 1000
+
+
+def test_close_deletes_the_spilled_balances():
+    params = make_params(simulation_days=30)
+    ensemble = AdaptiveEnsemble(params, [PrecisionTarget("final_balance")], max_paths=512)
+    paths = VectorizedMonteCarloSimulator(params, 256).run(START_DATE)
+    ensemble.add_batch(paths.ending_balance, paths.metrics)
+    balance_path = ensemble._balance_path
+    assert os.path.exists(balance_path)
+    ensemble.close()
+    assert not os.path.exists(balance_path)
+
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(ValueError):
+        PrecisionTarget("nope")
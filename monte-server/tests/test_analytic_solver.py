@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.analytic_solver import solve_final_balance
+from app.core.ensemble import BAND_PERCENTILES
+from app.core.monte_carlo_simulator import TradeParameters, VectorizedMonteCarloSimulator
+
+START_DATE = datetime(2024, 1, 1)
+N_PATHS = 20000
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=0, win_rate=0.55,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+@pytest.mark.parametrize("params", [
+    make_params(),
+    make_params(max_trades_per_day=10, risk_per_trade_percent=2.0, win_rate=0.4),
+    # Few trades, so the distribution is visibly discrete
+    make_params(max_trades_per_day=1, simulation_days=30)
+])
+def test_quantiles_match_monte_carlo(params):
+    solved = solve_final_balance(params, threshold=params.initial_balance, start_date=START_DATE)
+    assert solved.method == "analytic"
+    final_balance = VectorizedMonteCarloSimulator(params, N_PATHS).run(START_DATE).metrics['final_balance']
+
+    # Each solved quantile must sit where the sampled CDF crosses its level, up to
+    # sampling error; both sides are checked as the distribution is discrete
+    for percentile in BAND_PERCENTILES:
+        level = percentile / 100
+        tolerance = 4 * np.sqrt(level * (1 - level) / N_PATHS)
+        quantile = solved.quantiles[f"p{percentile}"]
+        assert np.mean(final_balance < quantile * (1 - 1e-9)) <= level + tolerance
+        assert np.mean(final_balance <= quantile * (1 + 1e-9)) >= level - tolerance
+
+    below = np.mean(final_balance < params.initial_balance)
+    assert solved.probability_below == pytest.approx(below, abs=4 * np.sqrt(below * (1 - below) / N_PATHS) + 1e-3)
+    standard_error = final_balance.std() / np.sqrt(N_PATHS)
+    assert abs(solved.expected_final_balance - final_balance.mean()) < 4 * standard_error
+
+
+def test_cashout_falls_back_to_sampling():
+    params = make_params(monthly_cashout_percent=10)
+    solved = solve_final_balance(params, start_date=START_DATE, fallback_paths=1000)
+    assert solved.method == "sampled"
+    assert solved.n_paths == 1000
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.core.bootstrap import BootstrapSimulator, TradeHistory
+from app.core.monte_carlo_simulator import TradeParameters
+
+
+def make_history() -> TradeHistory:
+    returns = np.array([0.02, -0.01, 0.015, -0.012, 0.0, 0.03, -0.02, 0.01])
+    closed_on = np.arange('2024-01-01', '2024-01-09', dtype='datetime64[D]')
+    return TradeHistory(returns=returns, closed_on=closed_on)
+
+
+def test_zero_trading_days():
+    # A Saturday start: a one-day equities window has no trading day
+    params = TradeParameters(initial_balance=10000, simulation_days=1, seed=3)
+    batch = BootstrapSimulator(params, 300, make_history()).run(datetime(2026, 10, 17))
+    assert batch.ending_balance.shape == (300, 0)
+    assert np.all(batch.metrics['final_balance'] == params.initial_balance)
+    assert np.all(batch.metrics['largest_loss'] == 0)
+
+
+def test_bootstrap_balances_compound_resampled_returns():
+    params = TradeParameters(initial_balance=10000, simulation_days=120, seed=3)
+    batch = BootstrapSimulator(params, 500, make_history(), method="block", block_size=3).run(datetime(2024, 1, 1))
+    metrics = batch.metrics
+    np.testing.assert_allclose(metrics['total_pnl'], metrics['final_balance'] - params.initial_balance, rtol=1e-9)
+    assert np.all(metrics['total_wins'] + metrics['total_losses'] == batch.trades_taken.sum(axis=1))
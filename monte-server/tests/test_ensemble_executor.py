@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.adaptive import PrecisionTarget, run_adaptive_ensemble
+from app.core.ensemble import run_ensemble
+from app.core.ensemble_executor import (
+    run_adaptive_ensemble_parallel,
+    run_ensemble_parallel,
+    shutdown_executor,
+    simulate_shard
+)
+from app.core.monte_carlo_simulator import TradeParameters, VectorizedMonteCarloSimulator
+from app.core.risk_rules import RiskRules
+
+START_DATE = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executor():
+    yield
+    shutdown_executor()
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=10.0, win_rate=0.55,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+@pytest.mark.parametrize("params", [
+    make_params(),
+    make_params(risk_rules=RiskRules(max_losses_per_day=2, drawdown_threshold_percent=10))
+])
+@pytest.mark.parametrize("compact", [False, True])
+def test_sharded_ensemble_matches_serial(params, compact):
+    serial = run_ensemble(params, 1000, START_DATE, compact=compact, streaks=True,
+                          target_balance_percent=120, checkpoint_days=[90]).to_dict()
+    sharded = asyncio.run(run_ensemble_parallel(params, 1000, START_DATE, n_shards=3, compact=compact,
+                                                streaks=True, target_balance_percent=120,
+                                                checkpoint_days=[90])).to_dict()
+    assert sharded == serial
+
+
+def test_shard_returns_balances_only_when_asked():
+    params = make_params()
+    balances, metrics, _, _ = simulate_shard(params, 256, 300, START_DATE)
+    batch = VectorizedMonteCarloSimulator(params, 300, first_path=256).run(START_DATE)
+    assert np.array_equal(balances, batch.ending_balance)
+    assert np.array_equal(metrics['final_balance'], batch.metrics['final_balance'])
+
+
+def test_parallel_adaptive_ensemble_matches_serial():
+    params = make_params()
+    targets = [PrecisionTarget("final_balance", "median", 0.02)]
+    serial = run_adaptive_ensemble(params, targets, 256, 20000, start_date=START_DATE).to_dict()
+    parallel = asyncio.run(run_adaptive_ensemble_parallel(params, targets, 256, 20000,
+                                                          start_date=START_DATE)).to_dict()
+    assert parallel == serial
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime
+
+# The app module connects on import; a throwaway SQLite file stands in for the server database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/simulations.db")
+
+import pytest
+
+from app.api.main import SimulationManager
+from app.core.database import Base, SessionLocal, engine
+from app.core.monte_carlo_simulator import MonteCarloTradingSimulator, TradeParameters
+from app.models import simulation, user  # noqa: F401  registers the tables
+from app.services.simulation_service import SimulationService
+
+START_DATE = datetime(2024, 1, 1)
+
+
+class RecordingWebSocket:
+    """Collects the messages of a run, and speeds the run up so the test doesn't wait on pacing"""
+
+    def __init__(self, manager: SimulationManager, simulation_id: str):
+        self.manager = manager
+        self.simulation_id = simulation_id
+        self.messages = []
+
+    async def send_json(self, message):
+        self.messages.append(message)
+        if message.get("type") == "daily_update":
+            self.manager.active_simulations[self.simulation_id]["speed"] = 10.0
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize("history", [True, False])
+def test_resumed_live_run_completes(db, history):
+    params = TradeParameters(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                             max_trades_per_day=3, simulation_days=60, seed=42)
+    _, metrics = MonteCarloTradingSimulator(params).run(START_DATE)
+
+    simulator = MonteCarloTradingSimulator(params)
+    days = simulator.iter_days(START_DATE)
+    for _ in range(20):
+        next(days)
+    # Through JSON, as the snapshot is persisted
+    snapshot = json.loads(json.dumps(simulator.snapshot(history=history)))
+    resumed = MonteCarloTradingSimulator.from_snapshot(snapshot)
+
+    simulation_id = f"resumed-{history}"
+    asyncio.run(SimulationService(db).create_simulation({
+        "simulation_id": simulation_id, "user_id": 1, **{
+            name: getattr(params, name) for name in ("initial_balance", "risk_per_trade_percent",
+                                                     "risk_reward_ratio", "max_trades_per_day", "win_rate",
+                                                     "simulation_days")
+        }
+    }))
+    manager = SimulationManager()
+    websocket = RecordingWebSocket(manager, simulation_id)
+    asyncio.run(manager.start_simulation(simulation_id, params, websocket, db, 1, simulator=resumed))
+
+    complete = websocket.messages[-1]
+    assert complete["type"] == "simulation_complete"
+    assert complete["metrics"]["total_trades"] == metrics.total_trades
+    assert complete["metrics"]["final_balance"] == metrics.final_balance
+    # Without history, the results start at the day the run was resumed on
+    assert complete["first_day"] == (0 if history else 20)
+    n_updates = sum(message["type"] == "daily_update" for message in websocket.messages)
+    assert len(complete["daily_results"]) == n_updates + (20 if history else 0)
+
+    record = asyncio.run(SimulationService(db).get_simulation(simulation_id))
+    assert record.is_completed and record.total_trades == metrics.total_trades
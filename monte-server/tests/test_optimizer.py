@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.monte_carlo_simulator import TradeParameters
+from app.core.optimizer import RiskOptimizer, optimize_risk
+from app.core.risk_rules import RiskRules
+
+START_DATE = datetime(2024, 1, 1)
+TOLERANCE = 0.01
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=0, win_rate=0.45,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+def test_drawdown_limit_bounds_the_risk():
+    # Kelly risk is 17.5% here, so growth keeps rising over the range and the limit binds
+    params = make_params()
+    result = optimize_risk(params, 500, max_drawdown_percent=10, start_date=START_DATE)
+    assert result.drawdown_bound
+    assert result.profile["p95_max_drawdown_percent"] <= 10
+    above = RiskOptimizer(params, 500, START_DATE).evaluate(result.risk_per_trade_percent + TOLERANCE)
+    assert above["p95_max_drawdown_percent"] > 10
+
+
+def test_growth_optimum_matches_a_grid_search():
+    # Kelly risk is 4% for an even-money 52% win rate, well inside the searched range
+    params = make_params(risk_reward_ratio=1.0, win_rate=0.52)
+    result = optimize_risk(params, 500, max_drawdown_percent=99, start_date=START_DATE)
+    assert not result.drawdown_bound
+
+    optimizer = RiskOptimizer(params, 500, START_DATE)
+    grid = np.linspace(0.1, 10, 199)
+    best = max(optimizer.evaluate(risk)["median_log_growth"] for risk in grid)
+    assert result.profile["median_log_growth"] >= best
+    assert 1 < result.risk_per_trade_percent < 8
+
+
+def test_limit_below_the_smallest_risk_has_no_optimum():
+    result = optimize_risk(make_params(), 200, max_drawdown_percent=0.01, start_date=START_DATE)
+    assert result.risk_per_trade_percent is None
+
+
+def test_optimizer_rejects_risk_rules():
+    with pytest.raises(ValueError):
+        RiskOptimizer(make_params(risk_rules=RiskRules(max_losses_per_day=2)), 100, START_DATE)
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.monte_carlo_simulator import MonteCarloTradingSimulator, TradeParameters, VectorizedMonteCarloSimulator
+from app.core.outcomes import AliasTable, OutcomeDistribution
+
+PROBABILITIES = [0.05, 0.3, 0.0, 0.15, 0.4, 0.1]
+
+
+def alias_masses(table: AliasTable) -> np.ndarray:
+    """Probability of every outcome implied by the table: each column holds 1/n"""
+    n = len(table.accept)
+    masses = np.bincount(np.arange(n), weights=table.accept, minlength=n)
+    masses += np.bincount(table.alias, weights=1 - table.accept, minlength=n)
+    return masses / n
+
+
+@pytest.mark.parametrize("probabilities", [PROBABILITIES, [1.0], [0.5, 0.5], [1e-6, 1 - 1e-6]])
+def test_alias_table_holds_the_distribution(probabilities):
+    assert np.allclose(alias_masses(AliasTable(np.array(probabilities))), probabilities, atol=1e-12)
+
+
+def test_sampled_frequencies_match_the_distribution():
+    n_draws = 1_000_000
+    draws = AliasTable(np.array(PROBABILITIES)).sample(np.random.default_rng(0).random(n_draws))
+    frequencies = np.bincount(draws, minlength=len(PROBABILITIES)) / n_draws
+    probabilities = np.array(PROBABILITIES)
+    tolerance = 5 * np.sqrt(probabilities * (1 - probabilities) / n_draws)
+    assert np.all(np.abs(frequencies - probabilities) <= tolerance)
+    assert frequencies[2] == 0
+
+
+def test_histogram_counts_are_normalized():
+    counts = OutcomeDistribution([-1.0, 0.0, 0.5, 2.0], [30, 10, 20, 40])
+    probabilities = OutcomeDistribution([-1.0, 0.0, 0.5, 2.0], [0.3, 0.1, 0.2, 0.4])
+    assert counts.win_rate == pytest.approx(0.6)
+    assert counts.expected_r == pytest.approx(probabilities.expected_r)
+    assert counts.worst_r == -1.0
+    uniforms = np.random.default_rng(1).random(1000)
+    assert np.array_equal(counts.sample(uniforms), probabilities.sample(uniforms))
+
+
+@pytest.mark.parametrize("r_multiples, probabilities", [([], []), ([1.0, 2.0], [0.5]), ([1.0], [-1.0]),
+                                                          ([1.0, 2.0], [0, 0]), ([np.inf], [1.0])])
+def test_invalid_distributions_are_rejected(r_multiples, probabilities):
+    with pytest.raises(ValueError):
+        OutcomeDistribution(r_multiples, probabilities)
+
+
+def test_scalar_and_vectorized_outcomes_agree():
+    start_date = datetime(2024, 1, 1)
+
+    def make_params(seed: int) -> TradeParameters:
+        return TradeParameters(initial_balance=10000, risk_per_trade_percent=1.0, max_trades_per_day=3,
+                               simulation_days=180, seed=seed,
+                               outcomes=OutcomeDistribution([-1.2, -1.0, 0.0, 0.5, 2.0, 4.0], PROBABILITIES))
+
+    runs = [MonteCarloTradingSimulator(make_params(seed), keep_history=False).run(start_date)[1]
+            for seed in range(400)]
+    batch = VectorizedMonteCarloSimulator(make_params(42), 4000).run(start_date)
+    for name in ['total_trades', 'overall_win_rate', 'final_balance', 'largest_loss', 'average_win']:
+        scalar = np.array([getattr(metrics, name) for metrics in runs])
+        vectorized = batch.metrics[name]
+        standard_error = np.sqrt(scalar.var(ddof=1) / len(scalar) + vectorized.var(ddof=1) / len(vectorized))
+        assert abs(scalar.mean() - vectorized.mean()) < 4 * standard_error, name
+    assert batch.metrics['overall_win_rate'].mean() == pytest.approx(0.65, abs=0.01)
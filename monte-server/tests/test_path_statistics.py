@@ -0,0 +1,113 @@
+from datetime import datetime
+from itertools import groupby
+
+import numpy as np
+import pytest
+
+from app.core.monte_carlo_simulator import MonteCarloTradingSimulator, TradeParameters
+from app.core.path_statistics import (
+    day_streaks,
+    first_passage_cdf,
+    first_passage_day,
+    longest_run,
+    max_drawdown,
+    max_drawdown_duration,
+    run_lengths,
+    streak_statistics,
+    trade_streaks
+)
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def scalar_drawdown_duration(balances, initial_balance: float) -> int:
+    """The scalar simulator's rule: any day not above the peak before it extends the duration"""
+    peak, duration, longest = initial_balance, 0, 0
+    for balance in balances:
+        if balance > peak:
+            peak, duration = balance, 0
+        else:
+            duration += 1
+            longest = max(longest, duration)
+    return longest
+
+
+def test_longest_run_matches_a_loop():
+    masks = np.random.default_rng(0).random((200, 60)) < 0.7
+    masks[0] = True
+    masks[1] = False
+    expected = [max((len(list(run)) for value, run in groupby(row) if value), default=0) for row in masks]
+    assert np.array_equal(longest_run(masks), expected)
+    assert np.array_equal(longest_run(np.zeros((3, 0), dtype=bool)), [0, 0, 0])
+
+
+def test_flat_days_at_the_peak_count_as_underwater():
+    # Day 1 equals the initial balance and days 3-4 repeat the new peak without exceeding it
+    balances = np.array([[100.0, 105.0, 105.0, 105.0, 104.0, 106.0, 106.0]])
+    assert scalar_drawdown_duration(balances[0], 100.0) == 3
+    assert max_drawdown_duration(np.concatenate([[[100.0]], balances], axis=1), 100.0)[0] == 3
+    assert max_drawdown_duration(balances, 100.0)[0] == 3
+
+
+@pytest.mark.parametrize("max_trades", [1, 3])
+def test_path_statistics_match_the_scalar_engine(max_trades):
+    # One trade a day at most leaves many days without trades, and so flat
+    runs = []
+    for seed in range(20):
+        params = TradeParameters(initial_balance=10000, risk_per_trade_percent=2.0, risk_reward_ratio=1.5,
+                                 max_trades_per_day=max_trades, monthly_cashout_percent=10.0,
+                                 simulation_days=200, seed=seed)
+        runs.append(MonteCarloTradingSimulator(params).run(START_DATE))
+    ending_balance = np.array([[day.ending_balance for day in daily_results] for daily_results, _ in runs])
+    wins = np.array([[day.wins for day in daily_results] for daily_results, _ in runs])
+    losses = np.array([[day.losses for day in daily_results] for daily_results, _ in runs])
+
+    assert np.array_equal(max_drawdown_duration(ending_balance, 10000), [m.max_drawdown_duration for _, m in runs])
+    assert np.allclose(max_drawdown(ending_balance, 10000), [m.max_drawdown for _, m in runs])
+    streaks = day_streaks(wins, losses)
+    assert np.array_equal(streaks.longest_winning, [m.longest_winning_streak for _, m in runs])
+    assert np.array_equal(streaks.longest_losing, [m.longest_losing_streak for _, m in runs])
+
+
+def test_run_lengths_of_ragged_and_empty_rows():
+    labels = np.array([1, 1, -1, 0, 0, 1, 1, -1, -1, -1])
+    # Row 1 is empty; rows 2 and 3 split a run of 1s that a single row would merge
+    row_starts = np.array([0, 3, 3, 6, 10])
+    rows, run_labels, lengths = run_lengths(labels, row_starts)
+    assert rows.tolist() == [0, 0, 2, 2, 3, 3]
+    assert run_labels.tolist() == [1, -1, 0, 1, 1, -1]
+    assert lengths.tolist() == [2, 1, 2, 1, 1, 3]
+
+    streaks = streak_statistics(labels, row_starts, 5)
+    assert streaks.longest_winning.tolist() == [2, 0, 1, 1, 0]
+    assert streaks.longest_losing.tolist() == [1, 0, 0, 3, 0]
+    assert streaks.winning_counts.tolist() == [0, 2, 1]
+    assert streaks.losing_counts.tolist() == [0, 1, 0, 1]
+
+
+def test_trade_streaks_skip_empty_slots():
+    # (slots, paths, days): path 0 wins, skips a slot, wins across a day and loses; path 1 never trades
+    winning = np.zeros((2, 2, 2), dtype=bool)
+    losing = np.zeros((2, 2, 2), dtype=bool)
+    winning[0, 0, 0] = winning[0, 0, 1] = True
+    losing[1, 0, 1] = True
+    streaks = trade_streaks(winning, losing)
+    assert streaks.longest_winning.tolist() == [2, 0]
+    assert streaks.longest_losing.tolist() == [1, 0]
+    assert streaks.winning_counts.tolist() == [0, 0, 1]
+    assert streaks.losing_counts.tolist() == [0, 1]
+
+
+def test_first_passage_is_censored_at_the_horizon():
+    balances = np.array([[100.0, 120.0, 90.0],
+                         [130.0, 80.0, 140.0],
+                         [100.0, 101.0, 102.0]])
+    target = first_passage_day(balances, 120)
+    ruin = first_passage_day(balances, 85, above=False)
+    assert target.tolist() == [1, 0, -1]
+    assert ruin.tolist() == [-1, 1, -1]
+    # Censored paths never enter the CDF but still count in its denominator
+    assert first_passage_cdf(target, 3).tolist() == pytest.approx([1 / 3, 2 / 3, 2 / 3])
+    assert first_passage_cdf(ruin, 3).tolist() == pytest.approx([0, 1 / 3, 1 / 3])
+    assert first_passage_day(np.empty((2, 0)), 120).tolist() == [-1, -1]
+    assert first_passage_cdf(np.array([-1, -1]), 0).size == 0
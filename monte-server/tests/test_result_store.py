@@ -0,0 +1,51 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core import result_store
+from app.core.monte_carlo_simulator import TradeParameters, trading_calendar_for
+from app.core.result_store import StoredEnsemble, create_store, sweep_stores, write_metadata, write_shard
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def store_ensemble(directory: str, job_id: str, owner_id: int, n_paths: int = 64) -> str:
+    params = TradeParameters(initial_balance=10000, simulation_days=30, seed=5)
+    n_days = len(trading_calendar_for(params, START_DATE))
+    path = create_store(job_id, n_days, n_paths, directory)
+    metrics = write_shard(path, params, 0, n_paths, START_DATE)
+    write_metadata(job_id, params, START_DATE, metrics, owner_id, directory)
+    return os.path.join(directory, job_id)
+
+
+def test_stored_ensemble_keeps_its_owner(tmp_path):
+    store_ensemble(str(tmp_path), "job", owner_id=7)
+    stored = StoredEnsemble("job", str(tmp_path))
+    assert stored.owner_id == 7
+    assert stored.n_paths == 64
+
+
+def test_sweep_deletes_expired_stores(tmp_path):
+    old_dir = store_ensemble(str(tmp_path), "old", owner_id=1)
+    store_ensemble(str(tmp_path), "new", owner_id=1)
+    expired = time.time() - (result_store.ENSEMBLE_STORE_TTL_HOURS + 1) * 3600
+    os.utime(old_dir, (expired, expired))
+    assert sweep_stores(str(tmp_path)) == ["old"]
+    assert sorted(os.listdir(tmp_path)) == ["new"]
+
+
+def test_size_cap_deletes_oldest_stores(tmp_path, monkeypatch):
+    first_dir = store_ensemble(str(tmp_path), "first", owner_id=1)
+    written = time.time() - 60
+    os.utime(first_dir, (written, written))
+    store_ensemble(str(tmp_path), "second", owner_id=2)
+    stored_bytes = sum(entry.stat().st_size for entry in os.scandir(first_dir))
+    monkeypatch.setattr(result_store, "ENSEMBLE_STORE_MAX_BYTES", 2 * stored_bytes)
+
+    store_ensemble(str(tmp_path), "third", owner_id=3)
+    assert sorted(os.listdir(tmp_path)) == ["second", "third"]
+    with pytest.raises(ValueError):
+        create_store("huge", 1000, 1000, str(tmp_path))
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.monte_carlo_simulator import MonteCarloTradingSimulator, TradeParameters, VectorizedMonteCarloSimulator
+from app.core.outcomes import OutcomeDistribution
+from app.core.risk_rules import RiskRules, intraday_trades
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=2.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=10.0, win_rate=0.45,
+                  simulation_days=180, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+def scalar_intraday_trades(rules: RiskRules, taken: np.ndarray, trade_r: np.ndarray, risk_fraction: float):
+    """intraday_trades one day and one trade at a time, stopping the way the scalar engine does"""
+    allowed = np.zeros_like(taken)
+    day_factor = np.ones(taken.shape[1:])
+    for cell in np.ndindex(*taken.shape[1:]):
+        balance = 1.0
+        losses = 0
+        for slot in range(len(taken)):
+            if not taken[(slot,) + cell] or rules.stops_day(losses, balance, 1.0):
+                continue
+            allowed[(slot,) + cell] = True
+            balance *= 1 + risk_fraction * trade_r[(slot,) + cell]
+            losses += trade_r[(slot,) + cell] <= 0
+        day_factor[cell] = balance
+    return allowed, day_factor
+
+
+@pytest.mark.parametrize("rules, r_multiples, risk_fraction", [
+    (RiskRules(max_losses_per_day=2), [2.0, -1.0], 0.02),
+    (RiskRules(daily_loss_limit_percent=3), [2.0, -1.0], 0.02),
+    (RiskRules(max_losses_per_day=3, daily_loss_limit_percent=5), [3.0, 0.5, 0.0, -1.0, -2.5], 0.02),
+    # A -3R trade at 40% risk wipes the account out, which stops the day without any rule
+    (RiskRules(), [1.0, -3.0], 0.4)
+])
+def test_intraday_trades_match_a_per_trade_loop(rules, r_multiples, risk_fraction):
+    rng = np.random.default_rng(7)
+    n_slots, n_paths, n_days = 8, 20, 15
+    taken = np.arange(n_slots)[:, None, None] < rng.integers(0, n_slots + 1, (n_paths, n_days))
+    trade_r = rng.choice(r_multiples, (n_slots, n_paths, n_days))
+
+    allowed, day_factor = intraday_trades(rules, taken, trade_r, risk_fraction)
+    expected_allowed, expected_factor = scalar_intraday_trades(rules, taken, trade_r, risk_fraction)
+    assert np.array_equal(allowed, expected_allowed)
+    assert np.allclose(day_factor, expected_factor, rtol=1e-12)
+    assert not allowed[~taken].any()
+
+
+@pytest.mark.parametrize("rules", [
+    RiskRules(daily_loss_limit_percent=3),
+    RiskRules(drawdown_threshold_percent=5, drawdown_risk_multiplier=0.5),
+    RiskRules(max_losses_per_day=2, daily_loss_limit_percent=3, drawdown_threshold_percent=5)
+])
+def test_scalar_and_vectorized_engines_agree_with_risk_rules(rules):
+    # Different random streams, so the engines agree in distribution only: every mean
+    # must be within four standard errors of the difference
+    runs = [MonteCarloTradingSimulator(make_params(seed=seed, risk_rules=rules), keep_history=False)
+            .run(START_DATE)[1] for seed in range(300)]
+    batch = VectorizedMonteCarloSimulator(make_params(risk_rules=rules), 3000).run(START_DATE)
+    for name in ['total_trades', 'final_balance', 'max_drawdown', 'total_cashout']:
+        scalar = np.array([getattr(metrics, name) for metrics in runs])
+        vectorized = batch.metrics[name]
+        standard_error = np.sqrt(scalar.var(ddof=1) / len(scalar) + vectorized.var(ddof=1) / len(vectorized))
+        assert abs(scalar.mean() - vectorized.mean()) < 4 * standard_error, name
+
+
+def test_daily_loss_stop_takes_fewer_trades():
+    free = VectorizedMonteCarloSimulator(make_params(), 1000).run(START_DATE)
+    stopped = VectorizedMonteCarloSimulator(make_params(risk_rules=RiskRules(max_losses_per_day=1)), 1000).run(START_DATE)
+    # The same draws: a day only loses trades after its first loss
+    assert np.all(stopped.metrics['total_trades'] <= free.metrics['total_trades'])
+    assert np.all(stopped.trades_taken <= free.trades_taken)
+    assert np.all(stopped.losses <= 1)
+
+
+@pytest.mark.parametrize("outcomes", [None, OutcomeDistribution([2.0, 0.0, -1.0, -1.5], [0.4, 0.1, 0.4, 0.1])])
+def test_drawdown_cut_without_daily_stops_matches_the_slot_walk(outcomes):
+    # A loss limit no day can reach sends the same draws through intraday_trades, which
+    # the drawdown rule alone skips
+    drawdown = dict(drawdown_threshold_percent=5, drawdown_risk_multiplier=0.5)
+    fast = VectorizedMonteCarloSimulator(make_params(outcomes=outcomes, risk_rules=RiskRules(**drawdown)),
+                                         500).run(START_DATE)
+    walked = VectorizedMonteCarloSimulator(make_params(outcomes=outcomes, risk_rules=RiskRules(
+        max_losses_per_day=100, **drawdown)), 500).run(START_DATE)
+    assert np.allclose(fast.ending_balance, walked.ending_balance, rtol=1e-9)
+    assert np.array_equal(fast.trades_taken, walked.trades_taken)
+    assert np.allclose(fast.metrics['max_drawdown'], walked.metrics['max_drawdown'], rtol=1e-9)
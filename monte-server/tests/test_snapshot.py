@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.monte_carlo_simulator import MonteCarloTradingSimulator, TradeParameters
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def make_params() -> TradeParameters:
+    return TradeParameters(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                           max_trades_per_day=3, monthly_cashout_percent=10, simulation_days=365, seed=42)
+
+
+def resumed_run(stop_after_days: int, history: bool = True) -> MonteCarloTradingSimulator:
+    simulator = MonteCarloTradingSimulator(make_params())
+    days = simulator.iter_days(START_DATE)
+    for _ in range(stop_after_days):
+        next(days)
+    # Through JSON, as the snapshot is persisted
+    snapshot = json.loads(json.dumps(simulator.snapshot(history=history)))
+    resumed = MonteCarloTradingSimulator.from_snapshot(snapshot)
+    resumed.run()
+    return resumed
+
+
+def test_resume_with_history_is_identical():
+    daily_results, metrics = MonteCarloTradingSimulator(make_params()).run(START_DATE)
+    resumed = resumed_run(100)
+    assert resumed.daily_results == daily_results
+    assert resumed.metrics() == metrics
+
+
+def test_snapshot_without_history_stays_small():
+    simulator = MonteCarloTradingSimulator(make_params())
+    days = simulator.iter_days(START_DATE)
+    sizes = []
+    for _ in range(2):
+        for _ in range(100):
+            next(days)
+        snapshot = simulator.snapshot(history=False)
+        assert snapshot["daily_results"] == [] and snapshot["trades"] is None
+        sizes.append(len(json.dumps(snapshot)))
+    assert sizes[0] == pytest.approx(sizes[1], rel=0.05)
+
+
+def test_resume_without_history_keeps_run_metrics():
+    _, metrics = MonteCarloTradingSimulator(make_params()).run(START_DATE)
+    resumed = resumed_run(100, history=False)
+    assert not resumed.keep_history
+    assert resumed.metrics() == metrics
+
+
+def test_metrics_without_history_are_identical():
+    _, metrics = MonteCarloTradingSimulator(make_params()).run(START_DATE)
+    _, accumulated = MonteCarloTradingSimulator(make_params(), keep_history=False).run(START_DATE)
+    assert accumulated.sharpe_ratio == metrics.sharpe_ratio
+    assert accumulated == metrics
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.monte_carlo_simulator import TradeParameters, VectorizedMonteCarloSimulator
+from app.core.outcomes import OutcomeDistribution
+from app.core.path_statistics import running_peak
+from app.core.regimes import MarketRegime, RegimeModel
+from app.core.risk_rules import RiskRules
+from app.core.sweep import run_sweep
+
+START_DATE = datetime(2024, 1, 1)
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=10.0, win_rate=0.55,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+def test_base_grid_point_reproduces_the_ensemble():
+    params = make_params()
+    result = run_sweep(params, 600, risk_per_trade_percent=[0.5, 1.0], win_rate=[0.5, 0.55],
+                       ruin_balance_percent=90, start_date=START_DATE)
+    batch = VectorizedMonteCarloSimulator(params, 600).run(START_DATE)
+
+    ending_balance = batch.ending_balance
+    peak_balance = running_peak(ending_balance, params.initial_balance)
+    max_drawdown_percent = (1 - np.min(ending_balance / peak_balance, axis=1)) * 100
+    ruined = np.min(ending_balance, axis=1) <= 0.9 * params.initial_balance
+    assert result.median_final_balance[1, 0, 1] == np.median(batch.metrics['final_balance'])
+    assert result.p95_max_drawdown_percent[1, 0, 1] == np.percentile(max_drawdown_percent, 95)
+    assert result.ruin_probability[1, 0, 1] == ruined.mean()
+
+
+@pytest.mark.parametrize("overrides", [
+    dict(regimes=RegimeModel([MarketRegime(win_rate=0.6), MarketRegime(win_rate=0.4)], [[0.9, 0.1], [0.2, 0.8]])),
+    dict(outcomes=OutcomeDistribution([-1.0, 0.5, 2.0], [0.4, 0.2, 0.4])),
+    dict(risk_rules=RiskRules(max_losses_per_day=2))
+])
+def test_sweep_rejects_other_trade_models(overrides):
+    with pytest.raises(ValueError):
+        run_sweep(make_params(**overrides), 100, start_date=START_DATE)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.core.variance_reduction import (
+    STRATUM_PATHS,
+    SamplingMethod,
+    sample_uniforms,
+    variance_reduction_report
+)
+
+BLOCK_SIZE = 256
+
+
+@pytest.mark.parametrize("n_paths", [256, 201])
+def test_antithetic_paths_mirror_the_first_half(n_paths):
+    uniforms = sample_uniforms(np.random.default_rng(0), (3, n_paths, 50), SamplingMethod.ANTITHETIC)
+    half = -(-n_paths // 2)
+    assert uniforms.shape == (3, n_paths, 50)
+    assert np.array_equal(uniforms[:, half:], 1 - uniforms[:, :n_paths - half])
+
+
+@pytest.mark.parametrize("n_paths", [256, 208, 20])
+def test_stratified_groups_cover_every_stratum(n_paths):
+    uniforms = sample_uniforms(np.random.default_rng(0), (3, n_paths, 50), SamplingMethod.STRATIFIED)
+    assert uniforms.shape == (3, n_paths, 50)
+    assert np.all((uniforms >= 0) & (uniforms < 1))
+    # Every group of paths has exactly one uniform in each of its strata, for every draw
+    for start in range(0, n_paths, STRATUM_PATHS):
+        group = uniforms[:, start:start + STRATUM_PATHS]
+        strata = np.sort(np.floor(group * group.shape[1]), axis=1)
+        assert np.all(strata == np.arange(group.shape[1])[:, None])
+
+
+@pytest.mark.parametrize("sampling", list(SamplingMethod))
+def test_every_path_stays_uniform(sampling):
+    uniforms = sample_uniforms(np.random.default_rng(1), (BLOCK_SIZE, 400), sampling).ravel()
+    counts = np.histogram(uniforms, bins=10, range=(0, 1))[0]
+    expected = uniforms.size / 10
+    assert np.all(np.abs(counts - expected) < 5 * np.sqrt(expected))
+
+
+@pytest.mark.parametrize("sampling", list(SamplingMethod))
+def test_standard_error_is_calibrated(sampling):
+    # A smooth, non-additive function of 20 draws per path, so that stratification leaves
+    # a residual variance for the standard error to estimate
+    rng = np.random.default_rng(2)
+    means = []
+    standard_errors = []
+    for _ in range(400):
+        uniforms = np.concatenate([sample_uniforms(rng, (BLOCK_SIZE, 20), sampling) for _ in range(8)])
+        values = np.prod(0.5 + uniforms, axis=1)
+        report = variance_reduction_report(values, sampling, BLOCK_SIZE)
+        means.append(report["mean"])
+        standard_errors.append(report["standard_error"])
+    assert np.mean(standard_errors) == pytest.approx(np.std(means, ddof=1), rel=0.12)
+
+
+def test_report_counts_its_degrees_of_freedom():
+    values = np.random.default_rng(3).random(2000)
+    assert variance_reduction_report(values, SamplingMethod.PLAIN, BLOCK_SIZE)["degrees_of_freedom"] == 1999
+    assert variance_reduction_report(values, SamplingMethod.STRATIFIED, BLOCK_SIZE)["degrees_of_freedom"] == 61
+    controlled = variance_reduction_report(values, SamplingMethod.ANTITHETIC, BLOCK_SIZE, values + 1, 1.5)
+    # 7 whole blocks of 128 antithetic pairs, less one for the control's slope
+    assert controlled["degrees_of_freedom"] == 7 * 128 - 2
+
+
+def test_control_variate_removes_the_explained_error():
+    rng = np.random.default_rng(4)
+    control = rng.normal(size=4000)
+    values = 3 * control + rng.normal(scale=0.1, size=4000)
+    report = variance_reduction_report(values, SamplingMethod.PLAIN, BLOCK_SIZE, control, 0.0)
+    assert report["control_correlation"] > 0.99
+    assert report["mean"] == pytest.approx(0, abs=4 * 0.1 / np.sqrt(4000))
+    assert report["gain"] > 100
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.ensemble import run_ensemble
+from app.core.monte_carlo_simulator import (
+    MonteCarloTradingSimulator,
+    TradeParameters,
+    VectorizedMonteCarloSimulator,
+    regime_trade_counts,
+    trade_counts_from_uniforms,
+    trading_calendar_for
+)
+
+# A Saturday: the equities calendar of a one- or two-day run has no trading day
+WEEKEND_START = datetime(2026, 10, 17)
+
+
+def make_params(**overrides) -> TradeParameters:
+    values = dict(initial_balance=10000, risk_per_trade_percent=1.0, risk_reward_ratio=2.0,
+                  max_trades_per_day=3, monthly_cashout_percent=10.0, win_rate=0.55,
+                  simulation_days=365, seed=42)
+    values.update(overrides)
+    return TradeParameters(**values)
+
+
+def test_scalar_and_vectorized_engines_agree():
+    # Different random streams, so the engines agree in distribution only: every mean
+    # must be within four standard errors of the difference
+    start_date = datetime(2024, 1, 1)
+    params = make_params(simulation_days=180)
+    runs = [MonteCarloTradingSimulator(make_params(simulation_days=180, seed=seed), keep_history=False)
+            .run(start_date)[1] for seed in range(400)]
+    batch = VectorizedMonteCarloSimulator(params, 4000).run(start_date)
+    for name in ['total_trades', 'overall_win_rate', 'final_balance', 'max_drawdown',
+                 'longest_losing_streak', 'total_cashout']:
+        scalar = np.array([getattr(metrics, name) for metrics in runs])
+        vectorized = batch.metrics[name]
+        standard_error = np.sqrt(scalar.var(ddof=1) / len(scalar) + vectorized.var(ddof=1) / len(vectorized))
+        assert abs(scalar.mean() - vectorized.mean()) < 4 * standard_error, name
+
+
+@pytest.mark.parametrize("simulation_days", [1, 2])
+def test_zero_trading_days(simulation_days):
+    params = make_params(simulation_days=simulation_days)
+    assert len(trading_calendar_for(params, WEEKEND_START)) == 0
+
+    batch = VectorizedMonteCarloSimulator(params, 300).run(WEEKEND_START)
+    assert batch.ending_balance.shape == (300, 0)
+    assert np.all(batch.metrics['final_balance'] == params.initial_balance)
+    assert np.all(batch.metrics['largest_win'] == 0)
+
+    result = run_ensemble(params, 300, WEEKEND_START, streaks=True, target_balance_percent=110,
+                          checkpoint_days=[1], control_variate=True)
+    assert result.metric_distributions['final_balance']['p50'] == params.initial_balance
+
+    _, metrics = MonteCarloTradingSimulator(params).run(WEEKEND_START)
+    assert metrics.final_balance == params.initial_balance
+
+
+@pytest.mark.parametrize("max_trades", [1, 3, 10, 50])
+def test_regime_trade_counts_follow_each_regime(max_trades):
+    rng = np.random.default_rng(0)
+    uniforms = rng.random((64, 200))
+    regime = rng.integers(0, 2, (64, 200))
+    counts = regime_trade_counts(uniforms, regime, max_trades, np.array([1.0, 1.0]))
+    assert np.array_equal(counts, trade_counts_from_uniforms(uniforms, max_trades))
+
+    counts = regime_trade_counts(uniforms, regime, max_trades, np.array([1.0, 0.0]))
+    assert np.all(counts[regime == 1] == 0)
+    assert np.array_equal(counts[regime == 0], trade_counts_from_uniforms(uniforms, max_trades)[regime == 0])